@@ -0,0 +1,164 @@
+import json
+from decimal import Decimal
+from unittest import mock
+
+from django.db import IntegrityError
+from django.test import AsyncClient, TestCase, override_settings
+
+from inventory.models import Category, Product
+from invoices.models import Invoice, Payment
+from orders.models import Order, OrderItem
+from stats.cache import get_cache
+from users.models import User
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='staff')
+        cls.client_user = User.objects.create(username='client')
+        category = Category.objects.create(name='General')
+        cls.hammer = Product.objects.create(
+            name='Hammer', sku='HM-1', category=category, quantity=50,
+            cost_price=Decimal('2.00'), selling_price=Decimal('5.00'),
+        )
+        cls.nails = Product.objects.create(
+            name='Nails', sku='NL-1', category=category, quantity=3,
+            cost_price=Decimal('0.10'), selling_price=Decimal('0.25'),
+        )
+        cls.orders = [Order.objects.create(client=cls.client_user) for _ in range(5)]
+        OrderItem.objects.create(order=cls.orders[0], product=cls.hammer, quantity=2, price=Decimal('5.00'))
+        cls.invoice = Invoice.objects.create(order=cls.orders[0], tax_rate=Decimal('10.00'))
+        Payment.objects.create(invoice=cls.invoice, amount=Decimal('4.00'), method='CASH')
+
+    def setUp(self):
+        self.async_client.force_login(self.user)
+        # الكاش لا يتراجع مع معاملة الاختبار
+        get_cache().clear()
+
+    async def test_requires_login(self):
+        await self.async_client.alogout()
+        response = await self.async_client.get('/api/stats/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {'error': 'Authentication required'})
+
+    async def test_order_list_cursor_pagination(self):
+        response = await self.async_client.get('/api/orders/', {'limit': 2, 'count': 1})
+        first = response.json()
+        self.assertEqual([order['id'] for order in first['results']], [self.orders[4].pk, self.orders[3].pk])
+        self.assertEqual(first['count'], 5)
+        self.assertIsNone(first['previous'])
+
+        # طلب جديد بعد الصفحة الأولى لا يزيح الصفحة التالية
+        await Order.objects.acreate(client=self.client_user)
+        second = (await self.async_client.get('/api/orders/', {'limit': 2, 'after': first['next']})).json()
+        self.assertEqual([order['id'] for order in second['results']], [self.orders[2].pk, self.orders[1].pk])
+        self.assertIsNotNone(second['previous'])
+        self.assertNotIn('count', second)
+
+    async def test_order_detail(self):
+        response = await self.async_client.get(f'/api/orders/{self.orders[0].pk}/')
+        data = response.json()
+        self.assertEqual(data['invoice']['invoice_number'], self.invoice.invoice_number)
+        self.assertEqual(data['items'], [{
+            'product': {'id': self.hammer.pk, 'sku': 'HM-1', 'name': 'Hammer'},
+            'quantity': 2, 'price': '5.00', 'subtotal': '10.00',
+        }])
+        self.assertIsNone((await self.async_client.get(f'/api/orders/{self.orders[1].pk}/')).json()['invoice'])
+        self.assertEqual((await self.async_client.get('/api/orders/0/')).status_code, 404)
+
+    async def test_product_lookup_and_filters(self):
+        response = await self.async_client.get('/api/products/NL-1/')
+        self.assertEqual(response.json()['name'], 'Nails')
+        self.assertEqual((await self.async_client.get('/api/products/XX-9/')).status_code, 404)
+
+        low = (await self.async_client.get('/api/products/', {'low_stock': 1})).json()
+        self.assertEqual([product['sku'] for product in low['results']], ['NL-1'])
+        self.assertIsNone(low['next'])
+
+    async def test_invoice_balance(self):
+        data = (await self.async_client.get(f'/api/invoices/{self.invoice.pk}/balance/')).json()
+        self.assertEqual(
+            (data['subtotal'], data['tax_amount'], data['total_amount'], data['amount_paid'], data['balance']),
+            ('10.00', '1.00', '11.00', '4.00', '7.00'),
+        )
+
+    async def test_dashboard_stats(self):
+        data = (await self.async_client.get('/api/stats/')).json()
+        self.assertEqual((data['total_products'], data['low_stock_count']), (2, 1))
+        self.assertEqual(data['orders_this_month'], 5)
+
+    async def test_dashboard_stats_cache_and_metrics(self):
+        # عبر كامل طبقات ASGI، بما فيها RequestMetricsMiddleware غير المتزامن
+        with self.assertLogs('inventory_management.requests', 'DEBUG') as logs:
+            first = await self.async_client.get('/api/stats/')
+            second = await self.async_client.get('/api/stats/')
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(first['X-Stats-Cache'], 'hits=0; misses=2 (products,sales)')
+        self.assertEqual(second['X-Stats-Cache'], 'hits=2; misses=0')
+
+        # الجلسة والمستخدم، واستعلاما الأرقام فقط عند عدم وجودها في الكاش
+        queries = [json.loads(record.getMessage())['queries'] for record in logs.records]
+        self.assertEqual(queries, [4, 2])
+        self.assertIn('desc="2 queries"', second['Server-Timing'])
+
+    async def test_order_ingest(self):
+        batch = {'orders': [
+            {'idempotency_key': 'shop-1', 'client': self.client_user.pk,
+             'items': [{'product_id': self.nails.pk, 'quantity': 2}]},
+            {'idempotency_key': 'shop-2', 'client': self.client_user.pk, 'items': []},
+        ]}
+        response = await self.async_client.post('/api/orders/ingest/', batch, content_type='application/json')
+        data = response.json()
+        self.assertEqual([result['status'] for result in data['results']], ['created', 'error'])
+        self.assertEqual(data['summary'], {'created': 1, 'error': 1})
+
+        # إعادة الإرسال بعد انتهاء المهلة لا تنشئ طلبًا جديدًا
+        again = await self.async_client.post('/api/orders/ingest/', batch, content_type='application/json')
+        self.assertEqual(again.json()['results'][0]['order_id'], data['results'][0]['order_id'])
+        self.assertEqual(await Order.objects.acount(), 6)
+
+        response = await self.async_client.post('/api/orders/ingest/', [], content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(API_KEYS={'shop-secret': 'staff'})
+    async def test_order_ingest_with_api_key_and_csrf(self):
+        batch = {'orders': [{'idempotency_key': 'shop-1', 'client': self.client_user.pk,
+                             'items': [{'product_id': self.nails.pk, 'quantity': 1}]}]}
+
+        # النظام الخارجي: مفتاح API بدون جلسة ولا رمز CSRF
+        machine = AsyncClient(enforce_csrf_checks=True)
+        response = await machine.post(
+            '/api/orders/ingest/', batch, content_type='application/json', headers={'X-Api-Key': 'shop-secret'},
+        )
+        self.assertEqual(response.json()['summary'], {'created': 1})
+        order = await Order.objects.select_related('created_by').aget(pk=response.json()['results'][0]['order_id'])
+        self.assertEqual(order.created_by, self.user)
+
+        response = await machine.post(
+            '/api/orders/ingest/', batch, content_type='application/json', headers={'X-Api-Key': 'shop-secre'},
+        )
+        self.assertEqual((response.status_code, response.json()), (401, {'error': 'Invalid API key'}))
+
+        # الجلسة تحتاج رمز CSRF حتى لا ترسل صفحة أخرى الطلب باسم المستخدم
+        browser = AsyncClient(enforce_csrf_checks=True)
+        await browser.aforce_login(self.user)
+        response = await browser.post('/api/orders/ingest/', batch, content_type='application/json')
+        self.assertEqual((response.status_code, response.json()), (403, {'error': 'CSRF verification failed'}))
+
+        browser.cookies['csrftoken'] = 'a' * 32
+        response = await browser.post(
+            '/api/orders/ingest/', batch, content_type='application/json', headers={'X-CSRFToken': 'a' * 32},
+        )
+        self.assertEqual(response.json()['summary'], {'duplicate': 1})
+
+    async def test_order_ingest_concurrent_conflict(self):
+        batch = {'orders': [{'idempotency_key': 'shop-1', 'client': self.client_user.pk, 'items': []}]}
+        with mock.patch('api.views.ingest_orders', side_effect=IntegrityError):
+            response = await self.async_client.post('/api/orders/ingest/', batch, content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('retry', response.json()['error'])
+
+    async def test_only_get(self):
+        response = await self.async_client.post('/api/stats/')
+        self.assertEqual(response.status_code, 405)
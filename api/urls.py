@@ -0,0 +1,12 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('products/', views.product_list, name='api-product-list'),
+    path('products/<str:sku>/', views.product_lookup, name='api-product-lookup'),
+    path('orders/', views.order_list, name='api-order-list'),
+    path('orders/ingest/', views.order_ingest, name='api-order-ingest'),
+    path('orders/<int:pk>/', views.order_detail, name='api-order-detail'),
+    path('invoices/<int:pk>/balance/', views.invoice_balance, name='api-invoice-balance'),
+    path('stats/', views.dashboard_stats, name='api-dashboard-stats'),
+]
\ No newline at end of file
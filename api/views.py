@@ -0,0 +1,256 @@
+import hmac
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.http import JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from inventory.models import Product
+from inventory.search import search_products
+from inventory_management.pagination import KeysetPaginator
+from invoices.models import Invoice
+from orders.models import Order
+from orders.services import ingest_orders
+from orders.views import filter_orders
+from stats.cache import StatsCache
+from stats.utils import aget_dashboard_stats
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def get_api_key_username(request):
+    """
+    اسم المستخدم لمفتاح X-Api-Key من API_KEYS، أو None. المقارنة بزمن ثابت مع كل
+    المفاتيح حتى لا يكشف زمن الاستجابة جزءًا من مفتاح صحيح.
+    """
+    key = request.headers.get('X-Api-Key', '')
+    username = None
+    for candidate, candidate_username in getattr(settings, 'API_KEYS', {}).items():
+        if hmac.compare_digest(key.encode(), candidate.encode()):
+            username = candidate_username
+    return username
+
+
+def api_login_required(view):
+    """
+    مثل login_required لكن يرجع 401 بصيغة JSON بدلًا من التحويل إلى صفحة الدخول.
+
+    الأنظمة الخارجية ترسل X-Api-Key بدلًا من الجلسة، ولا تحتاج رمز CSRF لأن المتصفح لا
+    يرسل هذا الترويس تلقائيًا. مع الجلسة تفحص CSRF هنا للعروض المعلمة بـ csrf_exempt.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if 'X-Api-Key' in request.headers:
+            username = get_api_key_username(request)
+            user = None
+            if username:
+                user = await get_user_model().objects.filter(username=username, is_active=True).afirst()
+            if user is None:
+                return JsonResponse({'error': 'Invalid API key'}, status=401)
+        else:
+            user = await request.auser()
+            if not user.is_authenticated:
+                return JsonResponse({'error': 'Authentication required'}, status=401)
+            if CsrfViewMiddleware(view).process_view(request, None, (), {}) is not None:
+                return JsonResponse({'error': 'CSRF verification failed'}, status=403)
+        # request.user كسول ويقرأ قاعدة البيانات بشكل متزامن
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def not_found(message):
+    return JsonResponse({'error': message}, status=404)
+
+
+def get_limit(params):
+    try:
+        return max(1, min(int(params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT))
+    except ValueError:
+        return DEFAULT_LIMIT
+
+
+async def paginate(request, queryset, serialize, ordering):
+    """
+    صفحة بالمؤشر (after / before) بدلًا من رقم الصفحة: استعلام واحد مهما كان عمق الصفحة،
+    والصفوف الجديدة لا تزيح الصفحات التالية أثناء التصفح. العدد الكلي فقط مع count=1.
+    """
+    paginator = KeysetPaginator(queryset, get_limit(request.GET), ordering=ordering)
+    page = await paginator.aget_page(after=request.GET.get('after'), before=request.GET.get('before'))
+    data = {
+        'results': [serialize(obj) for obj in page],
+        'next': page.next_cursor if page.has_next else None,
+        'previous': page.previous_cursor if page.has_previous else None,
+    }
+    if request.GET.get('count') == '1':
+        data['count'] = await queryset.acount()
+    return JsonResponse(data)
+
+
+def product_data(product):
+    return {
+        'id': product.id,
+        'sku': product.sku,
+        'name': product.name,
+        'category': product.category.name,
+        'quantity': product.quantity,
+        'selling_price': product.selling_price,
+        'reorder_level': product.reorder_level,
+        'is_low_stock': product.is_low_stock,
+        'is_active': product.is_active,
+        'updated_at': product.updated_at,
+    }
+
+
+def order_data(order):
+    return {
+        'id': order.id,
+        'order_number': order.order_number,
+        'status': order.status,
+        'client': {'id': order.client_id, 'username': order.client.username},
+        'total_amount': order.total_amount,
+        'total_items': order.total_items,
+        'created_at': order.created_at,
+    }
+
+
+@require_GET
+@api_login_required
+async def product_list(request):
+    """
+    المنتجات مرتبة حسب المعرف. المرشحات: category و low_stock=1 و q (بحث نصي، ترجع
+    أفضل limit نتيجة حسب الصلة في صفحة واحدة بدون مؤشر).
+    """
+    products = Product.objects.select_related('category')
+
+    category_id = request.GET.get('category', '')
+    if category_id.isdigit():
+        products = products.filter(category_id=int(category_id))
+    if request.GET.get('low_stock') == '1':
+        products = products.filter(is_low_stock=True)
+
+    query = request.GET.get('q', '').strip()
+    if query:
+        products = search_products(products, query).order_by('-search_rank', 'name')[:get_limit(request.GET)]
+        return JsonResponse({
+            'results': [product_data(product) async for product in products.aiterator()],
+            'next': None,
+            'previous': None,
+        })
+
+    return await paginate(request, products, product_data, ordering=('id',))
+
+
+@require_GET
+@api_login_required
+async def product_lookup(request, sku):
+    """منتج واحد بالرمز (SKU)، مثل قراءة الباركود في نقاط البيع"""
+    try:
+        product = await Product.objects.select_related('category').aget(sku=sku)
+    except Product.DoesNotExist:
+        return not_found(f'No product with SKU {sku}')
+    return JsonResponse(product_data(product))
+
+
+@require_GET
+@api_login_required
+async def order_list(request):
+    """الطلبات من الأحدث، بنفس مرشحات صفحة الطلبات (status و client و date_from و date_to)"""
+    orders = filter_orders(request.GET).select_related('client')
+    return await paginate(request, orders, order_data, ordering=('-created_at', '-id'))
+
+
+@require_GET
+@api_login_required
+async def order_detail(request, pk):
+    try:
+        order = await Order.objects.select_related('client', 'invoice').aget(pk=pk)
+    except Order.DoesNotExist:
+        return not_found(f'No order with id {pk}')
+
+    invoice = getattr(order, 'invoice', None)
+    data = order_data(order)
+    data['notes'] = order.notes
+    data['invoice'] = {'id': invoice.id, 'invoice_number': invoice.invoice_number} if invoice else None
+    data['items'] = [
+        {
+            'product': {'id': item.product_id, 'sku': item.product.sku, 'name': item.product.name},
+            'quantity': item.quantity,
+            'price': item.price,
+            'subtotal': item.subtotal,
+        }
+        async for item in order.items.select_related('product').order_by('pk').aiterator()
+    ]
+    return JsonResponse(data)
+
+
+@csrf_exempt
+@require_POST
+@api_login_required
+async def order_ingest(request):
+    """
+    إدخال دفعة طلبات من نظام خارجي: {"orders": [{"idempotency_key", "client", "status",
+    "notes", "items": [{"product_id", "quantity", "price"}]}]}. إعادة الإرسال بنفس المفاتيح
+    آمنة وترجع الطلبات الموجودة. الاستجابة نتيجة لكل طلب بنفس الترتيب (انظر ingest_orders).
+    المصادقة بـ X-Api-Key، أو بالجلسة مع رمز CSRF (api_login_required).
+    """
+    try:
+        orders = json.loads(request.body).get('orders')
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'Request body must be a JSON object'}, status=400)
+
+    try:
+        # المعاملة وقفل المنتجات تعمل في خيط sync_to_async الخاص بالطلب
+        results = await sync_to_async(ingest_orders)(orders, created_by=request.user)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except IntegrityError:
+        # تعارض مع دفعة متزامنة بنفس المفاتيح حتى بعد إعادة المحاولة، وإعادة الإرسال آمنة
+        return JsonResponse({'error': 'Conflicting concurrent ingest, retry the batch'}, status=409)
+
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    return JsonResponse({'results': results, 'summary': summary})
+
+
+@require_GET
+@api_login_required
+async def invoice_balance(request, pk):
+    """المبالغ والرصيد المتبقي للفاتورة باستعلام واحد (with_financials)"""
+    try:
+        invoice = await Invoice.objects.with_financials().select_related('order').aget(pk=pk)
+    except Invoice.DoesNotExist:
+        return not_found(f'No invoice with id {pk}')
+
+    return JsonResponse({
+        'id': invoice.id,
+        'invoice_number': invoice.invoice_number,
+        'order_number': invoice.order.order_number,
+        'status': invoice.status,
+        'issue_date': invoice.issue_date,
+        'due_date': invoice.due_date,
+        'subtotal': invoice.subtotal,
+        'tax_amount': invoice.tax_amount,
+        'discount': invoice.discount,
+        'total_amount': invoice.total_amount,
+        'amount_paid': invoice.amount_paid,
+        'balance': invoice.balance,
+    })
+
+
+@require_GET
+@api_login_required
+async def dashboard_stats(request):
+    """أرقام لوحة التحكم من كاش الإحصائيات، وترويسة X-Stats-Cache كما في صفحة الإحصائيات"""
+    stats_cache = StatsCache()
+    response = JsonResponse(await aget_dashboard_stats(stats_cache))
+    response['X-Stats-Cache'] = stats_cache.header()
+    return response
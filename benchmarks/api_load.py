@@ -0,0 +1,195 @@
+# benchmarks/api_load.py
+# اختبار حمل لواجهة JSON غير المتزامنة (api/) تحت uvicorn: عدد الطلبات في الثانية والزمن
+# (p50/p90/p99) لكل رابط ولكل مستوى تزامن، مع صفحات HTML المقابلة للمقارنة.
+#
+#   pip install uvicorn aiohttp
+#   python manage.py seed_data --orders 200000 --products 20000
+#   python benchmarks/api_load.py --spawn --concurrency 1 10 50 --output api.json
+#
+# --spawn يشغل uvicorn بنفس DJANGO_SETTINGS_MODULE ويوقفه في النهاية، وبدونه يستخدم خادمًا
+# يعمل على --url. الجلسة تنشأ مباشرة في قاعدة البيانات للمستخدم benchmark-admin.
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inventory_management.settings')
+
+import aiohttp
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.test import Client
+from django.urls import reverse
+from inventory.models import Product
+from invoices.models import Invoice
+from orders.models import Order
+from users.models import User
+
+USERNAME = 'benchmark-admin'
+
+
+def get_scenarios():
+    """(الاسم، الرابط)، والروابط التي تنتهي بـ (html) هي الصفحات المقابلة للمقارنة"""
+    scenarios = [
+        ('api products', reverse('api-product-list')),
+        ('api orders', reverse('api-order-list')),
+        ('api orders (status)', reverse('api-order-list') + f'?status={Order.OrderStatus.PENDING}'),
+        ('orders (html)', reverse('orders-list')),
+        ('api stats', reverse('api-dashboard-stats')),
+        ('dashboard (html)', reverse('dashboard')),
+    ]
+    product = Product.objects.order_by('-pk').first()
+    if product is not None:
+        scenarios.append(('api product lookup', reverse('api-product-lookup', args=[product.sku])))
+    order = Order.objects.order_by('-pk').first()
+    if order is not None:
+        scenarios.append(('api order detail', reverse('api-order-detail', args=[order.pk])))
+    invoice = Invoice.objects.order_by('-pk').first()
+    if invoice is not None:
+        scenarios.append(('api invoice balance', reverse('api-invoice-balance', args=[invoice.pk])))
+    return scenarios
+
+
+def percentile(values, percent):
+    """أقرب رتبة (nearest-rank) بدون استيفاء"""
+    values = sorted(values)
+    index = max(0, min(len(values) - 1, round(percent / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+def get_session_cookie():
+    user, created = User.objects.get_or_create(username=USERNAME, defaults={'is_staff': True, 'is_superuser': True})
+    if created:
+        user.set_unusable_password()
+        user.save()
+    client = Client()
+    client.force_login(user)
+    return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+
+async def run_load(session, url, concurrency, duration):
+    """concurrency عميل يرسلون الطلبات بدون توقف لمدة duration ثانية"""
+    timings, statuses = [], {}
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            async with session.get(url) as response:
+                await response.read()
+            timings.append((time.perf_counter() - start) * 1000)
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        'url': url,
+        'concurrency': concurrency,
+        'requests': len(timings),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'requests_per_second': round(len(timings) / elapsed, 1),
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p90_ms': round(percentile(timings, 90), 2),
+        'p99_ms': round(percentile(timings, 99), 2),
+    }
+
+
+async def run(options, scenarios, cookies):
+    connector = aiohttp.TCPConnector(limit=max(options.concurrency))
+    results = {}
+    async with aiohttp.ClientSession(options.url, cookies=cookies, connector=connector) as session:
+        for name, url in scenarios:
+            # تسخين (اتصالات وكاش)، ثم القياس لكل مستوى تزامن
+            await run_load(session, url, 1, options.warmup)
+            for concurrency in options.concurrency:
+                key = f'{name} x{concurrency}'
+                results[key] = await run_load(session, url, concurrency, options.duration)
+                print_result(key, results[key])
+    return results
+
+
+def print_result(name, result):
+    statuses = ','.join(f'{status}:{count}' for status, count in result['statuses'].items())
+    print(
+        f"{name:<30}{result['requests_per_second']:>10.1f}{result['p50_ms']:>10.1f}"
+        f"{result['p90_ms']:>10.1f}{result['p99_ms']:>10.1f}  {statuses}"
+    )
+
+
+def wait_for_port(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server did not start on {host}:{port}')
+
+
+def spawn_server(options):
+    parts = urlsplit(options.url)
+    command = [
+        sys.executable, '-m', 'uvicorn', 'inventory_management.asgi:application',
+        '--host', parts.hostname, '--port', str(parts.port or 80),
+        '--workers', str(options.workers), '--no-access-log', '--log-level', 'warning',
+    ]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [BASE_DIR, os.environ.get('PYTHONPATH')])))
+    process = subprocess.Popen(command, cwd=BASE_DIR, env=env)
+    try:
+        wait_for_port(parts.hostname, parts.port or 80)
+    except RuntimeError:
+        process.terminate()
+        raise
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent load test of the JSON API under uvicorn')
+    parser.add_argument('--url', default='http://127.0.0.1:8765', help='Server address')
+    parser.add_argument('--spawn', action='store_true', help='Start uvicorn on --url for the test')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn worker processes with --spawn')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50], help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per scenario and concurrency')
+    parser.add_argument('--warmup', type=float, default=1, help='Unmeasured seconds per scenario')
+    parser.add_argument('--only', nargs='+', metavar='NAME', help='Run only scenarios starting with these names')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    options = parser.parse_args()
+    if min(options.concurrency) < 1 or options.duration <= 0:
+        parser.error('--concurrency and --duration must be positive')
+
+    scenarios = [
+        (name, url) for name, url in get_scenarios()
+        if not options.only or name.startswith(tuple(options.only))
+    ]
+    process = spawn_server(options) if options.spawn else None
+    try:
+        print(f"{'scenario':<30}{'req/s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}  statuses")
+        cookies = {settings.SESSION_COOKIE_NAME: get_session_cookie()}
+        results = asyncio.run(run(options, scenarios, cookies))
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    if options.output:
+        meta = {'url': options.url, 'workers': options.workers if options.spawn else None, 'duration': options.duration}
+        with open(options.output, 'w', encoding='utf-8') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=2)
+        print(f"report written to {options.output}")
+
+
+if __name__ == '__main__':
+    main()
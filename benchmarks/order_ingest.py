@@ -0,0 +1,177 @@
+# benchmarks/order_ingest.py
+# قياس سرعة إدخال الطلبات (طلب في الثانية): create_order لكل طلب مقابل ingest_orders على
+# دفعات بأحجام مختلفة، وإعادة إرسال نفس الدفعات (كلها مكررة)، وعبر نقطة /api/orders/ingest/.
+#
+#   python manage.py seed_data --orders 20000 --products 5000
+#   python benchmarks/order_ingest.py --orders 2000 --batch-sizes 1 10 100 500
+#
+# تحذير: يكتب في قاعدة البيانات المحددة في DJANGO_SETTINGS_MODULE ويحذف الطلبات المنشأة في
+# النهاية. مع --completed يخصم المخزون أيضًا ولا يعاد.
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inventory_management.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Concat
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from inventory.models import Product, StockMovement
+from orders.models import Order, OrderIngestKey, OrderItem
+from orders.services import create_order, ingest_orders
+from stats.rollup import rebuild_rollup
+from users.models import User
+
+KEY_PREFIX = 'benchmark-ingest-'
+USERNAME = 'benchmark-admin'
+API_KEY = 'benchmark-ingest-key'
+
+
+def make_orders(rng, count, clients, products, status, run):
+    """طلبات بعنصر إلى خمسة عناصر مثل ما يرسله متجر إلكتروني"""
+    orders = []
+    for i in range(count):
+        lines = rng.sample(products, rng.randint(1, min(5, len(products))))
+        orders.append({
+            'idempotency_key': f'{KEY_PREFIX}{run}-{i}',
+            'client': rng.choice(clients),
+            'status': status,
+            'items': [{'product_id': pk, 'quantity': rng.randint(1, 3)} for pk in lines],
+        })
+    return orders
+
+
+def batches(orders, size):
+    for start in range(0, len(orders), size):
+        yield orders[start:start + size]
+
+
+def measure(label, orders, run):
+    start = time.perf_counter()
+    statuses = run()
+    elapsed = time.perf_counter() - start
+    rate = len(orders) / elapsed
+    print(f"{label:<32}{len(orders):>8}{elapsed:>10.2f}{rate:>12.1f}  {statuses}")
+    return {'orders': len(orders), 'seconds': round(elapsed, 3), 'orders_per_second': round(rate, 1), 'statuses': statuses}
+
+
+def count_statuses(results):
+    statuses = {}
+    for result in results:
+        statuses[result['status']] = statuses.get(result['status'], 0) + 1
+    return statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Order ingestion throughput (orders/second)')
+    parser.add_argument('--orders', type=int, default=2000, help='Orders per scenario')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 500])
+    parser.add_argument('--completed', action='store_true', help='Ingest completed orders (decrements stock)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    options = parser.parse_args()
+    if options.orders < 1 or min(options.batch_sizes) < 1:
+        parser.error('--orders and --batch-sizes must be positive')
+
+    clients = list(User.objects.filter(is_active=True).values_list('pk', flat=True)[:1000])
+    products = list(Product.objects.filter(is_active=True).values_list('pk', flat=True)[:5000])
+    if not clients or not products:
+        parser.error('No clients or products, run "manage.py seed_data" first')
+
+    settings.ALLOWED_HOSTS = ['*']
+    settings.QUERY_BUDGET_RAISE = False
+    status = Order.OrderStatus.COMPLETED if options.completed else Order.OrderStatus.PENDING
+    rng = random.Random(options.seed)
+    user, _ = User.objects.get_or_create(username=USERNAME, defaults={'is_staff': True, 'is_superuser': True})
+    # مثل النظام الخارجي: مفتاح API وفحص CSRF مفعل
+    settings.API_KEYS = {API_KEY: USERNAME}
+    client = Client(enforce_csrf_checks=True)
+    baseline_ids = []
+    results = {}
+
+    print(f"{'scenario':<32}{'orders':>8}{'seconds':>10}{'orders/s':>12}  results")
+    try:
+        orders = make_orders(rng, options.orders, clients, products, status, 'baseline')
+
+        def one_by_one():
+            users = User.objects.in_bulk(clients)
+            for data in orders:
+                try:
+                    order = create_order(users[data['client']], data['items'], status=data['status'])
+                except ValueError:
+                    continue  # مثل order_create: المخزون غير كاف يرجع 400
+                baseline_ids.append(order.pk)
+            return {'created': len(baseline_ids), 'error': len(orders) - len(baseline_ids)}
+
+        results['create_order (one per request)'] = measure('create_order (one per request)', orders, one_by_one)
+
+        for size in options.batch_sizes:
+            orders = make_orders(rng, options.orders, clients, products, status, f'batch{size}')
+
+            def ingest():
+                return count_statuses(
+                    result for batch in batches(orders, size) for result in ingest_orders(batch, created_by=user)
+                )
+
+            results[f'ingest (batch {size})'] = measure(f'ingest (batch {size})', orders, ingest)
+            # نفس الدفعات مرة أخرى كما يفعل النظام الخارجي بعد انتهاء المهلة
+            results[f'resend (batch {size})'] = measure(f'resend (batch {size})', orders, ingest)
+
+        size = max(options.batch_sizes)
+        orders = make_orders(rng, options.orders, clients, products, status, 'http')
+
+        def post():
+            statuses = {}
+            for batch in batches(orders, size):
+                response = client.post(
+                    reverse('api-order-ingest'), {'orders': batch}, content_type='application/json',
+                    headers={'X-Api-Key': API_KEY},
+                )
+                for name, count in response.json()['summary'].items():
+                    statuses[name] = statuses.get(name, 0) + count
+            return statuses
+
+        results[f'endpoint (batch {size})'] = measure(f'endpoint (batch {size})', orders, post)
+    finally:
+        cleanup(baseline_ids)
+
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as f:
+            json.dump({'meta': {'status': status, 'database': settings.DATABASES['default']['ENGINE']},
+                       'results': results}, f, indent=2)
+        print(f"report written to {options.output}")
+
+
+def cleanup(baseline_ids):
+    """حذف الطلبات المنشأة (العناصر قبل الطلبات)، ثم إعادة بناء ملخص اليوم"""
+    orders = Order.objects.filter(Q(pk__in=baseline_ids) | Q(ingest_key__key__startswith=KEY_PREFIX))
+    references = orders.annotate(reference=Concat(Value('Order #'), 'order_number')).values('reference')
+    with transaction.atomic():
+        count = orders.count()
+        # المفاتيح أخيرًا لأن استعلام الطلبات يعتمد عليها
+        for queryset in (
+            StockMovement.objects.filter(reference__in=references),
+            OrderItem.objects.filter(order__in=orders),
+            orders,
+            OrderIngestKey.objects.filter(key__startswith=KEY_PREFIX),
+        ):
+            queryset.delete()
+        today = timezone.localdate()
+        rebuild_rollup(today, today)
+    print(f"removed {count:,} benchmark orders")
+
+
+if __name__ == '__main__':
+    main()
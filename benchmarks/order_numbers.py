@@ -0,0 +1,70 @@
+# benchmarks/order_numbers.py
+# قياس سرعة إنشاء الطلبات من عدة عمليات متوازية والتأكد من عدم تكرار أرقام الطلبات.
+#
+#   python benchmarks/order_numbers.py --workers 8 --orders 500
+#
+# تحذير: يكتب الطلبات في قاعدة البيانات المحددة في DJANGO_SETTINGS_MODULE.
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inventory_management.settings')
+
+import django
+
+django.setup()
+
+from django.db import connections, OperationalError
+from orders.models import Order
+from users.models import User
+
+
+def create_orders(args):
+    client_id, count = args
+    connections.close_all()
+    numbers = []
+    start = time.perf_counter()
+    for _ in range(count):
+        # SQLite يسمح بكاتب واحد فقط، لذلك نعيد المحاولة عند انتهاء مهلة القفل
+        while True:
+            try:
+                numbers.append(Order.objects.create(client_id=client_id, notes='benchmark').order_number)
+                break
+            except OperationalError:
+                time.sleep(0.01)
+    return numbers, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel order creation benchmark')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--orders', type=int, default=250, help='Orders per worker')
+    options = parser.parse_args()
+
+    client, _ = User.objects.get_or_create(username='benchmark-client')
+    connections.close_all()
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(options.workers) as pool:
+        results = pool.map(create_orders, [(client.id, options.orders)] * options.workers)
+    elapsed = time.perf_counter() - start
+
+    numbers = [number for worker_numbers, _ in results for number in worker_numbers]
+    duplicates = len(numbers) - len(set(numbers))
+
+    print(f"workers:          {options.workers}")
+    print(f"orders created:   {len(numbers)}")
+    print(f"elapsed:          {elapsed:.2f}s")
+    print(f"throughput:       {len(numbers) / elapsed * 60:,.0f} orders/minute")
+    print(f"duplicates:       {duplicates}")
+
+    # تنظيف بيانات القياس
+    Order.objects.filter(client=client, notes='benchmark').delete()
+    return 1 if duplicates else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
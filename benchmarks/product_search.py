@@ -0,0 +1,106 @@
+# benchmarks/product_search.py
+# مقارنة البحث النصي في المنتجات (inventory.search) مع البحث القديم بـ icontains.
+#
+#   python benchmarks/product_search.py --products 500000
+#
+# تحذير: يكتب المنتجات في قاعدة البيانات المحددة في DJANGO_SETTINGS_MODULE ويحذفها في النهاية
+# (إلا إذا استخدم --keep).
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inventory_management.settings')
+
+import django
+
+django.setup()
+
+from django.db import connection, transaction
+from django.db.models import Q
+from inventory.models import Category, Product
+from inventory.search import get_backend, rebuild_index, search_products
+
+WORDS = [
+    'steel', 'hammer', 'blue', 'copper', 'wire', 'cable', 'drill', 'bit', 'screw', 'nail', 'bolt', 'washer',
+    'pipe', 'valve', 'glue', 'tape', 'brush', 'paint', 'white', 'black', 'heavy', 'light', 'mini', 'pro',
+    'garden', 'hose', 'lamp', 'switch', 'socket', 'plug', 'filter', 'pump', 'motor', 'belt', 'chain', 'lock',
+]
+# مفردات الوصف: كلمات مركبة كثيرة حتى تكون الكلمات النادرة قريبة من كتالوج حقيقي
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'ta', 'vo', 'zi', 'po', 'de', 'sa', 'gu', 'fe', 'bi', 'ho', 'ju']
+VOCABULARY = WORDS + [a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES]
+QUERIES = ['hammer', 'steel wire', 'garden hose pro', 'cop', 'kaloru', 'SK-0012345', 'SK-004', 'nothingmatches']
+CATEGORY_NAME = 'benchmark-search'
+
+
+def generate(category, count, batch_size=5000):
+    rng = random.Random(42)
+    start = time.perf_counter()
+    for offset in range(0, count, batch_size):
+        products = []
+        for i in range(offset, min(offset + batch_size, count)):
+            name = ' '.join(rng.sample(WORDS, 3))
+            products.append(Product(
+                name=name, sku=f'SK-{i:07d}', category=category, cost_price=1, selling_price=2,
+                description=' '.join(rng.choices(VOCABULARY, k=20)),
+            ))
+        with transaction.atomic():
+            Product.objects.bulk_create(products)
+    return time.perf_counter() - start
+
+
+def icontains(queryset, query):
+    return queryset.filter(Q(name__icontains=query) | Q(sku__icontains=query) | Q(description__icontains=query))
+
+
+def measure(run, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Product search benchmark')
+    parser.add_argument('--products', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--keep', action='store_true', help='Keep the generated products')
+    options = parser.parse_args()
+
+    category, _ = Category.objects.get_or_create(name=CATEGORY_NAME)
+    existing = Product.objects.filter(category=category).count()
+    if existing < options.products:
+        elapsed = generate(category, options.products - existing)
+        print(f"generated {options.products - existing:,} products in {elapsed:.1f}s")
+        start = time.perf_counter()
+        rebuild_index()
+        print(f"rebuilt search index in {time.perf_counter() - start:.1f}s")
+
+    products = Product.objects.filter(category=category)
+    print(f"backend: {type(get_backend()).__name__} ({connection.vendor})")
+    print(f"{'query':<20}{'matches':>10}{'page (ms)':>12}{'count (ms)':>12}{'icontains page':>16}{'icontains count':>17}")
+    for query in QUERIES:
+        # صفحة المنتجات الأولى كما في product_list: الترتيب حسب الصلة ثم عدد النتائج
+        ranked = search_products(products, query).order_by('-search_rank', 'name')
+        old = icontains(products, query).order_by('name')
+        matches = ranked.count()
+        print(
+            f"{query:<20}{matches:>10,}"
+            f"{measure(lambda: list(ranked[:10]), options.repeat):>12.1f}"
+            f"{measure(ranked.count, options.repeat):>12.1f}"
+            f"{measure(lambda: list(old[:10]), options.repeat):>16.1f}"
+            f"{measure(old.count, options.repeat):>17.1f}"
+        )
+
+    if not options.keep:
+        Product.objects.filter(category=category).delete()
+        category.delete()
+
+
+if __name__ == '__main__':
+    main()
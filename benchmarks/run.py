@@ -0,0 +1,186 @@
+# benchmarks/run.py
+# قياس الصفحات الأساسية عبر Django test client: الزمن (p50/p90/p99) وعدد الاستعلامات لكل صفحة.
+#
+#   python manage.py seed_data --orders 200000 --products 20000
+#   python benchmarks/run.py --output before.json
+#   ... تعديل ...
+#   python benchmarks/run.py --compare before.json
+#
+# يستخدم قاعدة البيانات المحددة في DJANGO_SETTINGS_MODULE كما هي، وينشئ مستخدمًا إداريًا
+# باسم benchmark-admin إذا لم يكن موجودًا.
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inventory_management.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from inventory.models import Product, StockMovement
+from invoices.models import Invoice
+from invoices.pdf import invalidate_invoice_pdf
+from orders.models import Order, OrderItem
+from users.models import User
+
+USERNAME = 'benchmark-admin'
+
+
+def get_scenarios():
+    """(الاسم، الرابط، دالة تستدعى قبل كل تشغيل أو None)"""
+    scenarios = [
+        ('dashboard', reverse('dashboard'), None),
+        ('statistics', reverse('statistics'), None),
+        ('statistics (365 days)', reverse('statistics') + '?period=365', None),
+        ('product_list', reverse('product-list'), None),
+        ('product_list (search)', reverse('product-list') + '?search=steel', None),
+        ('product_list (page 50)', reverse('product-list') + '?page=50', None),
+        ('orders_list', reverse('orders-list'), None),
+        ('orders_list (status)', reverse('orders-list') + f'?status={Order.OrderStatus.PENDING}', None),
+        ('invoices_list', reverse('invoices-list'), None),
+    ]
+    invoice = Invoice.objects.order_by('-pk').first()
+    if invoice is not None:
+        url = reverse('invoice-pdf', args=[invoice.pk])
+        # cold: حذف الملف المخزن قبل كل طلب لقياس التوليد نفسه
+        scenarios.append(('generate_pdf (cold)', url, lambda: invalidate_invoice_pdf(invoice.pk)))
+        scenarios.append(('generate_pdf (warm)', url, None))
+    return scenarios
+
+
+def percentile(values, percent):
+    """أقرب رتبة (nearest-rank) بدون استيفاء"""
+    values = sorted(values)
+    index = max(0, min(len(values) - 1, round(percent / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+def run_scenario(client, url, before, warmup, repeat):
+    for _ in range(warmup):
+        if before:
+            before()
+        b''.join(client.get(url))
+
+    timings, queries, status = [], [], None
+    for _ in range(repeat):
+        if before:
+            before()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(url)
+            # قراءة المحتوى كاملًا حتى تدخل الاستجابات المتدفقة في القياس
+            b''.join(response)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(captured.captured_queries))
+        status = response.status_code
+
+    return {
+        'url': url,
+        'status': status,
+        'queries': max(queries),
+        'runs': repeat,
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p90_ms': round(percentile(timings, 90), 2),
+        'p99_ms': round(percentile(timings, 99), 2),
+        'mean_ms': round(statistics.fmean(timings), 2),
+        'min_ms': round(min(timings), 2),
+        'max_ms': round(max(timings), 2),
+    }
+
+
+def get_meta():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'rows': {
+            'products': Product.objects.count(),
+            'stock_movements': StockMovement.objects.count(),
+            'orders': Order.objects.count(),
+            'order_items': OrderItem.objects.count(),
+            'invoices': Invoice.objects.count(),
+        },
+    }
+
+
+def print_report(results, baseline=None):
+    header = f"{'scenario':<26}{'status':>7}{'queries':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}"
+    if baseline:
+        header += f"{'p50 change':>12}{'queries':>9}"
+    print(header)
+    for name, result in results.items():
+        line = (
+            f"{name:<26}{result['status']:>7}{result['queries']:>9}"
+            f"{result['p50_ms']:>10.1f}{result['p90_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+        )
+        old = (baseline or {}).get(name)
+        if old:
+            change = (result['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100 if old['p50_ms'] else 0
+            line += f"{change:>+11.1f}%{result['queries'] - old['queries']:>+9d}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Page benchmarks (latency percentiles and query counts)')
+    parser.add_argument('--repeat', type=int, default=20, help='Measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=2, help='Unmeasured requests per scenario')
+    parser.add_argument('--only', nargs='+', metavar='NAME', help='Run only scenarios starting with these names')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--compare', metavar='JSON', help='Show the change from an earlier report')
+    options = parser.parse_args()
+    if options.repeat < 1:
+        parser.error('--repeat must be positive')
+
+    settings.ALLOWED_HOSTS = ['*']
+    # تجاوز حد الاستعلامات يسجل فقط، والعدد يظهر في التقرير
+    settings.QUERY_BUDGET_RAISE = False
+
+    user, created = User.objects.get_or_create(username=USERNAME, defaults={'is_staff': True, 'is_superuser': True})
+    if created:
+        user.set_unusable_password()
+        user.save()
+    client = Client(raise_request_exception=False)
+    client.force_login(user)
+
+    results = {}
+    for name, url, before in get_scenarios():
+        if options.only and not name.startswith(tuple(options.only)):
+            continue
+        results[name] = run_scenario(client, url, before, options.warmup, options.repeat)
+
+    baseline = None
+    if options.compare:
+        with open(options.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    print_report(results, baseline)
+
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as f:
+            json.dump({'meta': get_meta(), 'results': results}, f, indent=2)
+        print(f"report written to {options.output}")
+
+
+if __name__ == '__main__':
+    main()
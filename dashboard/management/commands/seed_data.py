@@ -0,0 +1,336 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from inventory.cache import invalidate_category_choices
+from inventory.models import Category, LowStockEvent, Product, ReorderSuggestion, StockMovement, StockSnapshot
+from inventory.search import rebuild_index
+from invoices.models import Invoice, Payment
+from invoices.pdf import get_cache_dir
+from orders.models import Order, OrderIngestKey, OrderItem
+from orders.sequences import allocate_numbers
+from stats import cache as stats_cache
+from stats.models import DailySalesRollup
+from stats.rollup import rebuild_rollup
+from users.models import User
+
+BATCH_SIZE = 5000
+
+# كل البيانات المولدة تحمل هذه البادئة حتى يمكن حذفها بـ --flush
+USER_PREFIX = 'seed-'
+SKU_PREFIX = 'SEED-'
+CATEGORY_PREFIX = 'Seed '
+
+WORDS = [
+    'steel', 'hammer', 'blue', 'copper', 'wire', 'cable', 'drill', 'screw', 'nail', 'bolt', 'washer', 'pipe',
+    'valve', 'glue', 'tape', 'brush', 'paint', 'white', 'black', 'heavy', 'light', 'mini', 'pro', 'garden',
+    'hose', 'lamp', 'switch', 'socket', 'plug', 'filter', 'pump', 'motor', 'belt', 'chain', 'lock', 'chair',
+    'desk', 'shelf', 'paper', 'pen', 'marker', 'charger', 'adapter', 'speaker', 'mouse', 'keyboard', 'bottle',
+]
+
+# توزيع حالات الطلبات (النسبة المئوية)
+ORDER_STATUSES = [
+    (Order.OrderStatus.COMPLETED, 70),
+    (Order.OrderStatus.PENDING, 10),
+    (Order.OrderStatus.IN_PROGRESS, 8),
+    (Order.OrderStatus.CANCELLED, 8),
+    (Order.OrderStatus.REJECTED, 4),
+]
+TAX_RATE = Decimal('15.00')
+
+
+def zipf_weights(count, exponent):
+    """أوزان تراكمية لتوزيع Zipf: العنصر الأول هو الأكثر طلبًا"""
+    return list(accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+@contextmanager
+def keep_timestamps(*models):
+    """تعطيل auto_now و auto_now_add مؤقتًا حتى تحفظ التواريخ التاريخية كما هي"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def bulk_insert(model, objects, batch_size=BATCH_SIZE):
+    """إدراج على دفعات، كل دفعة في معاملة. يرجع الكائنات مع المعرفات"""
+    created = []
+    for start in range(0, len(objects), batch_size):
+        with transaction.atomic():
+            created.extend(model.objects.bulk_create(objects[start:start + batch_size]))
+    return created
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a large synthetic dataset (users, categories, products, orders, items, invoices, payments '
+        'and stock movements) with realistic skew, using bulk inserts. Meant for benchmarks, not production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500, help='Client accounts')
+        parser.add_argument('--categories', type=int, default=30)
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--orders', type=int, default=20000)
+        parser.add_argument('--days', type=int, default=365, help='Spread orders over this many past days')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (same seed, same data)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--flush', action='store_true', help='Delete previously generated data first')
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['categories'], options['products'], options['days'], options['batch_size']) < 1:
+            raise CommandError('--users, --categories, --products, --days and --batch-size must be positive')
+
+        if options['flush']:
+            self.flush()
+        elif Product.objects.filter(sku__startswith=SKU_PREFIX).exists():
+            raise CommandError('Generated data already exists, use --flush to replace it')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=options['days'])
+        started = time.perf_counter()
+
+        with keep_timestamps(User, Category, Product, StockMovement, Order, Invoice, Payment):
+            client_ids = self.create_users(options['users'])
+            category_ids = self.create_categories(options['categories'])
+            orders = self.plan_orders(options['orders'], options['products'], len(client_ids), options['days'])
+            products = self.create_products(options['products'], category_ids, orders)
+            self.create_invoices(self.create_orders(orders, client_ids, products))
+
+        # الجداول المشتقة والكاش: bulk_create لا يرسل إشارات
+        rebuild_rollup()
+        rebuild_index()
+        invalidate_category_choices()
+        for section in (stats_cache.SALES, stats_cache.TOP_SELLERS, stats_cache.STATUS_DISTRIBUTION,
+                        stats_cache.PRODUCTS, stats_cache.LOW_STOCK, stats_cache.CATEGORY_DISTRIBUTION,
+                        stats_cache.PAYMENTS):
+            stats_cache.invalidate(section)
+        for year in range(self.start.year, self.now.year + 1):
+            stats_cache.invalidate(stats_cache.MONTHLY_SALES, scope=year)
+
+        self.stdout.write(self.style.SUCCESS(f'Generated data in {time.perf_counter() - started:.1f}s'))
+
+    def report(self, label, count):
+        self.stdout.write(f'  {label}: {count:,}')
+
+    def flush(self):
+        """
+        حذف البيانات المولدة سابقًا بـ delete() العادي حتى تعمل إشارات الحذف (الكاش وملفات PDF)،
+        الأبناء قبل الآباء حتى لا يحتاج كل حذف لجمع الصفوف المرتبطة (cascade) من جديد.
+        """
+        orders = Order.objects.filter(client__username__startswith=USER_PREFIX)
+        products = Product.objects.filter(sku__startswith=SKU_PREFIX)
+        invoice_ids = set(Invoice.objects.filter(order__in=orders).values_list('pk', flat=True))
+
+        with transaction.atomic():
+            for queryset in (
+                Payment.objects.filter(invoice__order__in=orders),
+                Invoice.objects.filter(order__in=orders),
+                OrderItem.objects.filter(Q(order__in=orders) | Q(product__in=products)),
+                OrderIngestKey.objects.filter(order__in=orders),
+                StockMovement.objects.filter(product__in=products),
+                StockSnapshot.objects.filter(product__in=products),
+                LowStockEvent.objects.filter(product__in=products),
+                ReorderSuggestion.objects.filter(product__in=products),
+                DailySalesRollup.objects.filter(product__in=products),
+                orders,
+                products,
+                Category.objects.filter(name__startswith=CATEGORY_PREFIX),
+                User.objects.filter(username__startswith=USER_PREFIX),
+            ):
+                queryset.delete()
+
+        # ملفات PDF المخزنة للفواتير المحذوفة
+        for path in get_cache_dir().glob('*.pdf'):
+            if int(path.name.split('-', 1)[0]) in invoice_ids:
+                path.unlink(missing_ok=True)
+
+    def create_users(self, count):
+        password = make_password(None)
+        users = [
+            User(
+                username=f'{USER_PREFIX}client-{i:06d}', password=password, role=User.Role.CLIENT,
+                first_name=self.rng.choice(WORDS).title(), email=f'client{i}@example.com',
+                date_joined=self.start, created_at=self.start, updated_at=self.start,
+            )
+            for i in range(count)
+        ]
+        ids = [user.pk for user in bulk_insert(User, users, self.batch_size)]
+        self.report('users', len(ids))
+        return ids
+
+    def create_categories(self, count):
+        categories = [
+            Category(name=f'{CATEGORY_PREFIX}{i:03d}', created_at=self.start, updated_at=self.start)
+            for i in range(count)
+        ]
+        ids = [category.pk for category in bulk_insert(Category, categories, self.batch_size)]
+        self.report('categories', len(ids))
+        return ids
+
+    def plan_orders(self, count, product_count, client_count, days):
+        """
+        الطلبات في الذاكرة قبل الإدراج: (العميل، الحالة، التاريخ، [(المنتج، الكمية)]).
+        المنتجات والعملاء بتوزيع Zipf، والطلبات تزيد مع الوقت وتقل في نهاية الأسبوع.
+        """
+        rng = self.rng
+        product_weights = zipf_weights(product_count, 1.1)
+        client_weights = zipf_weights(client_count, 0.8)
+        statuses, status_weights = zip(*ORDER_STATUSES)
+        day_weights = list(accumulate(
+            (1 + day / days) * (0.5 if (self.start + timedelta(days=day)).weekday() >= 5 else 1)
+            for day in range(days)
+        ))
+
+        products = range(product_count)
+        orders = []
+        for client, status, day in zip(
+            rng.choices(range(client_count), cum_weights=client_weights, k=count),
+            rng.choices(statuses, weights=status_weights, k=count),
+            rng.choices(range(days), cum_weights=day_weights, k=count),
+        ):
+            created_at = self.start + timedelta(days=day, hours=rng.uniform(8, 20))
+            size = min(1 + int(rng.expovariate(0.7)), 8)
+            chosen = dict.fromkeys(rng.choices(products, cum_weights=product_weights, k=size))
+            items = [(product, min(1 + int(rng.expovariate(0.5)), 20)) for product in chosen]
+            orders.append((client, status, min(created_at, self.now), items))
+        return orders
+
+    def create_products(self, count, category_ids, orders):
+        rng = self.rng
+        sold = [0] * count
+        for _, status, _, items in orders:
+            if status == Order.OrderStatus.COMPLETED:
+                for product, quantity in items:
+                    sold[product] += quantity
+
+        category_weights = zipf_weights(len(category_ids), 0.7)
+        categories = rng.choices(category_ids, cum_weights=category_weights, k=count)
+        products = []
+        for i in range(count):
+            cost = Decimal(min(rng.lognormvariate(3, 1), 50000)).quantize(Decimal('0.01'))
+            reorder_level = rng.choice((5, 10, 10, 20, 50))
+            # حوالي 8% من المنتجات تحت حد إعادة الطلب
+            remaining = rng.randint(0, reorder_level) if rng.random() < 0.08 else rng.randint(reorder_level + 1, 500)
+            products.append(Product(
+                name=' '.join(rng.sample(WORDS, 3)).title(),
+                sku=f'{SKU_PREFIX}{i:07d}',
+                category_id=categories[i],
+                description=' '.join(rng.choices(WORDS, k=12)),
+                cost_price=cost,
+                selling_price=(cost * Decimal(rng.uniform(1.15, 1.8))).quantize(Decimal('0.01')),
+                reorder_level=reorder_level,
+                quantity=remaining,
+                is_low_stock=remaining <= reorder_level,
+                is_active=rng.random() > 0.03,
+                created_at=self.start,
+                updated_at=self.start,
+            ))
+        products = bulk_insert(Product, products, self.batch_size)
+        self.report('products', len(products))
+
+        # الرصيد الأولي يغطي كل المبيعات حتى تتطابق الكمية الحالية مع سجل الحركات
+        movements = [
+            StockMovement(
+                product_id=product.pk, movement_type=StockMovement.MOVEMENT_IN,
+                quantity=product.quantity + sold[i], reference='Opening stock', created_at=self.start,
+            )
+            for i, product in enumerate(products) if product.quantity + sold[i]
+        ]
+        bulk_insert(StockMovement, movements, self.batch_size)
+        self.report('opening stock movements', len(movements))
+        return products
+
+    def create_orders(self, orders, client_ids, products):
+        numbers = allocate_numbers('order', 'ORD', len(orders))
+        order_objects = []
+        for number, (client, status, created_at, items) in zip(numbers, orders):
+            order_objects.append(Order(
+                order_number=number,
+                client_id=client_ids[client],
+                status=status,
+                # الإجماليات مخزنة في الطلب، و bulk_create لا يستدعي update_totals
+                total_amount=sum(products[product].selling_price * quantity for product, quantity in items),
+                total_items=sum(quantity for _, quantity in items),
+                created_at=created_at,
+                updated_at=created_at,
+            ))
+        order_objects = bulk_insert(Order, order_objects, self.batch_size)
+        self.report('orders', len(order_objects))
+
+        item_count = 0
+        for start in range(0, len(orders), self.batch_size):
+            items, movements = [], []
+            for index in range(start, min(start + self.batch_size, len(orders))):
+                _, status, created_at, lines = orders[index]
+                for product, quantity in lines:
+                    items.append(OrderItem(
+                        order_id=order_objects[index].pk, product_id=products[product].pk,
+                        quantity=quantity, price=products[product].selling_price,
+                    ))
+                    if status == Order.OrderStatus.COMPLETED:
+                        movements.append(StockMovement(
+                            product_id=products[product].pk, movement_type=StockMovement.MOVEMENT_OUT,
+                            quantity=quantity, reference=f'Order #{numbers[index]}', created_at=created_at,
+                        ))
+            bulk_insert(OrderItem, items, self.batch_size)
+            bulk_insert(StockMovement, movements, self.batch_size)
+            item_count += len(items)
+        self.report('order items', item_count)
+        return order_objects
+
+    def create_invoices(self, orders):
+        rng = self.rng
+        # 90% من الطلبات المكتملة لها فاتورة
+        invoiced = [
+            order for order in orders
+            if order.status == Order.OrderStatus.COMPLETED and rng.random() < 0.9
+        ]
+        numbers = allocate_numbers('invoice', 'INV', len(invoiced))
+        invoices, payments = [], []
+        for number, order in zip(numbers, invoiced):
+            created_at = order.created_at
+            issue_date = timezone.localdate(created_at + timedelta(days=rng.randint(0, 3)))
+            total = (order.total_amount * (1 + TAX_RATE / 100)).quantize(Decimal('0.01'))
+            roll = rng.random()
+            # 70% مدفوعة بالكامل، 15% جزئيًا، والباقي بدون دفع
+            paid = total if roll < 0.7 else (total / 2).quantize(Decimal('0.01')) if roll < 0.85 else None
+            invoice = Invoice(
+                invoice_number=number, order_id=order.pk,
+                status=Invoice.InvoiceStatus.PAID if paid == total else Invoice.InvoiceStatus.PENDING,
+                issue_date=issue_date, due_date=issue_date + timedelta(days=30),
+                tax_rate=TAX_RATE, created_at=created_at, updated_at=created_at,
+            )
+            invoices.append(invoice)
+            if paid:
+                payment_date = issue_date + timedelta(days=rng.randint(0, 30))
+                payments.append((invoice, Payment(
+                    amount=paid, method=rng.choice(Payment.PaymentMethod.values),
+                    payment_date=min(payment_date, timezone.localdate(self.now)), created_at=created_at,
+                )))
+
+        bulk_insert(Invoice, invoices, self.batch_size)
+        for invoice, payment in payments:
+            payment.invoice_id = invoice.pk
+        bulk_insert(Payment, [payment for _, payment in payments], self.batch_size)
+        self.report('invoices', len(invoices))
+        self.report('payments', len(payments))
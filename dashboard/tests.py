@@ -1,3 +1,47 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db.models import Q, Sum
 from django.test import TestCase
 
-# Create your tests here.
+from inventory.models import Product
+from invoices.models import Invoice
+from orders.models import Order
+from stats.models import DailySalesRollup
+
+
+class SeedDataTests(TestCase):
+    def seed(self, *args):
+        call_command('seed_data', '--users', '5', '--categories', '3', '--products', '40', '--orders', '150',
+                     '--days', '30', *args, stdout=StringIO())
+
+    def test_stock_matches_movements(self):
+        self.seed()
+        products = Product.objects.annotate(
+            stock_in=Sum('stock_movements__quantity', filter=Q(stock_movements__movement_type='IN')),
+            stock_out=Sum('stock_movements__quantity', filter=Q(stock_movements__movement_type='OUT')),
+        )
+        self.assertEqual(products.count(), 40)
+        for product in products:
+            self.assertEqual(product.quantity, (product.stock_in or 0) - (product.stock_out or 0))
+
+    def test_totals_invoices_and_rollup(self):
+        self.seed()
+        self.assertEqual(Order.objects.count(), 150)
+        expected = Order.totals_expressions()
+        orders = Order.objects.annotate(
+            expected_amount=expected['total_amount'], expected_items=expected['total_items'],
+        )
+        for order in orders:
+            self.assertEqual((order.total_amount, order.total_items), (order.expected_amount, order.expected_items))
+        call_command('rebuild_order_totals', '--check', stdout=StringIO())
+        self.assertFalse(Invoice.objects.exclude(order__status=Order.OrderStatus.COMPLETED).exists())
+        self.assertTrue(DailySalesRollup.objects.exists())
+
+    def test_existing_data_requires_flush(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+        self.seed('--flush')
+        self.assertEqual(Order.objects.count(), 150)
+        self.assertEqual(Product.objects.count(), 40)
@@ -0,0 +1,89 @@
+import logging
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import LowStockEvent, Product
+
+logger = logging.getLogger('inventory.alerts')
+
+BATCH_SIZE = 500
+
+LOW_STOCK = Q(quantity__lte=F('reorder_level'))
+
+
+def sync_low_stock(products=None):
+    """
+    مطابقة is_low_stock مع الكمية وحد إعادة الطلب للمنتجات المحددة (queryset)، وتسجيل
+    LowStockEvent للمنتجات التي انخفضت تحت الحد فقط.
+
+    تستدعى بعد تغيير quantity أو reorder_level في نفس المعاملة، فيكون صف المنتج مقفلًا
+    بالفعل من جملة UPDATE. في الحالة العادية (لا عبور للحد) هي استعلام واحد لا يرجع صفوفًا.
+    يرجع الأحداث الجديدة.
+    """
+    if products is None:
+        products = Product.objects.all()
+
+    with transaction.atomic():
+        changed = list(
+            products.filter(Q(is_low_stock=False) & LOW_STOCK | Q(is_low_stock=True) & ~LOW_STOCK)
+            .select_for_update()
+            .values_list('pk', 'is_low_stock', 'quantity', 'reorder_level')
+        )
+        if not changed:
+            return []
+
+        low = [(pk, quantity, reorder_level) for pk, was_low, quantity, reorder_level in changed if not was_low]
+        restocked = [pk for pk, was_low, _, _ in changed if was_low]
+        if low:
+            Product.objects.filter(pk__in=[pk for pk, _, _ in low]).update(is_low_stock=True)
+        if restocked:
+            Product.objects.filter(pk__in=restocked).update(is_low_stock=False)
+
+        return LowStockEvent.objects.bulk_create([
+            LowStockEvent(product_id=pk, quantity=quantity, reorder_level=reorder_level)
+            for pk, quantity, reorder_level in low
+        ])
+
+
+def notify_low_stock(events):
+    """تسجيل الأحداث وإرسالها بالبريد إلى LOW_STOCK_ALERT_EMAILS (إن وجدت) في رسالة واحدة"""
+    lines = [
+        f"{event.product.sku} {event.product.name}: {event.quantity} left (reorder level {event.reorder_level})"
+        for event in events
+    ]
+    for line in lines:
+        logger.warning('Low stock: %s', line)
+
+    recipients = getattr(settings, 'LOW_STOCK_ALERT_EMAILS', [])
+    if recipients:
+        send_mail(
+            f'Low stock: {len(events)} product(s)',
+            '\n'.join(lines),
+            None,
+            recipients,
+        )
+
+
+def process_events(batch_size=BATCH_SIZE, handler=notify_low_stock):
+    """
+    معالجة دفعة واحدة من الأحداث غير المعالجة بالترتيب. يرجع عدد الأحداث.
+
+    الدفعة تقفل بـ skip_locked فيمكن تشغيل أكثر من عملية معالجة معًا، وإذا فشل handler
+    تبقى الأحداث غير معالجة وتعاد في المرة التالية.
+    """
+    with transaction.atomic():
+        events = list(
+            LowStockEvent.objects.filter(processed_at__isnull=True)
+            .select_for_update(skip_locked=True, of=('self',))
+            .select_related('product')
+            .order_by('pk')[:batch_size]
+        )
+        if not events:
+            return 0
+        handler(events)
+        LowStockEvent.objects.filter(pk__in=[event.pk for event in events]).update(processed_at=timezone.now())
+    return len(events)
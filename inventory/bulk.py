@@ -0,0 +1,249 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from .alerts import sync_low_stock
+from .cache import invalidate_category_choices
+from .models import Category, Product, StockMovement
+from .signals import products_imported
+
+BATCH_SIZE = 2000
+MAX_REPORTED_ERRORS = 100
+
+# الأعمدة في ملفات الاستيراد والتصدير (quantity هي الكمية الأولية للمنتجات الجديدة فقط)
+FIELDS = ['sku', 'name', 'category', 'description', 'cost_price', 'selling_price', 'reorder_level', 'quantity', 'is_active']
+UPDATE_FIELDS = ['name', 'category', 'description', 'cost_price', 'selling_price', 'reorder_level', 'is_active', 'updated_at']
+FORMATS = ('csv', 'jsonl')
+
+
+def guess_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_rows(stream, file_format):
+    """
+    قراءة الصفوف من ملف ثنائي سطرًا بسطر دون تحميله في الذاكرة.
+    يرجع (رقم السطر، قاموس الصف) أو (رقم السطر، رسالة خطأ) للأسطر التالفة.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if file_format == 'jsonl':
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_number, 'Invalid JSON'
+                continue
+            yield line_number, row if isinstance(row, dict) else 'Expected a JSON object'
+    else:
+        # السطر الأول هو العناوين
+        for line_number, row in enumerate(csv.DictReader(text), start=2):
+            yield line_number, row
+
+
+class CategoryMap:
+    """تحويل أسماء الفئات إلى معرفات من ذاكرة محملة مرة واحدة، مع إنشاء الفئات الجديدة دفعة واحدة"""
+
+    def __init__(self):
+        self.ids = dict(Category.objects.values_list('name', 'id'))
+        self.created = 0
+
+    def resolve(self, names):
+        missing = {name for name in names if name not in self.ids}
+        if not missing:
+            return
+        # فئات أنشأها استيراد آخر بعد تحميل الذاكرة لا تحسب ضمن الفئات المنشأة
+        self.ids.update(Category.objects.filter(name__in=missing).values_list('name', 'id'))
+        missing = [name for name in missing if name not in self.ids]
+        if missing:
+            # ignore_conflicts يتجاهل الفئات التي أنشئت بالتزامن، فالعدد من الصفوف الموجودة فعلًا
+            Category.objects.bulk_create([Category(name=name) for name in missing], ignore_conflicts=True)
+            created = dict(Category.objects.filter(name__in=missing).values_list('name', 'id'))
+            self.ids.update(created)
+            self.created += len(created)
+
+
+def _text(row, key, default=''):
+    value = row.get(key)
+    return default if value is None else str(value).strip()
+
+
+def _decimal(row, key):
+    try:
+        value = Decimal(_text(row, key))
+    except InvalidOperation:
+        raise ValueError(f'Invalid {key}')
+    if not value.is_finite() or value < 0 or value >= 10 ** 8 or value.as_tuple().exponent < -2:
+        raise ValueError(f'Invalid {key}')
+    return value
+
+
+def _integer(row, key, default):
+    value = _text(row, key)
+    if not value:
+        return default
+    if not value.isdigit():
+        raise ValueError(f'Invalid {key}')
+    return int(value)
+
+
+def _boolean(row, key):
+    value = row.get(key)
+    if isinstance(value, bool):
+        return value
+    return _text(row, key, 'true').lower() not in ('0', 'false', 'no', 'n')
+
+
+def parse_row(row):
+    """التحقق من صف واحد وإرجاع القيم الجاهزة للإدراج (الفئة بالاسم)"""
+    sku = _text(row, 'sku')
+    name = _text(row, 'name')
+    category = _text(row, 'category')
+    if not sku or len(sku) > Product._meta.get_field('sku').max_length:
+        raise ValueError('Invalid sku')
+    if not name or len(name) > Product._meta.get_field('name').max_length:
+        raise ValueError('Invalid name')
+    if not category or len(category) > Category._meta.get_field('name').max_length:
+        raise ValueError('Invalid category')
+    return {
+        'sku': sku,
+        'name': name,
+        'category': category,
+        'description': _text(row, 'description') or None,
+        'cost_price': _decimal(row, 'cost_price'),
+        'selling_price': _decimal(row, 'selling_price'),
+        'reorder_level': _integer(row, 'reorder_level', 10),
+        'quantity': _integer(row, 'quantity', 0),
+        'is_active': _boolean(row, 'is_active'),
+    }
+
+
+def _import_batch(batch, categories, user, result):
+    categories.resolve({values['category'] for values in batch.values()})
+    existing = set(Product.objects.filter(sku__in=batch.keys()).values_list('sku', flat=True))
+    now = timezone.now()
+
+    products = []
+    for sku, values in batch.items():
+        is_new = sku not in existing
+        products.append(Product(
+            sku=sku,
+            name=values['name'],
+            category_id=categories.ids[values['category']],
+            description=values['description'],
+            cost_price=values['cost_price'],
+            selling_price=values['selling_price'],
+            reorder_level=values['reorder_level'],
+            is_active=values['is_active'],
+            # الكمية للمنتجات الجديدة فقط، والموجودة تتغير عبر حركات المخزون
+            quantity=values['quantity'] if is_new else 0,
+            is_low_stock=is_new and values['quantity'] <= values['reorder_level'],
+            created_at=now,
+            updated_at=now,
+        ))
+
+    with transaction.atomic():
+        Product.objects.bulk_create(
+            products, batch_size=BATCH_SIZE,
+            update_conflicts=True, unique_fields=['sku'], update_fields=UPDATE_FIELDS,
+        )
+        # الرصيد الأولي للمنتجات الجديدة يسجل في السجل مثل product_create
+        new_stock = {sku: batch[sku]['quantity'] for sku in batch if sku not in existing and batch[sku]['quantity']}
+        if new_stock:
+            ids = Product.objects.filter(sku__in=new_stock.keys()).values_list('sku', 'id')
+            StockMovement.objects.bulk_create([
+                StockMovement(
+                    product_id=product_id,
+                    movement_type=StockMovement.MOVEMENT_IN,
+                    quantity=new_stock[sku],
+                    reference='Import',
+                    notes='Initial stock',
+                    created_by=user,
+                )
+                for sku, product_id in ids
+            ], batch_size=BATCH_SIZE)
+        # تغيير reorder_level للمنتجات الموجودة قد ينقلها إلى المخزون المنخفض
+        if existing:
+            sync_low_stock(Product.objects.filter(sku__in=existing))
+
+    result['created'] += len(batch) - len(existing)
+    result['updated'] += len(existing)
+
+
+def import_products(rows, user=None, batch_size=BATCH_SIZE):
+    """
+    إدراج أو تحديث المنتجات حسب sku على دفعات، كل دفعة في معاملة واحدة.
+
+    rows: (رقم السطر، قاموس أو رسالة خطأ) كما يرجعها read_rows. الصفوف غير الصالحة تتخطى
+    وتسجل في errors (أول MAX_REPORTED_ERRORS فقط).
+    """
+    result = {'rows': 0, 'created': 0, 'updated': 0, 'skipped': 0, 'errors': [], 'categories_created': 0}
+    categories = CategoryMap()
+    batch = {}
+
+    for line_number, row in rows:
+        result['rows'] += 1
+        try:
+            if not isinstance(row, dict):
+                raise ValueError(row)
+            values = parse_row(row)
+        except ValueError as e:
+            result['skipped'] += 1
+            if len(result['errors']) < MAX_REPORTED_ERRORS:
+                result['errors'].append((line_number, str(e)))
+            continue
+
+        # تكرار نفس sku داخل الدفعة: الأخير هو المعتمد
+        batch[values['sku']] = values
+        if len(batch) >= batch_size:
+            _import_batch(batch, categories, user, result)
+            batch = {}
+
+    if batch:
+        _import_batch(batch, categories, user, result)
+
+    result['categories_created'] = categories.created
+    if categories.created:
+        invalidate_category_choices()
+    products_imported.send(sender=Product, result=result)
+    return result
+
+
+class _Echo:
+    """كائن يشبه الملف يرجع ما يكتب فيه بدلًا من تخزينه (لـ csv.writer)"""
+
+    def write(self, value):
+        return value
+
+
+def _export_values(row):
+    values = dict(zip(FIELDS, row))
+    for key in ('cost_price', 'selling_price'):
+        values[key] = str(values[key])
+    return values
+
+
+def export_rows(file_format, queryset=None):
+    """توليد ملف المنتجات سطرًا بسطر (للبث عبر StreamingHttpResponse أو الكتابة في ملف)"""
+    queryset = Product.objects.all() if queryset is None else queryset
+    rows = queryset.order_by('id').values_list(
+        'sku', 'name', 'category__name', 'description', 'cost_price', 'selling_price',
+        'reorder_level', 'quantity', 'is_active',
+    ).iterator(chunk_size=BATCH_SIZE)
+
+    if file_format == 'jsonl':
+        for row in rows:
+            yield json.dumps(_export_values(row), ensure_ascii=False) + '\n'
+    else:
+        writer = csv.writer(_Echo())
+        yield writer.writerow(FIELDS)
+        for row in rows:
+            values = _export_values(row)
+            values['description'] = values['description'] or ''
+            values['is_active'] = 'true' if values['is_active'] else 'false'
+            yield writer.writerow([values[key] for key in FIELDS])
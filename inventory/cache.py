@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Category
+
+CATEGORY_CHOICES_KEY = 'inventory:category_choices'
+
+
+def get_category_choices():
+    """قائمة الفئات (id و name) المستخدمة في قوائم التصفية، محفوظة في الكاش"""
+    choices = cache.get(CATEGORY_CHOICES_KEY)
+    if choices is None:
+        choices = list(Category.objects.order_by('name').values('id', 'name'))
+        cache.set(CATEGORY_CHOICES_KEY, choices, getattr(settings, 'CATEGORY_CACHE_TIMEOUT', 3600))
+    return choices
+
+
+def invalidate_category_choices():
+    # الحذف مرة أخرى بعد تأكيد المعاملة حتى لا يبقى ما حسبه طلب آخر قبل التأكيد
+    cache.delete(CATEGORY_CHOICES_KEY)
+    transaction.on_commit(lambda: cache.delete(CATEGORY_CHOICES_KEY))
@@ -0,0 +1,185 @@
+import math
+from datetime import datetime, time, timedelta
+from time import perf_counter
+
+import numpy as np
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .alerts import sync_low_stock
+from .models import Product, ReorderSuggestion, StockMovement
+from .signals import reorder_levels_updated
+
+WINDOW_DAYS = 56
+SMOOTHING = 0.3
+LEAD_TIME_DAYS = 7
+COVER_DAYS = 30
+# معامل مستوى الخدمة (z): 1.65 يعني نفاد المخزون خلال مدة التوريد في حوالي 5% من الحالات
+SERVICE_FACTOR = 1.65
+BATCH_SIZE = 5000
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def load_products():
+    """معرفات المنتجات النشطة (مرتبة) وكمياتها الحالية كمصفوفتين"""
+    rows = Product.objects.filter(is_active=True).order_by('pk').values_list('pk', 'quantity')
+    data = np.array(list(rows.iterator(chunk_size=BATCH_SIZE)), dtype=np.int64).reshape(-1, 2)
+    return data[:, 0], data[:, 1]
+
+
+def load_daily_demand(start, end):
+    """
+    مجموع حركات OUT لكل منتج في كل يوم من start حتى end (بدون end) باستعلام GROUP BY واحد.
+
+    يرجع ثلاث مصفوفات متوازية: معرف المنتج، رقم اليوم من start، والكمية. الأيام بدون
+    مبيعات غير موجودة (مصفوفة متفرقة)، وهذا يكفي لأن الحسابات مجاميع.
+    """
+    rows = (
+        StockMovement.objects
+        .filter(
+            movement_type=StockMovement.MOVEMENT_OUT,
+            created_at__gte=_start_of_day(start),
+            created_at__lt=_start_of_day(end),
+        )
+        .annotate(day=TruncDate('created_at'))
+        .values_list('product_id', 'day')
+        .annotate(total=Sum('quantity'))
+        .order_by()
+    )
+    product_ids, days, quantities = [], [], []
+    origin = start.toordinal()
+    for product_id, day, total in rows.iterator(chunk_size=BATCH_SIZE):
+        product_ids.append(product_id)
+        days.append(day.toordinal() - origin)
+        quantities.append(total)
+    return (
+        np.array(product_ids, dtype=np.int64),
+        np.array(days, dtype=np.int64),
+        np.array(quantities, dtype=np.float64),
+    )
+
+
+def compute_suggestions(product_ids, stock, demand, window=WINDOW_DAYS, smoothing=SMOOTHING,
+                        lead_time=LEAD_TIME_DAYS, cover_days=COVER_DAYS, service_factor=SERVICE_FACTOR):
+    """
+    حساب الطلب اليومي وحد إعادة الطلب والكمية المقترحة لكل المنتجات معًا بعمليات NumPy.
+
+    product_ids و stock: المنتجات مرتبة حسب المعرف مع كمياتها. demand: ما يرجعه load_daily_demand.
+    - المتوسط المتحرك والانحراف المعياري للطلب اليومي على كامل النافذة (الأيام بدون مبيعات = 0).
+    - التنعيم الأسي S = a*x + (1-a)*S السابق، يبدأ من المتوسط ويحسب بصيغته المغلقة كمجموع
+      موزون، فلا حاجة لمصفوفة (منتج × يوم).
+    - مخزون الأمان = z * الانحراف * جذر مدة التوريد، وحد إعادة الطلب = الطلب المتوقع خلال مدة
+      التوريد + مخزون الأمان.
+    - الكمية المقترحة: عند الوصول إلى الحد، ما يرفع المخزون إلى الحد + طلب cover_days يومًا.
+    """
+    demand_products, days, quantities = demand
+    count = len(product_ids)
+
+    # موقع كل صف في مصفوفة المنتجات، وتجاهل المنتجات غير النشطة
+    positions = np.searchsorted(product_ids, demand_products)
+    known = positions < count
+    known[known] = product_ids[positions[known]] == demand_products[known]
+    positions, days, quantities = positions[known], days[known], quantities[known]
+
+    totals = np.bincount(positions, weights=quantities, minlength=count)
+    squares = np.bincount(positions, weights=quantities ** 2, minlength=count)
+    average = totals / window
+    deviation = np.sqrt(np.maximum(squares / window - average ** 2, 0))
+
+    decay = 1 - smoothing
+    weights = smoothing * decay ** (window - 1 - days)
+    forecast = np.bincount(positions, weights=quantities * weights, minlength=count) + decay ** window * average
+
+    safety_stock = np.ceil(service_factor * deviation * math.sqrt(lead_time))
+    reorder_level = np.ceil(forecast * lead_time) + safety_stock
+    target = reorder_level + np.ceil(forecast * cover_days)
+    order_quantity = np.where(stock <= reorder_level, np.maximum(target - stock, 0), 0)
+
+    return {
+        'average_demand': average,
+        'forecast_demand': forecast,
+        'safety_stock': safety_stock.astype(np.int64),
+        'reorder_level': reorder_level.astype(np.int64),
+        'order_quantity': order_quantity.astype(np.int64),
+    }
+
+
+def save_suggestions(product_ids, suggestions, batch_size=BATCH_SIZE):
+    """
+    كتابة الاقتراحات بجمل INSERT ... ON CONFLICT UPDATE على دفعات. تحفظ فقط المنتجات التي لها
+    مبيعات في النافذة (عادة جزء صغير من الكتالوج)، وتحذف الاقتراحات القديمة لباقي المنتجات.
+    يرجع عدد الاقتراحات المحفوظة.
+    """
+    now = timezone.now()
+    fields = ['average_demand', 'forecast_demand', 'safety_stock', 'reorder_level', 'order_quantity']
+    selling = suggestions['average_demand'] > 0
+    # tolist() يحول القيم إلى أنواع Python مرة واحدة لكل عمود
+    columns = [product_ids[selling].tolist()] + [suggestions[field][selling].tolist() for field in fields]
+
+    with transaction.atomic():
+        for start in range(0, len(columns[0]), batch_size):
+            ReorderSuggestion.objects.bulk_create(
+                [
+                    ReorderSuggestion(
+                        product_id=row[0], computed_at=now,
+                        **{field: value for field, value in zip(fields, row[1:])},
+                    )
+                    for row in zip(*(column[start:start + batch_size] for column in columns))
+                ],
+                update_conflicts=True, unique_fields=['product'], update_fields=fields + ['computed_at'],
+            )
+        # منتجات بدون مبيعات الآن أو غير نشطة
+        ReorderSuggestion.objects.filter(computed_at__lt=now).delete()
+    return len(columns[0])
+
+
+def suggest_reorder_levels(window=WINDOW_DAYS, smoothing=SMOOTHING, lead_time=LEAD_TIME_DAYS,
+                           cover_days=COVER_DAYS, service_factor=SERVICE_FACTOR, today=None):
+    """
+    حساب وحفظ الاقتراحات لكل المنتجات النشطة من حركات OUT في آخر window يومًا كاملًا.
+    يرجع (عدد المنتجات، عدد الاقتراحات المحفوظة، الأزمنة بالثواني لكل مرحلة).
+    """
+    today = today or timezone.localdate()
+    timings = {}
+
+    started = perf_counter()
+    product_ids, stock = load_products()
+    demand = load_daily_demand(today - timedelta(days=window), today)
+    timings['load'] = perf_counter() - started
+
+    started = perf_counter()
+    suggestions = compute_suggestions(
+        product_ids, stock, demand, window=window, smoothing=smoothing,
+        lead_time=lead_time, cover_days=cover_days, service_factor=service_factor,
+    )
+    timings['compute'] = perf_counter() - started
+
+    started = perf_counter()
+    saved = save_suggestions(product_ids, suggestions)
+    timings['save'] = perf_counter() - started
+
+    return len(product_ids), saved, timings
+
+
+def apply_reorder_levels():
+    """
+    نسخ الحد المقترح إلى Product.reorder_level بجملة UPDATE واحدة. الاقتراحات موجودة فقط للمنتجات
+    التي لها مبيعات، والمنتج بدون مبيعات يبقى على حده اليدوي. يرجع عدد المنتجات المعدلة.
+    """
+    suggested = ReorderSuggestion.objects.filter(product=OuterRef('pk')).values('reorder_level')[:1]
+    with transaction.atomic():
+        updated = (
+            Product.objects
+            .filter(reorder_suggestion__isnull=False)
+            .exclude(reorder_level=Subquery(suggested))
+            .update(reorder_level=Subquery(suggested), updated_at=timezone.now())
+        )
+        # الحد الجديد قد ينقل منتجات إلى المخزون المنخفض أو يخرجها منه
+        sync_low_stock()
+    reorder_levels_updated.send(sender=Product, count=updated)
+    return updated
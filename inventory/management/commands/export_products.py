@@ -0,0 +1,29 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from inventory.bulk import FORMATS, export_rows, guess_format
+
+
+class Command(BaseCommand):
+    help = 'Stream all products to a CSV or JSONL file (or stdout with "-")'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Output file, or "-" for stdout')
+        parser.add_argument('--format', choices=FORMATS, help='File format (default: from the file extension, csv for stdout)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('csv' if path == '-' else guess_format(path))
+
+        if path == '-':
+            sys.stdout.writelines(export_rows(file_format))
+            return
+
+        count = 0
+        with open(path, 'w', encoding='utf-8', newline='') as output:
+            for line in export_rows(file_format):
+                output.write(line)
+                count += 1
+        if file_format == 'csv':
+            count -= 1
+        self.stderr.write(self.style.SUCCESS(f'Exported {count} product(s) to {path}'))
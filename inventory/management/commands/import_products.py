@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from inventory.bulk import BATCH_SIZE, FORMATS, guess_format, import_products, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Insert or update products by SKU from a CSV or JSONL file, streamed in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file')
+        parser.add_argument('--format', choices=FORMATS, help='File format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or guess_format(options['path'])
+        start = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as stream:
+                result = import_products(read_rows(stream, file_format), batch_size=options['batch_size'])
+        except OSError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - start
+
+        for line_number, error in result['errors']:
+            self.stderr.write(f'Line {line_number}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['rows']} row(s) in {elapsed:.1f}s ({result['rows'] / max(elapsed, 0.001):,.0f} rows/s): "
+            f"{result['created']} created, {result['updated']} updated, {result['skipped']} skipped, "
+            f"{result['categories_created']} categories created"
+        ))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from inventory.alerts import BATCH_SIZE, process_events, sync_low_stock
+
+
+class Command(BaseCommand):
+    help = (
+        'Send pending low-stock alerts in batches. With --follow keeps running and checks for new events '
+        'every --interval seconds (only the small queue of pending events is read, not the catalog).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--follow', action='store_true', help='Keep running and wait for new events')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds between checks with --follow')
+        parser.add_argument(
+            '--resync', action='store_true',
+            help='Recompute is_low_stock for all products first (after direct database edits)',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        if options['resync']:
+            created = sync_low_stock()
+            self.stdout.write(f'Resynced low stock flags, {len(created)} new event(s)')
+
+        total = 0
+        try:
+            while True:
+                processed = process_events(batch_size=options['batch_size'])
+                total += processed
+                if processed:
+                    self.stdout.write(f'Processed {processed} event(s)')
+                    continue
+                if not options['follow']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Processed {total} low stock event(s)'))
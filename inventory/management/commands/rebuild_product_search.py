@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from inventory.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index from the products table'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        start = time.perf_counter()
+        with connection.cursor() as cursor:
+            backend.rebuild(cursor)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt product search index ({type(backend).__name__}) in {time.perf_counter() - start:.1f}s'
+        ))
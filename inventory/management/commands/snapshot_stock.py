@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from inventory.snapshots import take_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Write a stock snapshot (quantity and cost per product) for the end of a day. Meant to run nightly.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to snapshot (YYYY-MM-DD), defaults to yesterday')
+        parser.add_argument('--days', type=int, default=1, help='Number of consecutive days ending at --date')
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                day = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Invalid --date, expected YYYY-MM-DD')
+        else:
+            day = timezone.localdate() - timedelta(days=1)
+
+        # الأيام من الأقدم إلى الأحدث حتى تبنى كل لقطة على السابقة
+        for offset in range(options['days'] - 1, -1, -1):
+            current = day - timedelta(days=offset)
+            written = take_snapshot(current)
+            self.stdout.write(self.style.SUCCESS(f'Stock snapshot for {current}: {written} product(s)'))
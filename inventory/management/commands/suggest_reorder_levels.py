@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from inventory.forecast import (
+    COVER_DAYS, LEAD_TIME_DAYS, SERVICE_FACTOR, SMOOTHING, WINDOW_DAYS, apply_reorder_levels, suggest_reorder_levels
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Forecast daily demand per product from recent stock-out movements and store suggested reorder levels '
+        'and order quantities. Meant to run nightly; --apply also copies the suggested levels to the products.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=int, default=WINDOW_DAYS, help='Days of sales history')
+        parser.add_argument('--smoothing', type=float, default=SMOOTHING, help='Exponential smoothing factor (0-1)')
+        parser.add_argument('--lead-time', type=int, default=LEAD_TIME_DAYS, help='Supplier lead time in days')
+        parser.add_argument('--cover-days', type=int, default=COVER_DAYS, help='Days of demand each order should cover')
+        parser.add_argument('--service-factor', type=float, default=SERVICE_FACTOR,
+                            help='Safety stock factor (z), 1.65 is about a 95%% service level')
+        parser.add_argument('--apply', action='store_true', help='Set Product.reorder_level to the suggestion')
+
+    def handle(self, *args, **options):
+        if options['window'] < 1 or options['lead_time'] < 0 or options['cover_days'] < 0:
+            raise CommandError('--window must be positive, --lead-time and --cover-days cannot be negative')
+        if not 0 < options['smoothing'] <= 1:
+            raise CommandError('--smoothing must be between 0 and 1')
+
+        count, saved, timings = suggest_reorder_levels(
+            window=options['window'],
+            smoothing=options['smoothing'],
+            lead_time=options['lead_time'],
+            cover_days=options['cover_days'],
+            service_factor=options['service_factor'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Forecast {count} product(s), {saved} with sales in the last {options["window"]} days '
+            f'(load {timings["load"]:.2f}s, compute {timings["compute"]:.2f}s, save {timings["save"]:.2f}s)'
+        ))
+
+        if options['apply']:
+            updated = apply_reorder_levels()
+            self.stdout.write(self.style.SUCCESS(f'Updated the reorder level of {updated} product(s)'))
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# نسخة ثابتة من SQL الفهرس وقت هذا الترحيل، حتى لا يتغير سلوكه مع تعديل inventory.search
+SQLITE_INSTALL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS inventory_product_fts USING fts5(
+        name, sku, description,
+        content='inventory_product', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2 tokenchars '-_'",
+        prefix='2 3'
+    )""",
+    "INSERT INTO inventory_product_fts(inventory_product_fts, rank) VALUES('rank', 'bm25(5.0, 10.0, 1.0)')",
+    """CREATE TRIGGER IF NOT EXISTS inventory_product_fts_insert AFTER INSERT ON inventory_product BEGIN
+        INSERT INTO inventory_product_fts(rowid, name, sku, description)
+        VALUES (new.id, new.name, new.sku, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS inventory_product_fts_delete AFTER DELETE ON inventory_product BEGIN
+        INSERT INTO inventory_product_fts(inventory_product_fts, rowid, name, sku, description)
+        VALUES ('delete', old.id, old.name, old.sku, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS inventory_product_fts_update
+    AFTER UPDATE OF name, sku, description ON inventory_product BEGIN
+        INSERT INTO inventory_product_fts(inventory_product_fts, rowid, name, sku, description)
+        VALUES ('delete', old.id, old.name, old.sku, old.description);
+        INSERT INTO inventory_product_fts(rowid, name, sku, description)
+        VALUES (new.id, new.name, new.sku, new.description);
+    END""",
+    "INSERT INTO inventory_product_fts(inventory_product_fts) VALUES('rebuild')",
+    "INSERT INTO inventory_product_fts(inventory_product_fts) VALUES('optimize')",
+    'ANALYZE',
+]
+
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS inventory_product_fts_insert',
+    'DROP TRIGGER IF EXISTS inventory_product_fts_delete',
+    'DROP TRIGGER IF EXISTS inventory_product_fts_update',
+    'DROP TABLE IF EXISTS inventory_product_fts',
+]
+
+POSTGRES_INSTALL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    "ALTER TABLE inventory_product ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(sku, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'C')) STORED",
+    'CREATE INDEX IF NOT EXISTS product_search_vector_idx ON inventory_product USING gin (search_vector)',
+    'CREATE INDEX IF NOT EXISTS product_sku_trgm_idx ON inventory_product USING gin (upper(sku) gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS product_name_trgm_idx ON inventory_product USING gin (name gin_trgm_ops)',
+]
+
+POSTGRES_UNINSTALL = [
+    'DROP INDEX IF EXISTS product_name_trgm_idx',
+    'DROP INDEX IF EXISTS product_sku_trgm_idx',
+    'DROP INDEX IF EXISTS product_search_vector_idx',
+    'ALTER TABLE inventory_product DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def run_statements(schema_editor, statements):
+    # قواعد البيانات الأخرى تستخدم البحث بـ icontains بدون فهرس
+    statements = statements.get(schema_editor.connection.vendor, [])
+    with schema_editor.connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def install_search_index(apps, schema_editor):
+    run_statements(schema_editor, {'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRES_INSTALL})
+
+
+def uninstall_search_index(apps, schema_editor):
+    run_statements(schema_editor, {'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRES_UNINSTALL})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_remove_product_price_product_selling_price_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchEntry',
+            fields=[
+                ('product', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='inventory.product')),
+                ('document', models.TextField(db_column='inventory_product_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'inventory_product_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
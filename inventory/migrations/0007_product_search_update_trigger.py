@@ -0,0 +1,30 @@
+from django.db import migrations
+
+# مشغل التحديث أصبح يتخطى الصفوف التي لم تتغير نصوصها (نسخة ثابتة وقت هذا الترحيل)
+UPDATE_TRIGGER = """CREATE TRIGGER IF NOT EXISTS inventory_product_fts_update
+AFTER UPDATE OF name, sku, description ON inventory_product
+WHEN old.name IS NOT new.name OR old.sku IS NOT new.sku OR old.description IS NOT new.description BEGIN
+    INSERT INTO inventory_product_fts(inventory_product_fts, rowid, name, sku, description)
+    VALUES ('delete', old.id, old.name, old.sku, old.description);
+    INSERT INTO inventory_product_fts(rowid, name, sku, description)
+    VALUES (new.id, new.name, new.sku, new.description);
+END"""
+
+
+def reinstall_update_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP TRIGGER IF EXISTS inventory_product_fts_update')
+        cursor.execute(UPDATE_TRIGGER)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_stocksnapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(reinstall_update_trigger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def set_low_stock(apps, schema_editor):
+    # الحالة الحالية للمنتجات الموجودة بدون إنشاء أحداث
+    Product = apps.get_model('inventory', 'Product')
+    Product.objects.filter(quantity__lte=F('reorder_level')).update(is_low_stock=True)
+
+
+# مشغلات الفهرس النصي كما كانت وقت هذا الترحيل (نسخة ثابتة)
+SEARCH_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS inventory_product_fts_insert AFTER INSERT ON inventory_product BEGIN
+        INSERT INTO inventory_product_fts(rowid, name, sku, description)
+        VALUES (new.id, new.name, new.sku, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS inventory_product_fts_delete AFTER DELETE ON inventory_product BEGIN
+        INSERT INTO inventory_product_fts(inventory_product_fts, rowid, name, sku, description)
+        VALUES ('delete', old.id, old.name, old.sku, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS inventory_product_fts_update
+    AFTER UPDATE OF name, sku, description ON inventory_product
+    WHEN old.name IS NOT new.name OR old.sku IS NOT new.sku OR old.description IS NOT new.description BEGIN
+        INSERT INTO inventory_product_fts(inventory_product_fts, rowid, name, sku, description)
+        VALUES ('delete', old.id, old.name, old.sku, old.description);
+        INSERT INTO inventory_product_fts(rowid, name, sku, description)
+        VALUES (new.id, new.name, new.sku, new.description);
+    END""",
+    "INSERT INTO inventory_product_fts(inventory_product_fts) VALUES('rebuild')",
+]
+
+
+def reinstall_search_triggers(apps, schema_editor):
+    # إضافة عمود في SQLite تعيد إنشاء جدول المنتجات وتحذف مشغلات الفهرس النصي
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for statement in SEARCH_TRIGGERS:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_product_search_update_trigger'),
+    ]
+
+    operations = [
+        # عند التراجع تعمل بعد حذف العمود
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search_triggers),
+        migrations.CreateModel(
+            name='LowStockEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Quantity')),
+                ('reorder_level', models.PositiveIntegerField(verbose_name='Reorder Level')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Processed At')),
+            ],
+            options={
+                'verbose_name': 'Low Stock Event',
+                'verbose_name_plural': 'Low Stock Events',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='is_low_stock',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Low Stock'),
+        ),
+        migrations.RunPython(set_low_stock, migrations.RunPython.noop),
+        migrations.RunPython(reinstall_search_triggers, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_low_stock', True)), fields=['quantity'], name='product_low_stock_idx'),
+        ),
+        migrations.AddField(
+            model_name='lowstockevent',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='low_stock_events', to='inventory.product', verbose_name='Product'),
+        ),
+        migrations.AddIndex(
+            model_name='lowstockevent',
+            index=models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['id'], name='low_stock_event_pending_idx'),
+        ),
+    ]
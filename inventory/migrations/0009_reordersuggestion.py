@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_low_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReorderSuggestion',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reorder_suggestion', serialize=False, to='inventory.product', verbose_name='Product')),
+                ('average_demand', models.FloatField(verbose_name='Average Daily Demand')),
+                ('forecast_demand', models.FloatField(verbose_name='Forecast Daily Demand')),
+                ('safety_stock', models.PositiveIntegerField(verbose_name='Safety Stock')),
+                ('reorder_level', models.PositiveIntegerField(verbose_name='Suggested Reorder Level')),
+                ('order_quantity', models.PositiveIntegerField(verbose_name='Suggested Order Quantity')),
+                ('computed_at', models.DateTimeField(verbose_name='Computed At')),
+            ],
+            options={
+                'verbose_name': 'Reorder Suggestion',
+                'verbose_name_plural': 'Reorder Suggestions',
+            },
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse
 from users.models import User
@@ -32,6 +34,8 @@ class Product(models.Model):
     reorder_level = models.PositiveIntegerField(default=10, verbose_name=_('Reorder Level'))
     image = models.ImageField(upload_to='products/', blank=True, null=True, verbose_name=_('Image'))
     is_active = models.BooleanField(default=True, verbose_name=_('Active'))
+    # quantity <= reorder_level، يحدث مع كل تغيير في المخزون (انظر inventory.alerts.sync_low_stock)
+    is_low_stock = models.BooleanField(default=False, editable=False, verbose_name=_('Low Stock'))
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -41,9 +45,24 @@ class Product(models.Model):
     def get_absolute_url(self):
         return reverse('product-detail', kwargs={'pk': self.pk})
     
-    @property
-    def is_low_stock(self):
-        return self.quantity <= self.reorder_level
+    def save(self, *args, **kwargs):
+        from .alerts import sync_low_stock
+        
+        if self._state.adding:
+            # الحالة الأولية للمنتج الجديد لا تعتبر عبورًا للحد
+            self.is_low_stock = self.quantity <= self.reorder_level
+            super().save(*args, **kwargs)
+            return
+        
+        # تغيير reorder_level قد ينقل المنتج إلى المخزون المنخفض
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            sync_low_stock(Product.objects.filter(pk=self.pk))
+    
+    def quantity_as_of(self, day):
+        """الكمية في نهاية يوم معين (من أقرب لقطة مخزون والحركات التي بعدها)"""
+        from .snapshots import stock_levels_as_of
+        return stock_levels_as_of(day, product_ids=[self.pk]).get(self.pk, 0)
     
     @property
     def profit_margin(self):
@@ -55,6 +74,29 @@ class Product(models.Model):
         verbose_name = _('Product')
         verbose_name_plural = _('Products')
         ordering = ['name']
+        indexes = [
+            # فهرس جزئي صغير لصفحة المخزون المنخفض وإحصائياتها
+            models.Index(fields=['quantity'], condition=Q(is_low_stock=True), name='product_low_stock_idx'),
+        ]
+
+
+class ProductSearchEntry(models.Model):
+    """
+    صف في فهرس البحث النصي للمنتجات (جدول FTS5 افتراضي على SQLite).
+
+    الجدول ينشأ ويحدث عبر inventory.search وليس عبر Django، والنموذج موجود فقط
+    لربط نتائج البحث بالمنتجات في نفس الاستعلام.
+    """
+    product = models.OneToOneField(
+        Product, primary_key=True, db_column='rowid', on_delete=models.DO_NOTHING, related_name='search_entry'
+    )
+    # العمود المخفي الذي يحمل اسم الجدول، ويستخدم مع MATCH
+    document = models.TextField(db_column='inventory_product_fts')
+    rank = models.FloatField()
+    
+    class Meta:
+        managed = False
+        db_table = 'inventory_product_fts'
 
 
 class StockMovement(models.Model):
@@ -79,25 +121,117 @@ class StockMovement(models.Model):
     def __str__(self):
         return f"{self.get_movement_type_display()} - {self.product.name} ({self.quantity})"
     
+    def apply_to_stock(self):
+        """
+        تطبيق الحركة على كمية المنتج بجملة UPDATE شرطية واحدة.
+        
+        الخصم يتم فقط إذا كانت الكمية كافية (WHERE quantity >= n) لذلك لا تضيع التحديثات
+        المتزامنة على نفس المنتج ولا يصبح المخزون سالبًا. بعدها يحدث is_low_stock
+        ويسجل حدث إذا انخفض المنتج تحت حد إعادة الطلب.
+        """
+        from .alerts import sync_low_stock
+        
+        products = Product.objects.filter(pk=self.product_id)
+        now = timezone.now()
+        
+        if self.movement_type == self.MOVEMENT_IN:
+            products.update(quantity=F('quantity') + self.quantity, updated_at=now)
+        elif self.movement_type == self.MOVEMENT_OUT:
+            updated = products.filter(quantity__gte=self.quantity).update(
+                quantity=F('quantity') - self.quantity, updated_at=now
+            )
+            if not updated:
+                raise ValueError(_('Insufficient stock available'))
+        elif self.movement_type == self.MOVEMENT_ADJUSTMENT:
+            products.update(quantity=self.quantity, updated_at=now)
+        
+        sync_low_stock(products)
+    
     def save(self, *args, **kwargs):
         is_new = self.pk is None
         
-        if is_new:
-            if self.movement_type == self.MOVEMENT_IN:
-                self.product.quantity += self.quantity
-            elif self.movement_type == self.MOVEMENT_OUT:
-                if self.product.quantity >= self.quantity:
-                    self.product.quantity -= self.quantity
-                else:
-                    raise ValueError(_('Insufficient stock available'))
-            elif self.movement_type == self.MOVEMENT_ADJUSTMENT:
-                self.product.quantity = self.quantity
-            
-            self.product.save()
+        if not is_new:
+            super().save(*args, **kwargs)
+            return
         
-        super().save(*args, **kwargs)
+        # الحركة وتعديل المخزون في نفس المعاملة
+        with transaction.atomic():
+            self.apply_to_stock()
+            super().save(*args, **kwargs)
+        
+        self.product.refresh_from_db(fields=['quantity', 'is_low_stock', 'updated_at'])
     
     class Meta:
         verbose_name = _('Stock Movement')
         verbose_name_plural = _('Stock Movements')
-        ordering = ['-created_at']
\ No newline at end of file
+        indexes = [
+            # فهارس مركبة تخدم التصفح بالمؤشر (created_at, id) في سجل الحركات مع كل مرشح
+            models.Index(fields=['-created_at', '-id'], name='movement_created_idx'),
+            models.Index(fields=['product', '-created_at', '-id'], name='movement_product_created_idx'),
+            models.Index(fields=['movement_type', '-created_at', '-id'], name='movement_type_created_idx'),
+        ]
+        ordering = ['-created_at']
+
+
+class StockSnapshot(models.Model):
+    """كمية المنتج وسعر تكلفته في نهاية يوم معين، تكتب بالأمر snapshot_stock"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='snapshots', verbose_name=_('Product'))
+    date = models.DateField(verbose_name=_('Date'))
+    quantity = models.PositiveIntegerField(verbose_name=_('Quantity'))
+    cost_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_('Cost Price'))
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.product} @ {self.date}: {self.quantity}"
+    
+    class Meta:
+        verbose_name = _('Stock Snapshot')
+        verbose_name_plural = _('Stock Snapshots')
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='unique_stock_snapshot'),
+        ]
+
+
+class LowStockEvent(models.Model):
+    """
+    حدث انخفاض منتج تحت حد إعادة الطلب (outbox).
+
+    يسجل في نفس معاملة تغيير المخزون، ويعالج على دفعات بالأمر process_low_stock_events.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='low_stock_events', verbose_name=_('Product'))
+    quantity = models.PositiveIntegerField(verbose_name=_('Quantity'))
+    reorder_level = models.PositiveIntegerField(verbose_name=_('Reorder Level'))
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True, verbose_name=_('Processed At'))
+    
+    def __str__(self):
+        return f"{self.product} low stock ({self.quantity}/{self.reorder_level})"
+    
+    class Meta:
+        verbose_name = _('Low Stock Event')
+        verbose_name_plural = _('Low Stock Events')
+        indexes = [
+            # الأحداث غير المعالجة فقط، حتى يبقى سحب الدفعة التالية سريعًا مهما كبر الجدول
+            models.Index(fields=['id'], condition=Q(processed_at__isnull=True), name='low_stock_event_pending_idx'),
+        ]
+        ordering = ['-created_at']
+
+
+class ReorderSuggestion(models.Model):
+    """حد إعادة الطلب والكمية المقترحة لكل منتج من معدل المبيعات، يكتب بالأمر suggest_reorder_levels"""
+    product = models.OneToOneField(
+        Product, primary_key=True, on_delete=models.CASCADE, related_name='reorder_suggestion', verbose_name=_('Product')
+    )
+    average_demand = models.FloatField(verbose_name=_('Average Daily Demand'))
+    forecast_demand = models.FloatField(verbose_name=_('Forecast Daily Demand'))
+    safety_stock = models.PositiveIntegerField(verbose_name=_('Safety Stock'))
+    reorder_level = models.PositiveIntegerField(verbose_name=_('Suggested Reorder Level'))
+    order_quantity = models.PositiveIntegerField(verbose_name=_('Suggested Order Quantity'))
+    computed_at = models.DateTimeField(verbose_name=_('Computed At'))
+    
+    def __str__(self):
+        return f"{self.product}: reorder at {self.reorder_level}, order {self.order_quantity}"
+    
+    class Meta:
+        verbose_name = _('Reorder Suggestion')
+        verbose_name_plural = _('Reorder Suggestions')
@@ -0,0 +1,255 @@
+import re
+
+from django.db import connection as default_connection
+from django.db.models import BooleanField, Case, F, FloatField, Lookup, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from .models import ProductSearchEntry
+
+# الرموز التي تعتبر جزءًا من الكلمة حتى يبقى رمز المنتج (SKU) مثل AB-100 كلمة واحدة
+TOKEN_PATTERN = re.compile(r'[\w\-]+')
+
+FTS_TABLE = 'inventory_product_fts'
+
+
+class Match(Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+ProductSearchEntry._meta.get_field('document').register_lookup(Match)
+
+
+def get_terms(query):
+    return TOKEN_PATTERN.findall(query or '')
+
+
+def escape_like(text):
+    """تهريب رموز LIKE الخاصة (\\ و % و _) حتى تطابق حرفيًا"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class SQLiteSearchBackend:
+    """
+    بحث باستخدام جدول FTS5 افتراضي يأخذ محتواه من جدول المنتجات.
+
+    الفهرس يحدث بمشغلات (triggers) داخل قاعدة البيانات، لذلك يبقى متزامنًا مع أي كتابة
+    على المنتجات بما في ذلك update و bulk_create. تعديل الكمية لا يلمس الفهرس لأن
+    مشغل التحديث مقيد بأعمدة الاسم والرمز والوصف.
+    """
+
+    # الشرط WHEN يتخطى الصفوف التي لم تتغير نصوصها (مثل إعادة استيراد نفس الملف)
+    update_trigger = f"""CREATE TRIGGER IF NOT EXISTS inventory_product_fts_update
+    AFTER UPDATE OF name, sku, description ON inventory_product
+    WHEN old.name IS NOT new.name OR old.sku IS NOT new.sku OR old.description IS NOT new.description BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, sku, description)
+        VALUES ('delete', old.id, old.name, old.sku, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, sku, description)
+        VALUES (new.id, new.name, new.sku, new.description);
+    END"""
+
+    table_statements = [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            name, sku, description,
+            content='inventory_product', content_rowid='id',
+            tokenize="unicode61 remove_diacritics 2 tokenchars '-_'",
+            prefix='2 3'
+        )""",
+        # الأوزان: الرمز ثم الاسم ثم الوصف
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES('rank', 'bm25(5.0, 10.0, 1.0)')",
+    ]
+
+    triggers = {
+        'inventory_product_fts_insert': f"""CREATE TRIGGER IF NOT EXISTS inventory_product_fts_insert AFTER INSERT ON inventory_product BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, name, sku, description)
+            VALUES (new.id, new.name, new.sku, new.description);
+        END""",
+        'inventory_product_fts_delete': f"""CREATE TRIGGER IF NOT EXISTS inventory_product_fts_delete
+        AFTER DELETE ON inventory_product BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, sku, description)
+            VALUES ('delete', old.id, old.name, old.sku, old.description);
+        END""",
+        'inventory_product_fts_update': update_trigger,
+    }
+
+    drop_statements = [
+        'DROP TRIGGER IF EXISTS inventory_product_fts_insert',
+        'DROP TRIGGER IF EXISTS inventory_product_fts_delete',
+        'DROP TRIGGER IF EXISTS inventory_product_fts_update',
+        f'DROP TABLE IF EXISTS {FTS_TABLE}',
+    ]
+
+    def install(self, cursor):
+        for statement in [*self.table_statements, *self.triggers.values()]:
+            cursor.execute(statement)
+        self.rebuild(cursor)
+
+    def uninstall(self, cursor):
+        for statement in self.drop_statements:
+            cursor.execute(statement)
+
+    def missing_triggers(self, cursor):
+        """أسماء مشغلات الفهرس غير الموجودة (فارغة إذا لم يكن جدول الفهرس موجودًا)"""
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        if cursor.fetchone() is None:
+            return []
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'inventory_product'")
+        existing = {name for name, in cursor.fetchall()}
+        return [name for name in self.triggers if name not in existing]
+
+    def repair(self, cursor):
+        """
+        إعادة إنشاء المشغلات المفقودة. SQLite يعيد إنشاء جدول المنتجات في بعض عمليات
+        الترحيل (مثل AlterField و AddField) فتحذف مشغلاته بدون أي خطأ، ويتوقف تحديث
+        الفهرس. بعدها يعاد بناء الفهرس لما كتب أثناء غيابها. يرجع أسماء المشغلات المعادة.
+        """
+        missing = self.missing_triggers(cursor)
+        for name in missing:
+            cursor.execute(self.triggers[name])
+        if missing:
+            self.rebuild(cursor)
+        return missing
+
+    def rebuild(self, cursor):
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')")
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('optimize')")
+        # بدون إحصائيات قد يختار SQLite المرور على المنتجات وتنفيذ MATCH لكل صف عند
+        # الجمع بين البحث وتصفية الفئة، بدلًا من البدء بنتائج الفهرس
+        cursor.execute('ANALYZE')
+
+    def search(self, queryset, terms):
+        # كل كلمة تطابق كبادئة، والكلمات مجتمعة بـ AND
+        match = ' '.join(f'"{term}"*' for term in terms)
+        # rank في FTS5 أصغر للنتائج الأفضل، لذلك نعكس الإشارة
+        return queryset.filter(search_entry__document__match=match).annotate(
+            search_rank=F('search_entry__rank') * -1
+        )
+
+
+class PostgresSearchBackend:
+    """
+    بحث باستخدام عمود tsvector مولد مع فهرس GIN، وفهارس trigram لبادئة الرمز
+    والأخطاء الإملائية في الاسم. العمود المولد يحدث تلقائيًا مع كل كتابة.
+    """
+
+    vector = (
+        "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(sku, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+    )
+
+    statements = [
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        f'ALTER TABLE inventory_product ADD COLUMN IF NOT EXISTS search_vector tsvector '
+        f'GENERATED ALWAYS AS ({vector}) STORED',
+        'CREATE INDEX IF NOT EXISTS product_search_vector_idx ON inventory_product USING gin (search_vector)',
+        'CREATE INDEX IF NOT EXISTS product_sku_trgm_idx ON inventory_product USING gin (upper(sku) gin_trgm_ops)',
+        'CREATE INDEX IF NOT EXISTS product_name_trgm_idx ON inventory_product USING gin (name gin_trgm_ops)',
+    ]
+
+    drop_statements = [
+        'DROP INDEX IF EXISTS product_name_trgm_idx',
+        'DROP INDEX IF EXISTS product_sku_trgm_idx',
+        'DROP INDEX IF EXISTS product_search_vector_idx',
+        'ALTER TABLE inventory_product DROP COLUMN IF EXISTS search_vector',
+    ]
+
+    def install(self, cursor):
+        for statement in self.statements:
+            cursor.execute(statement)
+
+    def uninstall(self, cursor):
+        for statement in self.drop_statements:
+            cursor.execute(statement)
+
+    def repair(self, cursor):
+        # العمود المولد وفهارسه تبقى مع تعديل الجدول في PostgreSQL
+        return []
+
+    def rebuild(self, cursor):
+        # العمود المولد لا يحتاج إلى إعادة حساب، فقط إعادة بناء الفهارس
+        for index in ('product_search_vector_idx', 'product_sku_trgm_idx', 'product_name_trgm_idx'):
+            cursor.execute(f'REINDEX INDEX {index}')
+
+    def search(self, queryset, terms):
+        tsquery = ' & '.join(f"'{term}':*" for term in terms)
+        text = ' '.join(terms)
+        # _ جزء من الكلمة (مثل SKU_1) ويطابق أي حرف في LIKE إذا لم يهرب
+        sku_prefix = escape_like(text.upper()) + '%'
+        # %% هو عامل التشابه (%) في pg_trgm بعد تهريبه
+        return queryset.alias(
+            search_match=RawSQL(
+                "(inventory_product.search_vector @@ to_tsquery('simple', %s)"
+                " OR upper(inventory_product.sku) LIKE %s"
+                " OR inventory_product.name %% %s)",
+                (tsquery, sku_prefix, text),
+                output_field=BooleanField(),
+            )
+        ).filter(search_match=True).annotate(
+            search_rank=RawSQL(
+                "ts_rank(inventory_product.search_vector, to_tsquery('simple', %s))"
+                " + similarity(inventory_product.name, %s)"
+                " + CASE WHEN upper(inventory_product.sku) LIKE %s THEN 1 ELSE 0 END",
+                (tsquery, text, sku_prefix),
+                output_field=FloatField(),
+            )
+        )
+
+
+class BasicSearchBackend:
+    """لقواعد البيانات الأخرى: البحث القديم بـ icontains مع بادئة الرمز في المقدمة"""
+
+    def install(self, cursor):
+        pass
+
+    def uninstall(self, cursor):
+        pass
+
+    def repair(self, cursor):
+        return []
+
+    def rebuild(self, cursor):
+        pass
+
+    def search(self, queryset, terms):
+        condition = Q()
+        for term in terms:
+            condition &= Q(name__icontains=term) | Q(sku__icontains=term) | Q(description__icontains=term)
+        return queryset.filter(condition).annotate(
+            search_rank=Case(
+                When(sku__istartswith=' '.join(terms), then=Value(1.0)),
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+        )
+
+
+_backends = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend(connection=None):
+    connection = connection or default_connection
+    return _backends.get(connection.vendor, BasicSearchBackend)()
+
+
+def search_products(queryset, query):
+    """
+    تصفية المنتجات حسب نص البحث مع إضافة search_rank (الأكبر هو الأكثر صلة).
+    الترتيب متروك للمستدعي.
+    """
+    terms = get_terms(query)
+    if not terms:
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField())).none()
+    return get_backend().search(queryset, terms)
+
+
+def rebuild_index():
+    with default_connection.cursor() as cursor:
+        get_backend().rebuild(cursor)
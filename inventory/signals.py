@@ -0,0 +1,38 @@
+import logging
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from .cache import invalidate_category_choices
+from .models import Category
+
+logger = logging.getLogger(__name__)
+
+# يرسل بعد استيراد المنتجات المجمع (bulk_create لا يرسل post_save)
+# المعاملات: result (ملخص الاستيراد)
+products_imported = Signal()
+
+# يرسل بعد نسخ حدود إعادة الطلب المقترحة إلى المنتجات بجملة update واحدة
+# المعاملات: count (عدد المنتجات المعدلة)
+reorder_levels_updated = Signal()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, **kwargs):
+    invalidate_category_choices()
+
+
+def repair_search_index(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    post_migrate: إعادة مشغلات الفهرس النصي إذا حذفها ترحيل أعاد إنشاء جدول المنتجات،
+    حتى لا يتوقف البحث عن متابعة المنتجات بدون أي خطأ.
+    """
+    from .search import get_backend
+
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        repaired = get_backend(connection).repair(cursor)
+    if repaired:
+        logger.warning('Reinstalled product search triggers: %s', ', '.join(repaired))
@@ -0,0 +1,145 @@
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Max, Q, Sum, When
+from django.utils import timezone
+
+from .models import Product, StockMovement, StockSnapshot
+
+BATCH_SIZE = 1000
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _end_of_day(day):
+    return _start_of_day(day + timedelta(days=1))
+
+
+def latest_snapshot_date(day):
+    """تاريخ أقرب لقطة في نفس اليوم أو قبله (أو None)"""
+    return StockSnapshot.objects.filter(date__lte=day).aggregate(latest=Max('date'))['latest']
+
+
+def _levels_as_of(day, product_ids=None):
+    """
+    إرجاع (الكميات، أسعار التكلفة من اللقطة) في نهاية اليوم day.
+
+    نبدأ من أقرب لقطة ثم نطبق الحركات التي بعدها فقط. الحركة ADJUSTMENT تضع كمية
+    مطلقة، لذلك تطبق الحركات بترتيب إنشائها.
+
+    المنتجات التي ليس لها لقطة تحسب من كميتها الحالية (_anchor_to_current)، لأن كمياتها
+    قد تسبق سجل الحركات.
+    """
+    base_date = latest_snapshot_date(day)
+    levels, costs = {}, {}
+    adjusted = set()
+    movements = StockMovement.objects.filter(created_at__lt=_end_of_day(day))
+    
+    if base_date is not None:
+        snapshots = StockSnapshot.objects.filter(date=base_date)
+        if product_ids is not None:
+            snapshots = snapshots.filter(product_id__in=product_ids)
+        for product_id, quantity, cost_price in snapshots.values_list('product_id', 'quantity', 'cost_price').iterator():
+            levels[product_id] = quantity
+            costs[product_id] = cost_price
+        movements = movements.filter(created_at__gte=_end_of_day(base_date))
+    
+    if product_ids is not None:
+        movements = movements.filter(product_id__in=product_ids)
+    
+    rows = movements.order_by('created_at', 'id').values_list('product_id', 'movement_type', 'quantity')
+    for product_id, movement_type, quantity in rows.iterator(chunk_size=5000):
+        if movement_type == StockMovement.MOVEMENT_IN:
+            levels[product_id] = levels.get(product_id, 0) + quantity
+        elif movement_type == StockMovement.MOVEMENT_OUT:
+            levels[product_id] = levels.get(product_id, 0) - quantity
+        else:
+            levels[product_id] = quantity
+            adjusted.add(product_id)
+    
+    if product_ids is None or not set(product_ids) <= costs.keys():
+        _anchor_to_current(day, levels, skip=costs.keys() | adjusted, product_ids=product_ids)
+    return levels, costs
+
+
+def _anchor_to_current(day, levels, skip, product_ids=None):
+    """
+    حساب الكمية في نهاية اليوم day = الكمية الحالية - صافي الحركات بعده، للمنتجات الموجودة
+    في ذلك اليوم وليست في skip (لها لقطة أو حركة ADJUSTMENT حتى نهاية اليوم).
+
+    الكمية الحالية قد تكون وضعت قبل وجود سجل الحركات أو تغيرت خارجه، فلا يكفي تطبيق
+    الحركات من الصفر. حركة ADJUSTMENT بعد اليوم تخفي الكمية التي قبلها، فتبقى كمية
+    المنتج محسوبة من الحركات وحدها.
+    """
+    end = _end_of_day(day)
+    products = Product.objects.filter(created_at__lt=end)
+    later = StockMovement.objects.filter(created_at__gte=end)
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+        later = later.filter(product_id__in=product_ids)
+    
+    later = later.values('product_id').annotate(
+        net=Sum(Case(
+            When(movement_type=StockMovement.MOVEMENT_IN, then=F('quantity')),
+            When(movement_type=StockMovement.MOVEMENT_OUT, then=-F('quantity')),
+            default=0,
+            output_field=IntegerField(),
+        )),
+        adjustments=Count('pk', filter=Q(movement_type=StockMovement.MOVEMENT_ADJUSTMENT)),
+    ).values_list('product_id', 'net', 'adjustments')
+    later = {product_id: (net, adjustments) for product_id, net, adjustments in later}
+    
+    for product_id, quantity in products.values_list('id', 'quantity').iterator(chunk_size=5000):
+        net, adjustments = later.get(product_id, (0, 0))
+        if product_id not in skip and not adjustments:
+            levels[product_id] = quantity - net
+
+
+def stock_levels_as_of(day, product_ids=None):
+    """كميات المنتجات {product_id: quantity} في نهاية اليوم day"""
+    return _levels_as_of(day, product_ids)[0]
+
+
+def take_snapshot(day):
+    """
+    كتابة لقطة لجميع المنتجات الموجودة في نهاية اليوم day (تستبدل لقطة نفس اليوم إن وجدت).
+    إرجاع عدد الصفوف المكتوبة.
+    """
+    with transaction.atomic():
+        # حذف لقطة نفس اليوم أولًا حتى تحسب الكميات من اللقطة السابقة لها
+        StockSnapshot.objects.filter(date=day).delete()
+        levels = stock_levels_as_of(day)
+        products = Product.objects.filter(created_at__lt=_end_of_day(day)).values_list('id', 'cost_price')
+        snapshots = [
+            StockSnapshot(product_id=product_id, date=day, quantity=max(levels.get(product_id, 0), 0), cost_price=cost_price)
+            for product_id, cost_price in products.iterator()
+        ]
+        StockSnapshot.objects.bulk_create(snapshots, batch_size=BATCH_SIZE)
+    return len(snapshots)
+
+
+def inventory_valuation_as_of(day, category_id=None):
+    """
+    تقييم المخزون في نهاية اليوم day: صف لكل منتج لديه كمية، والقيمة = الكمية × سعر التكلفة
+    (سعر اللقطة إن وجد وإلا السعر الحالي).
+    """
+    levels, costs = _levels_as_of(day)
+    products = Product.objects.select_related('category').only('id', 'sku', 'name', 'cost_price', 'category__name')
+    if category_id:
+        products = products.filter(category_id=category_id)
+    
+    rows = []
+    for product in products.order_by('category__name', 'name').iterator(chunk_size=2000):
+        quantity = levels.get(product.pk, 0)
+        if quantity <= 0:
+            continue
+        cost_price = costs.get(product.pk, product.cost_price)
+        rows.append({
+            'product': product,
+            'quantity': quantity,
+            'cost_price': cost_price,
+            'value': quantity * cost_price,
+        })
+    return rows
@@ -8,6 +8,9 @@ urlpatterns = [
     path('products/create/', views.product_create, name='product-create'),
     path('products/<int:pk>/update/', views.product_update, name='product-update'),
     path('products/<int:pk>/delete/', views.product_delete, name='product-delete'),
+    path('products/autocomplete/', views.product_autocomplete, name='product-autocomplete'),
+    path('products/import/', views.product_import, name='product-import'),
+    path('products/export/', views.product_export, name='product-export'),
     
     path('categories/', views.category_list, name='category-list'),
     path('categories/create/', views.category_create, name='category-create'),
@@ -16,6 +19,8 @@ urlpatterns = [
     
     path('stock-movements/', views.stock_movement_list, name='stock-movement-list'),
     path('stock-movements/create/', views.stock_movement_create, name='stock-movement-create'),
+    path('stock-movements/export/', views.stock_movement_export, name='stock-movement-export'),
     
     path('low-stock/', views.low_stock_products, name='low-stock-products'),
+    path('valuation/', views.inventory_valuation, name='inventory-valuation'),
 ]
\ No newline at end of file
@@ -1,12 +1,35 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.db.models import Q, Sum, F, ExpressionWrapper, DecimalField
+from django.db import transaction
+from django.db.models import Q, Sum, F, Count, Value, ExpressionWrapper, DecimalField
+from django.db.models.functions import Coalesce
 from django.core.paginator import Paginator
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from datetime import datetime
+from inventory_management.exports import export_response, get_format
+from inventory_management.pagination import KeysetPaginator
+from .bulk import FORMATS, export_rows, guess_format, import_products, read_rows
+from .cache import get_category_choices
 from .models import Product, Category, StockMovement
+from .search import search_products
+from .snapshots import inventory_valuation_as_of, latest_snapshot_date
 from .forms import ProductForm, CategoryForm, StockMovementForm
 
 # Views for Products
+def get_product_summary(products):
+    """عدد المنتجات وقيمة المخزون وعدد المنتجات منخفضة المخزون بتجميع شرطي واحد"""
+    return products.aggregate(
+        total_products=Count('id'),
+        total_value=Coalesce(
+            Sum(ExpressionWrapper(F('quantity') * F('cost_price'), output_field=DecimalField())),
+            Value(0),
+            output_field=DecimalField()
+        ),
+        low_stock_count=Count('id', filter=Q(is_low_stock=True)),
+    )
+
 @login_required
 def product_list(request):
     search_query = request.GET.get('search', '')
@@ -14,20 +37,16 @@ def product_list(request):
     
     products = Product.objects.all()
     
-    # تطبيق البحث
+    # تطبيق البحث (فهرس نصي حسب قاعدة البيانات، انظر inventory.search)
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) | 
-            Q(sku__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
+        products = search_products(products, search_query)
     
     # تصفية حسب الفئة
     if category_id:
         products = products.filter(category_id=category_id)
     
-    # ترتيب المنتجات
-    sort_by = request.GET.get('sort', 'name')
+    # ترتيب المنتجات (عند البحث يكون الافتراضي حسب الصلة)
+    sort_by = request.GET.get('sort') or ('relevance' if search_query else 'name')
     if sort_by == 'quantity':
         products = products.order_by('quantity')
     elif sort_by == '-quantity':
@@ -36,29 +55,30 @@ def product_list(request):
         products = products.order_by('selling_price')
     elif sort_by == '-price':
         products = products.order_by('-selling_price')
+    elif sort_by == '-name':
+        products = products.order_by('-name')
+    elif sort_by == 'relevance' and search_query:
+        products = products.order_by('-search_rank', 'name')
     else:
         products = products.order_by('name')
     
-    # إحصائيات المخزون
-    total_products = products.count()
-    total_value = products.aggregate(
-        total=Sum(ExpressionWrapper(F('quantity') * F('cost_price'), output_field=DecimalField()))
-    )['total'] or 0
-    low_stock_count = products.filter(quantity__lte=F('reorder_level')).count()
+    # إحصائيات المخزون في استعلام واحد، وعدد المنتجات يستخدم أيضًا للتصفح
+    summary = get_product_summary(products)
     
     # التصفح
-    paginator = Paginator(products, 10)  # 10 منتجات في كل صفحة
+    paginator = Paginator(products.select_related('category'), 10)  # 10 منتجات في كل صفحة
+    paginator.count = summary['total_products']
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
-    # قائمة الفئات للتصفية
-    categories = Category.objects.all()
+    # قائمة الفئات للتصفية (من الكاش)
+    categories = get_category_choices()
     
     context = {
         'page_obj': page_obj,
-        'total_products': total_products,
-        'total_value': total_value,
-        'low_stock_count': low_stock_count,
+        'total_products': summary['total_products'],
+        'total_value': summary['total_value'],
+        'low_stock_count': summary['low_stock_count'],
         'search_query': search_query,
         'categories': categories,
         'selected_category': category_id,
@@ -88,10 +108,13 @@ def product_create(request):
     if request.method == 'POST':
         form = ProductForm(request.POST, request.FILES)
         if form.is_valid():
-            product = form.save()
+            # الكمية الأولية تسجل عبر حركة المخزون وليس مباشرة في المنتج
+            initial_quantity = form.cleaned_data['quantity']
+            product = form.save(commit=False)
+            product.quantity = 0
+            product.save()
             
             # إنشاء حركة مخزون أولية إذا كانت الكمية أكبر من 0
-            initial_quantity = form.cleaned_data['quantity']
             if initial_quantity > 0:
                 StockMovement.objects.create(
                     product=product,
@@ -122,29 +145,42 @@ def product_update(request, pk):
         form = ProductForm(request.POST, request.FILES, instance=product)
         if form.is_valid():
             new_quantity = form.cleaned_data['quantity']
-            product = form.save()
             
-            # إنشاء حركة مخزون إذا تغيرت الكمية
-            if new_quantity != original_quantity:
-                if new_quantity > original_quantity:
-                    # إضافة مخزون
-                    movement_type = StockMovement.MOVEMENT_IN
-                    quantity = new_quantity - original_quantity
-                else:
-                    # تخفيض مخزون
-                    movement_type = StockMovement.MOVEMENT_OUT
-                    quantity = original_quantity - new_quantity
-                
-                StockMovement.objects.create(
-                    product=product,
-                    movement_type=movement_type,
-                    quantity=quantity,
-                    reference='Manual Adjustment',
-                    created_by=request.user
-                )
+            # حفظ كل الحقول ما عدا الكمية، فالكمية (ومعها is_low_stock) تتغير فقط عبر حركة المخزون
+            product = form.save(commit=False)
             
-            messages.success(request, f'Product "{product.name}" has been updated successfully.')
-            return redirect('product-detail', pk=product.pk)
+            try:
+                # حفظ المنتج وحركة المخزون معًا، فلا يحفظ المنتج إذا رفضت الحركة
+                with transaction.atomic():
+                    product.save(update_fields=[
+                        field.name for field in Product._meta.concrete_fields
+                        if not field.primary_key and field.name not in ('quantity', 'is_low_stock')
+                    ])
+                    
+                    # إنشاء حركة مخزون إذا تغيرت الكمية
+                    if new_quantity != original_quantity:
+                        if new_quantity > original_quantity:
+                            # إضافة مخزون
+                            movement_type = StockMovement.MOVEMENT_IN
+                            quantity = new_quantity - original_quantity
+                        else:
+                            # تخفيض مخزون
+                            movement_type = StockMovement.MOVEMENT_OUT
+                            quantity = original_quantity - new_quantity
+                        
+                        StockMovement.objects.create(
+                            product=product,
+                            movement_type=movement_type,
+                            quantity=quantity,
+                            reference='Manual Adjustment',
+                            created_by=request.user
+                        )
+            except ValueError as e:
+                # الكمية تغيرت منذ فتح النموذج ولم تعد تكفي للتخفيض
+                form.add_error('quantity', str(e))
+            else:
+                messages.success(request, f'Product "{product.name}" has been updated successfully.')
+                return redirect('product-detail', pk=product.pk)
     else:
         form = ProductForm(instance=product)
     
@@ -174,16 +210,30 @@ def product_delete(request, pk):
     return render(request, 'inventory/product_confirm_delete.html', context)
 
 # Views for Categories
+CATEGORIES_PER_PAGE = 25
+
+def get_category_page(page_number):
+    """صفحة من الفئات مع عدد المنتجات وقيمة المخزون وعدد المنتجات منخفضة المخزون في نفس الاستعلام"""
+    categories = Category.objects.annotate(
+        product_count=Count('products'),
+        stock_value=Coalesce(
+            Sum(ExpressionWrapper(F('products__quantity') * F('products__cost_price'), output_field=DecimalField())),
+            Value(0),
+            output_field=DecimalField()
+        ),
+        low_stock_count=Count('products', filter=Q(products__is_low_stock=True)),
+    ).order_by('name')
+    
+    paginator = Paginator(categories, CATEGORIES_PER_PAGE)
+    return paginator.get_page(page_number)
+
 @login_required
 def category_list(request):
-    categories = Category.objects.all().order_by('name')
-    
-    # إحصائيات لكل فئة
-    for category in categories:
-        category.product_count = Product.objects.filter(category=category).count()
+    page_obj = get_category_page(request.GET.get('page'))
     
     context = {
-        'categories': categories,
+        'page_obj': page_obj,
+        'categories': page_obj,
         'title': 'Categories'
     }
     
@@ -246,38 +296,80 @@ def category_delete(request, pk):
     return render(request, 'inventory/category_confirm_delete.html', context)
 
 # Views for Stock Movements
+MOVEMENTS_PER_PAGE = 15
+PRODUCT_AUTOCOMPLETE_LIMIT = 20
+
+MOVEMENT_EXPORT_COLUMNS = [
+    ('Date', 'created_at'),
+    ('SKU', 'product__sku'),
+    ('Product', 'product__name'),
+    ('Type', 'movement_type'),
+    ('Quantity', 'quantity'),
+    ('Reference', 'reference'),
+    ('Notes', 'notes'),
+    ('Created By', 'created_by__username'),
+]
+
+def filter_stock_movements(params):
+    """تطبيق مرشحات سجل حركات المخزون (المنتج ونوع الحركة)"""
+    stock_movements = StockMovement.objects.select_related('product', 'created_by')
+    
+    product_id = params.get('product', '')
+    if product_id.isdigit():
+        stock_movements = stock_movements.filter(product_id=int(product_id))
+    
+    movement_type = params.get('type', '')
+    if movement_type in dict(StockMovement.MOVEMENT_TYPES):
+        stock_movements = stock_movements.filter(movement_type=movement_type)
+    
+    return stock_movements
+
 @login_required
 def stock_movement_list(request):
     product_id = request.GET.get('product', '')
     movement_type = request.GET.get('type', '')
     
-    stock_movements = StockMovement.objects.all()
-    
-    if product_id:
-        stock_movements = stock_movements.filter(product_id=product_id)
-    
-    if movement_type:
-        stock_movements = stock_movements.filter(movement_type=movement_type)
-    
-    stock_movements = stock_movements.order_by('-created_at')
+    # التصفح بالمؤشر: تكلفة الصفحات العميقة مثل الأولى ولا يوجد استعلام COUNT
+    paginator = KeysetPaginator(filter_stock_movements(request.GET), MOVEMENTS_PER_PAGE, ordering=('-created_at', '-id'))
+    page_obj = paginator.get_page(after=request.GET.get('after'), before=request.GET.get('before'))
     
-    paginator = Paginator(stock_movements, 15)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # المنتج المحدد فقط، والاختيار يتم عبر product_autocomplete
+    selected_product = None
+    if product_id.isdigit():
+        selected_product = Product.objects.filter(pk=int(product_id)).only('id', 'sku', 'name').first()
     
-    products = Product.objects.all().order_by('name')
+    # الاحتفاظ بالمرشحات في روابط التصفح
+    filters = request.GET.copy()
+    filters.pop('after', None)
+    filters.pop('before', None)
     
     context = {
         'page_obj': page_obj,
-        'products': products,
-        'selected_product': product_id,
+        'selected_product': selected_product,
         'selected_type': movement_type,
         'movement_types': StockMovement.MOVEMENT_TYPES,
+        'filter_query': filters.urlencode(),
         'title': 'Stock Movements'
     }
     
     return render(request, 'inventory/stock_movement_list.html', context)
 
+@login_required
+def stock_movement_export(request):
+    """تصدير سجل الحركات بنفس مرشحات القائمة (csv أو xlsx)"""
+    stock_movements = filter_stock_movements(request.GET).order_by('-created_at', '-id')
+    return export_response(stock_movements, MOVEMENT_EXPORT_COLUMNS, 'stock-movements', get_format(request.GET))
+
+@login_required
+def product_autocomplete(request):
+    """اقتراحات المنتجات (JSON) لحقول الاختيار بدلًا من تحميل جميع المنتجات في القائمة"""
+    query = request.GET.get('q', '').strip()
+    results = []
+    if query:
+        products = search_products(Product.objects.all(), query).order_by('-search_rank', 'name')
+        results = list(products.values('id', 'sku', 'name')[:PRODUCT_AUTOCOMPLETE_LIMIT])
+    return JsonResponse({'results': results})
+
 @login_required
 def stock_movement_create(request):
     initial_product = request.GET.get('product', None)
@@ -314,14 +406,85 @@ def stock_movement_create(request):
 
 @login_required
 def low_stock_products(request):
+    # الفئة والكمية المقترحة (suggest_reorder_levels) في نفس الاستعلام
     products = Product.objects.filter(
-        quantity__lte=F('reorder_level'),
+        is_low_stock=True,
         is_active=True
-    ).order_by('quantity')
+    ).select_related('category', 'reorder_suggestion').order_by('quantity')
     
     context = {
         'products': products,
         'title': 'Low Stock Products'
     }
     
-    return render(request, 'inventory/low_stock_products.html', context)
\ No newline at end of file
+    return render(request, 'inventory/low_stock_products.html', context)
+
+@login_required
+def inventory_valuation(request):
+    """تقرير قيمة المخزون في نهاية يوم معين (الافتراضي اليوم)"""
+    try:
+        day = datetime.strptime(request.GET.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        day = timezone.localdate()
+    category_id = request.GET.get('category', '')
+    
+    rows = inventory_valuation_as_of(day, category_id=int(category_id) if category_id.isdigit() else None)
+    
+    context = {
+        'rows': rows,
+        'total_quantity': sum(row['quantity'] for row in rows),
+        'total_value': sum(row['value'] for row in rows),
+        'snapshot_date': latest_snapshot_date(day),
+        'valuation_date': day,
+        'categories': get_category_choices(),
+        'selected_category': category_id,
+        'title': 'Inventory Valuation'
+    }
+    
+    return render(request, 'inventory/inventory_valuation.html', context)
+
+def is_admin(user):
+    return user.is_staff
+
+@login_required
+@user_passes_test(is_admin)
+def product_import(request):
+    """استيراد المنتجات من ملف CSV أو JSONL (إدراج أو تحديث حسب SKU)"""
+    result = None
+    
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, 'Please choose a file to import.')
+        else:
+            file_format = request.POST.get('format') or guess_format(upload.name)
+            if file_format not in FORMATS:
+                file_format = guess_format(upload.name)
+            
+            # الملف يقرأ سطرًا بسطر من الملف المؤقت للرفع
+            result = import_products(read_rows(upload.file, file_format), user=request.user)
+            messages.success(
+                request,
+                f"Imported {result['rows']} row(s): {result['created']} created, "
+                f"{result['updated']} updated, {result['skipped']} skipped."
+            )
+    
+    context = {
+        'result': result,
+        'formats': FORMATS,
+        'title': 'Import Products'
+    }
+    
+    return render(request, 'inventory/product_import.html', context)
+
+@login_required
+@user_passes_test(is_admin)
+def product_export(request):
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in FORMATS:
+        file_format = 'csv'
+    
+    content_type = 'application/x-ndjson' if file_format == 'jsonl' else 'text/csv'
+    response = StreamingHttpResponse(export_rows(file_format), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="products.{file_format}"'
+    return response
@@ -0,0 +1,181 @@
+import csv
+import re
+import zipfile
+from datetime import datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+CHUNK_SIZE = 2000
+FORMATS = ('csv', 'xlsx')
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# حجم الجزء المضغوط الذي يرسل للعميل في كل مرة عند تصدير xlsx
+XLSX_FLUSH_SIZE = 64 * 1024
+
+# الرموز غير المسموح بها في XML 1.0
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# النصوص التي تبدأ بهذه الرموز يقرؤها Excel كصيغة (formula injection)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def get_format(params):
+    file_format = params.get('format', 'csv')
+    return file_format if file_format in FORMATS else 'csv'
+
+
+def _cell(value):
+    # التواريخ بالتوقيت المحلي كما تظهر في الصفحات
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%Y-%m-%d %H:%M')
+    # النص يكتب كما هو مع ' في بدايته حتى لا ينفذ كصيغة
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    """كائن يشبه الملف يرجع ما يكتب فيه بدلًا من تخزينه (لـ csv.writer)"""
+
+    def write(self, value):
+        return value
+
+
+def csv_rows(header, rows):
+    writer = csv.writer(_Echo())
+    # BOM حتى يفتح Excel الملف بترميز UTF-8 (أسماء العملاء بالعربية)
+    yield '\ufeff' + writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(['' if value is None else _cell(value) for value in row])
+
+
+class _Buffer:
+    """وجهة كتابة لـ zipfile تحتفظ فقط بما كتب منذ آخر إرسال"""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_INVALID_XML.sub('', str(_cell(value))))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(row):
+    return ('<row>' + ''.join(_xlsx_cell(value) for value in row) + '</row>').encode('utf-8')
+
+
+def xlsx_rows(header, rows, sheet_name='Report'):
+    """
+    توليد ملف xlsx أثناء الكتابة دون مكتبات خارجية.
+
+    الورقة تكتب كصفوف بنصوص مضمنة (inlineStr) داخل ملف zip يضغط أثناء البث،
+    لذلك لا يحتفظ إلا بالجزء الحالي مهما كان عدد الصفوف.
+    """
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr('xl/workbook.xml', WORKBOOK.format(name=escape(sheet_name[:31])))
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(header))
+            for row in rows:
+                sheet.write(_xlsx_row(row))
+                if buffer.size >= XLSX_FLUSH_SIZE:
+                    yield buffer.take()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.take()
+
+
+def export_response(queryset, columns, filename, file_format='csv'):
+    """
+    بث نتيجة الاستعلام كملف csv أو xlsx.
+
+    columns: قائمة (العنوان، الحقل) بالترتيب. الصفوف تقرأ بـ values_list و iterator
+    على دفعات، لذلك تبقى الذاكرة ثابتة مهما كان حجم التقرير.
+    """
+    header = [title for title, _ in columns]
+    rows = queryset.values_list(*[field for _, field in columns]).iterator(chunk_size=CHUNK_SIZE)
+
+    if file_format == 'xlsx':
+        content = xlsx_rows(header, rows, sheet_name=filename)
+    else:
+        content = csv_rows(header, rows)
+
+    response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[file_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}-{timezone.localdate():%Y%m%d}.{file_format}"'
+    return response
@@ -0,0 +1,176 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+logger = logging.getLogger('inventory_management.requests')
+
+DEFAULT_QUERY_BUDGET = 50
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestMetrics:
+    """عدد الاستعلامات وزمنها وزمن القوالب للطلب الحالي"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # يستخدم كـ execute_wrapper على كل اتصال بقاعدة البيانات
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """قيمة ترويسة Server-Timing بالميلي ثانية"""
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        # القوالب المضمنة (include/extends) تعرض داخل هذا الاستدعاء فلا تحسب مرتين
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """محرك DjangoTemplates يضيف زمن عرض القوالب إلى قياس الطلب الحالي (TEMPLATES في الإعدادات)"""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+def get_budget(request):
+    """
+    الحد الأقصى لعدد الاستعلامات للطلب من QUERY_BUDGETS حسب اسم الرابط
+    (مثل 'orders-list') أو المسار الكامل للدالة، ثم QUERY_BUDGET_DEFAULT.
+    """
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    match = getattr(request, 'resolver_match', None)
+    if match is not None:
+        for key in (match.view_name, f'{match.func.__module__}.{match.func.__name__}'):
+            if key in budgets:
+                return budgets[key]
+    return getattr(settings, 'QUERY_BUDGET_DEFAULT', DEFAULT_QUERY_BUDGET)
+
+
+class RequestMetricsMiddleware:
+    """
+    قياس كل طلب: عدد الاستعلامات وزمنها وزمن عرض القوالب والزمن الكلي.
+
+    النتائج تضاف إلى ترويسة Server-Timing وتسجل كسطر JSON بمستوى DEBUG في
+    inventory_management.requests. تجاوز حد الاستعلامات يسجل كتحذير، ويرفع
+    QueryBudgetExceeded عند QUERY_BUDGET_RAISE = True (في الاختبارات). زمن القوالب يقاس
+    فقط مع محرك DjangoTemplates من هذه الوحدة.
+
+    الاستجابات المتدفقة (StreamingHttpResponse) تقاس حتى بداية الإرسال فقط.
+    يعمل مع ASGI بدون تحويل إلى sync، فلا يضيف خيطًا لكل طلب إلى العروض غير المتزامنة.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with self.wrap_connections(metrics):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            # الاتصالات خاصة بكل خيط، والـ ORM غير المتزامن ينفذ استعلاماته في خيط
+            # sync_to_async الخاص بالطلب، فيثبت القياس على اتصالات ذلك الخيط
+            stack = await sync_to_async(self.wrap_connections)(metrics)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def wrap_connections(self, metrics):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics))
+        return stack
+
+    def finish(self, request, response, metrics):
+        response['Server-Timing'] = metrics.server_timing()
+        self.check_budget(request, response, metrics)
+        return response
+
+    def check_budget(self, request, response, metrics):
+        match = getattr(request, 'resolver_match', None)
+        budget = get_budget(request)
+        data = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            'query_budget': budget,
+            'db_ms': round(metrics.db_time * 1000, 1),
+            'template_ms': round(metrics.template_time * 1000, 1),
+            'total_ms': round(metrics.total_time * 1000, 1),
+        }
+        logger.debug(json.dumps(data), extra={'metrics': data})
+
+        # أخطاء الخادم تسجل في مكان آخر، والاستعلامات فيها لا تمثل الصفحة
+        if budget is not None and metrics.queries > budget and response.status_code < 500:
+            message = f'{data["view"] or request.path} ran {metrics.queries} queries (budget {budget})'
+            if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message, extra={'metrics': data})
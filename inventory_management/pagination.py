@@ -0,0 +1,114 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    """صفحة نتائج ناتجة عن التصفح بالمؤشر"""
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    تصفح بدون OFFSET (keyset pagination) على مجموعة حقول ترتيب فريدة.
+
+    كل صفحة تكلف استعلامًا واحدًا مهما كان عمق الصفحة، ولا يوجد استعلام COUNT.
+    يجب أن تكون جميع حقول الترتيب بنفس الاتجاه وأن يكون آخرها فريدًا (مثل id).
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-created_at', '-id')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = list(ordering)
+        self.descending = self.ordering[0].startswith('-')
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        if any(name.startswith('-') != self.descending for name in self.ordering):
+            raise ValueError('All keyset ordering fields must share the same direction')
+
+    def encode_cursor(self, obj):
+        values = []
+        for name in self.fields:
+            value = getattr(obj, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """إرجاع قيم المؤشر أو None إذا كان المؤشر غير صالح"""
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            model_fields = [self.queryset.model._meta.get_field(name) for name in self.fields]
+            if len(values) != len(model_fields):
+                return None
+            return [field.to_python(value) for field, value in zip(model_fields, values)]
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    def _seek(self, values, forward):
+        """بناء شرط (a, b) < (x, y) بصيغة متوافقة مع جميع قواعد البيانات"""
+        lookup = 'lt' if self.descending == forward else 'gt'
+        condition = Q()
+        for i, name in enumerate(self.fields):
+            part = Q(**{f'{name}__{lookup}': values[i]})
+            for prev_name, prev_value in zip(self.fields[:i], values[:i]):
+                part &= Q(**{prev_name: prev_value})
+            condition |= part
+        return condition
+
+    def _page_query(self, after, before):
+        """إرجاع (الاستعلام، هل هو للخلف، هل يوجد مؤشر after صالح)"""
+        after_values = self.decode_cursor(after) if after else None
+        before_values = self.decode_cursor(before) if before else None
+
+        if before_values is not None:
+            reverse = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+            queryset = self.queryset.filter(self._seek(before_values, forward=False)).order_by(*reverse)
+            return queryset[:self.per_page + 1], True, False
+
+        queryset = self.queryset.order_by(*self.ordering)
+        if after_values is not None:
+            queryset = queryset.filter(self._seek(after_values, forward=True))
+        return queryset[:self.per_page + 1], False, after_values is not None
+
+    def _make_page(self, rows, backward, has_after):
+        if backward:
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = has_after
+
+        return KeysetPage(
+            rows,
+            has_next=has_next and bool(rows),
+            has_previous=has_previous and bool(rows),
+            next_cursor=self.encode_cursor(rows[-1]) if rows else None,
+            previous_cursor=self.encode_cursor(rows[0]) if rows else None,
+        )
+
+    def get_page(self, after=None, before=None):
+        queryset, backward, has_after = self._page_query(after, before)
+        return self._make_page(list(queryset), backward, has_after)
+
+    async def aget_page(self, after=None, before=None):
+        """نفس get_page للعروض غير المتزامنة (استعلام واحد عبر aiterator)"""
+        queryset, backward, has_after = self._page_query(after, before)
+        return self._make_page([obj async for obj in queryset.aiterator()], backward, has_after)
@@ -32,9 +32,12 @@ INSTALLED_APPS = [
     'stats',  # or 'stats' if you renamed it
     'users',
     'settings_app',
+    'api',
 ]
 
 MIDDLEWARE = [
+    # أولًا حتى يشمل الزمن الكلي باقي الـ middleware
+    'inventory_management.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,7 +51,9 @@ ROOT_URLCONF = 'inventory_management.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates مع قياس زمن العرض لـ RequestMetricsMiddleware
+        'BACKEND': 'inventory_management.instrumentation.DjangoTemplates',
+        'NAME': 'django',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -72,6 +77,70 @@ DATABASES = {
     }
 }
 
+# Cache
+# LocMemCache خاص بكل عملية، في الإنتاج استخدم كاش مشترك (Redis أو Memcached)
+# حتى يصل إبطال الإحصائيات إلى جميع العمليات
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'inventory-management',
+    }
+}
+
+# كاش صفحة الإحصائيات: اسم الكاش المستخدم ومدة الصلاحية الاحتياطية بالثواني
+STATS_CACHE_ALIAS = 'default'
+STATS_CACHE_TIMEOUT = 300
+
+# عناوين البريد لتنبيهات المخزون المنخفض (الأمر process_low_stock_events)، والتنبيهات تسجل دائمًا في inventory.alerts
+LOW_STOCK_ALERT_EMAILS = []
+
+# مفاتيح واجهة JSON للأنظمة الخارجية (ترسل في X-Api-Key): المفتاح ← اسم المستخدم الذي تعمل
+# الطلبات باسمه. في الإنتاج تقرأ من متغيرات البيئة وليس من الكود.
+API_KEYS = {}
+
+# الحد الأقصى لعدد الاستعلامات لكل صفحة (اسم الرابط أو المسار الكامل للدالة).
+# التجاوز يسجل كتحذير، أو يرفع QueryBudgetExceeded مع QUERY_BUDGET_RAISE (في test_settings).
+QUERY_BUDGET_RAISE = False
+QUERY_BUDGET_DEFAULT = 30
+QUERY_BUDGETS = {
+    'dashboard': 8,
+    'product-list': 8,
+    'product-detail': 8,
+    'category-list': 6,
+    'low-stock-products': 6,
+    'stock-movement-list': 6,
+    'inventory-valuation': 8,
+    'orders-list': 6,
+    'order-detail': 8,
+    'invoices-list': 6,
+    'invoice-detail': 8,
+    'settings': 5,
+    # واجهة JSON (الجلسة والمستخدم + استعلام أو اثنان، وواحد إضافي مع count=1)
+    'api-product-list': 4,
+    'api-product-lookup': 3,
+    'api-order-list': 4,
+    'api-order-detail': 4,
+    'api-invoice-balance': 3,
+    'api-dashboard-stats': 4,
+    # ثابت لكل دفعة، لكن الإدراج المجمع يقسم على دفعات حسب حد المعاملات في قاعدة البيانات
+    'api-order-ingest': 80,
+    # عند عدم وجود الأقسام في الكاش
+    'statistics': 25,
+}
+
+# RequestMetricsMiddleware يسجل تجاوز حد الاستعلامات كتحذير، وسطر JSON لكل طلب (عدد
+# الاستعلامات والأزمنة) بمستوى DEBUG، ويظهر فقط عند تغيير المستوى إلى DEBUG
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'inventory_management.requests': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -0,0 +1,5 @@
+# إعدادات الاختبارات، و "python manage.py test" يستخدمها تلقائيًا
+from .settings import *  # noqa: F401,F403
+
+# تجاوز حد الاستعلامات في أي صفحة يفشل الاختبار بدلًا من تسجيل تحذير
+QUERY_BUDGET_RAISE = True
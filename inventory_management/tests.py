@@ -0,0 +1,77 @@
+import json
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.template import engines
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import ResolverMatch
+
+from users.models import User
+from .instrumentation import QueryBudgetExceeded, RequestMetrics, RequestMetricsMiddleware, _current
+
+
+def orders_view(request):
+    list(User.objects.all())
+    list(User.objects.all())
+    return HttpResponse(engines['django'].from_string('{{ value }}').render({'value': 'ok'}))
+
+
+async def async_orders_view(request):
+    await User.objects.acount()
+    await User.objects.acount()
+    return HttpResponse('ok')
+
+
+@override_settings(QUERY_BUDGETS={'orders-list': 2}, QUERY_BUDGET_DEFAULT=10)
+class RequestMetricsMiddlewareTests(TestCase):
+    def get(self, view=orders_view, url_name='orders-list'):
+        request = RequestFactory().get('/orders/')
+        request.user = AnonymousUser()
+        request.resolver_match = ResolverMatch(view, (), {}, url_name=url_name)
+        return RequestMetricsMiddleware(view)(request)
+
+    def test_server_timing_and_log(self):
+        with self.assertLogs('inventory_management.requests', 'DEBUG') as logs:
+            response = self.get()
+
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="2 queries", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+        data = json.loads(logs.records[0].getMessage())
+        self.assertEqual((data['view'], data['queries'], data['query_budget']), ('orders-list', 2, 2))
+
+    @override_settings(QUERY_BUDGETS={'orders-list': 1}, QUERY_BUDGET_RAISE=True)
+    def test_budget_fails_in_tests(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'orders-list ran 2 queries (budget 1)'):
+            self.get()
+
+    @override_settings(QUERY_BUDGETS={'orders-list': 1}, QUERY_BUDGET_RAISE=False)
+    def test_budget_warns_in_production(self):
+        with self.assertLogs('inventory_management.requests', 'WARNING') as logs:
+            response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('budget 1', logs.output[0])
+
+    async def test_async_view_queries_are_counted(self):
+        request = RequestFactory().get('/orders/')
+        request.resolver_match = ResolverMatch(async_orders_view, (), {}, url_name='orders-list')
+        middleware = RequestMetricsMiddleware(async_orders_view)
+        self.assertTrue(iscoroutinefunction(middleware))
+
+        with self.assertLogs('inventory_management.requests', 'DEBUG') as logs:
+            response = await middleware(request)
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+        self.assertEqual(json.loads(logs.records[0].getMessage())['queries'], 2)
+
+    def test_template_time_measured_by_backend(self):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            engines['django'].from_string('{{ value }}').render({'value': 'ok'})
+        finally:
+            _current.reset(token)
+        self.assertGreater(metrics.template_time, 0)
+
+    def test_default_budget(self):
+        with self.assertLogs('inventory_management.requests', 'DEBUG') as logs:
+            self.get(url_name='other')
+        self.assertEqual(json.loads(logs.records[0].getMessage())['query_budget'], 10)
@@ -17,6 +17,7 @@ urlpatterns = [
     path('invoices/', include('invoices.urls')),
     path('statistics/', include('stats.urls')),    path('users/', include('users.urls')),
     path('settings/', include('settings_app.urls')),
+    path('api/', include('api.urls')),
 ]
 
 # Add media urls in development
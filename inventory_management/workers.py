@@ -0,0 +1,17 @@
+import os
+
+import django
+from django.db import connections
+
+
+def setup_worker(settings_module):
+    """
+    تهيئة Django في عملية من ProcessPoolExecutor (initializer).
+
+    مع spawn (الافتراضي في macOS و Windows) تبدأ العملية بدون إعدادات ولا تطبيقات، ومع fork
+    يجب ألا تستخدم اتصال قاعدة بيانات موروثًا من العملية الرئيسية. هذه الوحدة لا تستورد أي
+    نماذج، لأنها تستورد في العملية الجديدة قبل django.setup().
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+    connections.close_all()
@@ -0,0 +1,29 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from invoices.services import BATCH_SIZE, generate_invoices, get_default_tax_rate, uninvoiced_completed_orders
+
+
+class Command(BaseCommand):
+    help = 'Create invoices for all completed orders that do not have one yet (e.g. at month end)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tax-rate', help='Tax rate in percent, defaults to the default_tax_rate setting')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many orders would be invoiced')
+
+    def handle(self, *args, **options):
+        tax_rate = get_default_tax_rate()
+        if options['tax_rate'] is not None:
+            try:
+                tax_rate = Decimal(options['tax_rate'])
+            except InvalidOperation:
+                raise CommandError(f'Invalid --tax-rate "{options["tax_rate"]}"')
+
+        if options['dry_run']:
+            count = uninvoiced_completed_orders().count()
+            self.stdout.write(f'{count} completed order(s) without an invoice (tax rate {tax_rate}%)')
+            return
+
+        created = generate_invoices(tax_rate=tax_rate, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Created {created} invoice(s) with tax rate {tax_rate}%'))
@@ -0,0 +1,82 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from inventory_management.workers import setup_worker
+from invoices.models import Invoice
+from invoices.pdf import prerender_invoice_pdf
+
+
+# بدء عملية (استيراد Django و xhtml2pdf) أبطأ من توليد عدة ملفات، لذلك لا تبدأ عملية
+# إلا إذا كان لها هذا العدد على الأقل، والدفعات الصغيرة تولد في العملية الحالية
+MIN_INVOICES_PER_WORKER = 10
+
+
+def get_worker_count(pending, requested=None):
+    """عدد العمليات: المطلوب، أو عدد المعالجات بحيث يكون لكل عملية MIN_INVOICES_PER_WORKER فاتورة"""
+    if requested is None:
+        requested = min(os.cpu_count() or 1, pending // MIN_INVOICES_PER_WORKER)
+    return max(1, min(requested, pending))
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Invalid date "{value}", expected YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = 'Pre-render invoice PDFs into the MEDIA_ROOT cache using a pool of worker processes (e.g. before month-end downloads)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='First issue date (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', help='Last issue date (YYYY-MM-DD)')
+        parser.add_argument('--status', choices=Invoice.InvoiceStatus.values, help='Only invoices with this status')
+        parser.add_argument('--invoice', type=int, action='append', dest='invoices', help='Limit to the given invoice id (repeatable)')
+        parser.add_argument('--workers', type=int, help='Number of worker processes (1 renders in this process, default: one per CPU for large runs)')
+        parser.add_argument('--force', action='store_true', help='Render again even if a cached PDF exists')
+
+    def handle(self, *args, **options):
+        invoices = Invoice.objects.all()
+        if options['date_from']:
+            invoices = invoices.filter(issue_date__gte=_parse_date(options['date_from']))
+        if options['date_to']:
+            invoices = invoices.filter(issue_date__lte=_parse_date(options['date_to']))
+        if options['status']:
+            invoices = invoices.filter(status=options['status'])
+        if options['invoices']:
+            invoices = invoices.filter(pk__in=options['invoices'])
+        pks = list(invoices.order_by('pk').values_list('pk', flat=True))
+
+        render = partial(prerender_invoice_pdf, force=options['force'])
+        workers = get_worker_count(len(pks), options['workers'])
+        if workers == 1:
+            results = map(render, pks)
+        else:
+            # طريقة بدء العمليات الافتراضية في النظام، ولا ترث العمليات اتصالًا مفتوحًا
+            connections.close_all()
+            executor = ProcessPoolExecutor(workers, initializer=setup_worker, initargs=(settings.SETTINGS_MODULE,))
+            results = executor.map(render, pks, chunksize=max(1, len(pks) // (workers * 8)))
+
+        rendered = cached = failed = 0
+        try:
+            for pk, was_rendered, error in results:
+                if error:
+                    failed += 1
+                    self.stderr.write(f'Invoice {pk}: {error}')
+                elif was_rendered:
+                    rendered += 1
+                else:
+                    cached += 1
+        finally:
+            if workers > 1:
+                executor.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{rendered} PDF(s) rendered, {cached} already cached, {failed} failed ({workers} worker(s))'
+        ))
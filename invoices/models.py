@@ -1,9 +1,51 @@
 # في ملف invoices/models.py
 
+from decimal import Decimal, ROUND_HALF_UP
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
+from django.db.models import F, OuterRef, Subquery, Sum, Value, ExpressionWrapper, DecimalField
+from django.db.models.functions import Coalesce, Round
 from orders.models import Order
+from orders.sequences import next_number
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def to_money(value):
+    """تقريب المبلغ إلى سنتين (قواعد مثل SQLite تعيد نتائج التعابير بدون تقريب)"""
+    return Decimal(value).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+class InvoiceQuerySet(models.QuerySet):
+    def with_financials(self):
+        """
+        إضافة المبلغ الفرعي والضريبة والإجمالي والمدفوع والرصيد المتبقي كحقول محسوبة في SQL.
+        
+        يعتمد المبلغ الفرعي على المجموع المخزن في الطلب، والمدفوعات تحسب باستعلام فرعي،
+        لذلك تكلف قائمة الفواتير استعلامًا واحدًا مهما كان عدد الصفوف. الضريبة تقرب لسنتين
+        قبل الإجمالي كما في الخصائص، فتطابق القيم المصدرة (values_list) ما يظهر في الصفحات.
+        """
+        paid = Payment.objects.filter(invoice=OuterRef('pk')).order_by().values('invoice').annotate(
+            total=Sum('amount')
+        ).values('total')
+        
+        return self.annotate(
+            annotated_subtotal=ExpressionWrapper(F('order__total_amount'), output_field=MONEY),
+        ).annotate(
+            annotated_tax_amount=Round(
+                ExpressionWrapper(F('annotated_subtotal') * F('tax_rate') / Value(100), output_field=MONEY), 2,
+                output_field=MONEY,
+            ),
+        ).annotate(
+            annotated_total_amount=ExpressionWrapper(
+                F('annotated_subtotal') + F('annotated_tax_amount') - F('discount'), output_field=MONEY
+            ),
+            annotated_amount_paid=Coalesce(Subquery(paid), Value(0), output_field=MONEY),
+        ).annotate(
+            annotated_balance=ExpressionWrapper(F('annotated_total_amount') - F('annotated_amount_paid'), output_field=MONEY),
+        )
+
 
 class Invoice(models.Model):
     """نموذج للفواتير"""
@@ -24,30 +66,52 @@ class Invoice(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Created At'))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Updated At'))
     
+    objects = InvoiceQuerySet.as_manager()
+    
     def __str__(self):
         return f"Invoice #{self.invoice_number} for Order #{self.order.order_number}"
     
+    # الخصائص التالية تستخدم القيم المحسوبة من with_financials() إن وجدت
+    
     @property
     def subtotal(self):
         """حساب المبلغ الفرعي للفاتورة (بدون ضريبة وخصم)"""
-        return self.order.total_amount
+        if hasattr(self, 'annotated_subtotal'):
+            return to_money(self.annotated_subtotal)
+        return to_money(self.order.total_amount)
     
     @property
     def tax_amount(self):
         """حساب مبلغ الضريبة"""
-        return self.subtotal * (self.tax_rate / 100)
+        if hasattr(self, 'annotated_tax_amount'):
+            return to_money(self.annotated_tax_amount)
+        return to_money(self.subtotal * (self.tax_rate / 100))
     
     @property
     def total_amount(self):
         """حساب المبلغ الإجمالي للفاتورة (بعد الضريبة والخصم)"""
+        if hasattr(self, 'annotated_total_amount'):
+            return to_money(self.annotated_total_amount)
         return self.subtotal + self.tax_amount - self.discount
     
+    @property
+    def amount_paid(self):
+        """إجمالي المدفوعات المسجلة للفاتورة"""
+        if hasattr(self, 'annotated_amount_paid'):
+            return to_money(self.annotated_amount_paid)
+        return to_money(self.payments.aggregate(total=Sum('amount'))['total'] or 0)
+    
+    @property
+    def balance(self):
+        """المبلغ المتبقي للدفع"""
+        if hasattr(self, 'annotated_balance'):
+            return to_money(self.annotated_balance)
+        return self.total_amount - self.amount_paid
+    
     def save(self, *args, **kwargs):
         """إنشاء رقم فاتورة فريد إذا لم يكن موجودًا"""
         if not self.invoice_number:
-            prefix = 'INV'
-            timestamp = timezone.now().strftime('%Y%m%d%H%M')
-            self.invoice_number = f"{prefix}{timestamp}"
+            self.invoice_number = next_number('invoice', 'INV')
         
         # تعيين تاريخ الاستحقاق كـ 30 يومًا بعد تاريخ الإصدار إذا لم يتم تحديده
         if not self.due_date:
@@ -85,11 +149,11 @@ class Payment(models.Model):
         """تحديث حالة الفاتورة إذا تم دفع المبلغ بالكامل"""
         super().save(*args, **kwargs)
         
-        # حساب إجمالي المدفوعات للفاتورة
-        total_paid = self.invoice.payments.aggregate(total=models.Sum('amount'))['total'] or 0
+        # حساب إجمالي المدفوعات والمبلغ الإجمالي للفاتورة في استعلام واحد
+        invoice = Invoice.objects.with_financials().get(pk=self.invoice_id)
         
         # تحديث حالة الفاتورة إذا تم دفع المبلغ بالكامل
-        if total_paid >= self.invoice.total_amount and self.invoice.status != Invoice.InvoiceStatus.PAID:
+        if invoice.amount_paid >= invoice.total_amount and self.invoice.status != Invoice.InvoiceStatus.PAID:
             self.invoice.status = Invoice.InvoiceStatus.PAID
             self.invoice.save()
     
@@ -0,0 +1,160 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.template.loader import get_template
+from django.template.loader_tags import ExtendsNode, IncludeNode
+from xhtml2pdf import pisa
+
+from settings_app.services import COMPANY_KEYS, get_settings
+from .models import Invoice
+
+PDF_TEMPLATE = 'invoices/invoice_pdf.html'
+
+# الحقول الظاهرة في الفاتورة فقط، حتى لا يعاد التوليد بسبب تغيير لا يظهر فيها (مثل كمية المخزون)
+CLIENT_FIELDS = ('username', 'first_name', 'last_name', 'email', 'phone', 'address')
+PRODUCT_FIELDS = ('sku', 'name')
+
+
+class PDFGenerationError(Exception):
+    pass
+
+
+def get_cache_dir():
+    return Path(settings.MEDIA_ROOT) / getattr(settings, 'INVOICE_PDF_DIR', 'invoices/pdf')
+
+
+def _values(obj, fields=None):
+    if fields is None:
+        fields = [field.attname for field in obj._meta.concrete_fields if field.attname not in ('created_at', 'updated_at')]
+    return [getattr(obj, field) for field in fields]
+
+
+def _template_sources(template, seen=None):
+    """
+    مصدر القالب ومصادر القوالب التي يمدها أو يضمنها بأسماء ثابتة ({% extends %} و {% include %})،
+    حتى يؤدي تعديل أي منها إلى بصمة جديدة. الأسماء من متغيرات لا يمكن معرفتها قبل العرض.
+    """
+    seen = set() if seen is None else seen
+    if template.origin.name in seen:
+        return []
+    seen.add(template.origin.name)
+    sources = [template.source]
+    for node in template.nodelist.get_nodes_by_type((ExtendsNode, IncludeNode)):
+        name = node.parent_name if isinstance(node, ExtendsNode) else node.template
+        if isinstance(name.var, str) and not name.filters:
+            sources += _template_sources(template.engine.get_template(name.var), seen)
+    return sources
+
+
+class InvoicePDF:
+    """
+    ملف PDF لفاتورة مع تخزينه في MEDIA_ROOT.
+
+    اسم الملف يحتوي على بصمة (hash) لبيانات الفاتورة والطلب والعناصر والمدفوعات وبيانات
+    الشركة وقالب الفاتورة، لذلك أي تغيير فيها يؤدي إلى ملف جديد ولا يمكن إرجاع نسخة قديمة.
+    الإشارات في invoices.signals تحذف الملفات القديمة.
+    """
+
+    def __init__(self, invoice):
+        self.invoice = invoice
+        self.items = list(invoice.order.items.select_related('product').order_by('pk'))
+        self.payments = list(invoice.payments.order_by('-payment_date', '-pk'))
+        # بيانات الشركة من ذاكرة الإعدادات بدون استعلام
+        self.company = get_settings(*COMPANY_KEYS, 'default_currency')
+        self.template = get_template(PDF_TEMPLATE)
+
+    @classmethod
+    def load(cls, pk):
+        return cls(Invoice.objects.with_financials().select_related('order__client').get(pk=pk))
+
+    def context(self):
+        return {
+            'invoice': self.invoice,
+            'order_items': self.items,
+            'payments': self.payments,
+            'total_paid': self.invoice.amount_paid,
+            'company': self.company,
+        }
+
+    def content_hash(self):
+        invoice = self.invoice
+        data = [
+            _values(invoice),
+            [invoice.subtotal, invoice.tax_amount, invoice.total_amount, invoice.amount_paid, invoice.balance],
+            _values(invoice.order),
+            _values(invoice.order.client, CLIENT_FIELDS),
+            [_values(item) + _values(item.product, PRODUCT_FIELDS) for item in self.items],
+            [_values(payment) for payment in self.payments],
+            self.company,
+            _template_sources(self.template.template),
+        ]
+        return hashlib.sha256(json.dumps(data, default=str).encode('utf-8')).hexdigest()[:32]
+
+    @property
+    def path(self):
+        return get_cache_dir() / f'{self.invoice.pk}-{self.content_hash()}.pdf'
+
+    @property
+    def filename(self):
+        return f'{self.invoice.invoice_number}.pdf'
+
+    def render(self):
+        html = self.template.render(self.context())
+        result = io.BytesIO()
+        pdf = pisa.pisaDocument(io.BytesIO(html.encode('UTF-8')), result)
+        if pdf.err:
+            raise PDFGenerationError(f'Error generating PDF for invoice {self.invoice.invoice_number}')
+        return result.getvalue()
+
+    def get(self, force=False):
+        """
+        مسار الملف بعد توليده إذا لم يكن موجودًا.
+        يرجع (المسار، True إذا تم التوليد الآن).
+        """
+        path = self.path
+        if path.exists() and not force:
+            return path, False
+
+        content = self.render()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # الكتابة في ملف مؤقت ثم استبداله، حتى لا يقرأ طلب آخر ملفًا غير مكتمل
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                temp.write(content)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        invalidate_invoice_pdf(self.invoice.pk, keep=path.name)
+        return path, True
+
+    def open(self):
+        path, _ = self.get()
+        try:
+            return open(path, 'rb')
+        except FileNotFoundError:
+            # حذف بالتوازي بعد تغيير الفاتورة في طلب آخر
+            path, _ = self.get(force=True)
+            return open(path, 'rb')
+
+
+def invalidate_invoice_pdf(invoice_id, keep=None):
+    """حذف ملفات PDF المخزنة للفاتورة (ما عدا keep)"""
+    for path in get_cache_dir().glob(f'{invoice_id}-*.pdf'):
+        if path.name != keep:
+            path.unlink(missing_ok=True)
+
+
+def prerender_invoice_pdf(pk, force=False):
+    """توليد ملف فاتورة واحدة (تستدعى من عمليات render_invoice_pdfs)"""
+    try:
+        _, rendered = InvoicePDF.load(pk).get(force=force)
+    except (Invoice.DoesNotExist, PDFGenerationError) as e:
+        return pk, None, str(e)
+    return pk, rendered, None
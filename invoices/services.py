@@ -0,0 +1,72 @@
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import Order
+from orders.sequences import allocate_numbers
+from settings_app.services import get_setting
+from .models import Invoice
+from .signals import invoices_generated
+
+BATCH_SIZE = 1000
+PAYMENT_TERM_DAYS = 30
+
+
+def get_default_tax_rate():
+    try:
+        return Decimal(get_setting('default_tax_rate') or 0)
+    except InvalidOperation:
+        return Decimal('0')
+
+
+def uninvoiced_completed_orders():
+    """الطلبات المكتملة بدون فاتورة (LEFT JOIN على الفواتير مع IS NULL في استعلام واحد)"""
+    return Order.objects.filter(status=Order.OrderStatus.COMPLETED, invoice__isnull=True)
+
+
+def generate_invoices(user=None, tax_rate=None, batch_size=BATCH_SIZE):
+    """
+    إنشاء فواتير لجميع الطلبات المكتملة التي ليس لها فاتورة، على دفعات.
+
+    كل دفعة تكلف عددًا ثابتًا من الاستعلامات: اختيار الطلبات، حجز الأرقام من
+    allocate_numbers، ثم bulk_create. الطلبات المختارة تقفل مع تخطي المقفل منها
+    (SKIP LOCKED) حتى لا تنشئ عمليتان متزامنتان فاتورتين لنفس الطلب.
+    يرجع عدد الفواتير المنشأة.
+    """
+    if tax_rate is None:
+        tax_rate = get_default_tax_rate()
+    issue_date = timezone.localdate()
+    due_date = issue_date + timedelta(days=PAYMENT_TERM_DAYS)
+
+    created = 0
+    while True:
+        with transaction.atomic():
+            order_ids = list(
+                uninvoiced_completed_orders()
+                .select_for_update(skip_locked=True, of=('self',))
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not order_ids:
+                break
+
+            numbers = allocate_numbers('invoice', 'INV', len(order_ids))
+            # bulk_create لا يستدعي Invoice.save، لذلك يحدد الرقم وتاريخ الاستحقاق هنا
+            Invoice.objects.bulk_create([
+                Invoice(
+                    order_id=order_id,
+                    invoice_number=number,
+                    issue_date=issue_date,
+                    due_date=due_date,
+                    tax_rate=tax_rate,
+                    created_by=user,
+                )
+                for order_id, number in zip(order_ids, numbers)
+            ])
+        created += len(order_ids)
+
+    if created:
+        invoices_generated.send(sender=Invoice, count=created)
+    return created
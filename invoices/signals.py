@@ -0,0 +1,50 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from orders.models import Order
+from orders.signals import order_items_changed
+from .models import Invoice, Payment
+from .pdf import invalidate_invoice_pdf
+
+# يرسل بعد إنشاء الفواتير المجمع (bulk_create لا يرسل post_save)
+# المعاملات: count (عدد الفواتير)
+invoices_generated = Signal()
+
+
+# حذف ملفات PDF المخزنة عند تغيير الفاتورة أو طلبها أو عناصرها أو مدفوعاتها.
+# البصمة في اسم الملف تمنع استخدام نسخة قديمة في كل الأحوال، والحذف هنا لتوفير المساحة.
+
+def _invalidate(invoice_id):
+    transaction.on_commit(lambda: invalidate_invoice_pdf(invoice_id))
+
+
+def _invalidate_order(order):
+    # بدون استعلام في كل حفظ للطلب: الفاتورة تعرف فقط إذا حملت مع الطلب. ملفات الفواتير
+    # الأخرى لا تستخدم بسبب البصمة، وتحذف عند توليد ملفها الجديد (InvoicePDF.get).
+    if Order.invoice.is_cached(order):
+        invoice = getattr(order, 'invoice', None)
+        if invoice is not None:
+            _invalidate(invoice.pk)
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def invalidate_on_invoice_write(sender, instance, **kwargs):
+    _invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def invalidate_on_payment_write(sender, instance, **kwargs):
+    _invalidate(instance.invoice_id)
+
+
+@receiver(post_save, sender=Order)
+def invalidate_on_order_write(sender, instance, created, **kwargs):
+    if not created:
+        _invalidate_order(instance)
+
+
+@receiver(order_items_changed, sender=Order)
+def invalidate_on_items_changed(sender, order, **kwargs):
+    _invalidate_order(order)
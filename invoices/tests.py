@@ -1,3 +1,228 @@
-from django.test import TestCase
+import csv
+import io
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from inventory.models import Category, Product
+from orders.models import Order, OrderItem
+from settings_app.services import set_setting, store as settings_store
+from users.models import User
+from .management.commands.render_invoice_pdfs import get_worker_count
+from .models import Invoice, Payment
+from .pdf import InvoicePDF, get_cache_dir
+from .services import generate_invoices, get_default_tax_rate
+from .views import invoices_export
+
+PDF_TEMPLATES = [{
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'OPTIONS': {
+        'loaders': [('django.template.loaders.locmem.Loader', {
+            'invoices/invoice_pdf.html': (
+                '<h1>{{ invoice.invoice_number }}</h1>'
+                '{% for item in order_items %}<p>{{ item.product.name }} x {{ item.quantity }}</p>{% endfor %}'
+                '<p>{{ invoice.total_amount }} / {{ total_paid }}</p>'
+            ),
+        })],
+    },
+}]
+
+
+@override_settings(TEMPLATES=PDF_TEMPLATES)
+class InvoicePDFTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        client = User.objects.create(username='client')
+        category = Category.objects.create(name='General')
+        cls.product = Product.objects.create(
+            name='Hammer', sku='HM-1', category=category, quantity=50,
+            cost_price=Decimal('2.00'), selling_price=Decimal('5.00')
+        )
+        cls.order = Order.objects.create(client=client)
+        OrderItem.objects.create(order=cls.order, product=cls.product, quantity=2, price=Decimal('5.00'))
+        cls.invoice = Invoice.objects.create(order=cls.order, tax_rate=Decimal('10.00'))
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def get(self):
+        return InvoicePDF.load(self.invoice.pk).get()
+
+    def test_second_download_is_served_from_cache(self):
+        path, rendered = self.get()
+        self.assertTrue(rendered)
+        self.assertTrue(path.read_bytes().startswith(b'%PDF'))
+
+        self.assertEqual(self.get(), (path, False))
+
+    def test_payment_invalidates_cached_pdf(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            path, _ = self.get()
+            Payment.objects.create(invoice=self.invoice, amount=Decimal('4.00'), method=Payment.PaymentMethod.CASH)
+        self.assertFalse(path.exists())
+
+        new_path, rendered = self.get()
+        self.assertNotEqual(new_path, path)
+        self.assertTrue(rendered)
+
+    def test_item_change_changes_content_hash(self):
+        path, _ = self.get()
+        item = self.order.items.get()
+        item.quantity = 3
+        item.save()
+        self.assertNotEqual(InvoicePDF.load(self.invoice.pk).path, path)
+
+    def test_included_template_changes_content_hash(self):
+        def templates(footer):
+            return [{**PDF_TEMPLATES[0], 'OPTIONS': {'loaders': [('django.template.loaders.locmem.Loader', {
+                'invoices/invoice_pdf.html': '{% extends "invoices/base.html" %}{% block body %}{% endblock %}',
+                'invoices/base.html': '{% block body %}{% endblock %}{% include "invoices/footer.html" %}',
+                'invoices/footer.html': footer,
+            })]}}]
+
+        with override_settings(TEMPLATES=templates('<p>Thanks</p>')):
+            path = InvoicePDF.load(self.invoice.pk).path
+        with override_settings(TEMPLATES=templates('<p>Thank you</p>')):
+            self.assertNotEqual(InvoicePDF.load(self.invoice.pk).path, path)
+
+    def test_order_save_does_not_look_up_invoice(self):
+        order = Order.objects.get(pk=self.order.pk)
+        with CaptureQueriesContext(connection) as queries:
+            order.save()
+        self.assertFalse(any('invoices_invoice' in query['sql'] for query in queries))
+
+    def test_prerender_command(self):
+        # دفعة صغيرة تولد في العملية الحالية بدون بدء عمليات
+        with mock.patch('invoices.management.commands.render_invoice_pdfs.ProcessPoolExecutor') as pool:
+            call_command('render_invoice_pdfs', stdout=io.StringIO())
+        pool.assert_not_called()
+        self.assertEqual(len(list(get_cache_dir().glob(f'{self.invoice.pk}-*.pdf'))), 1)
+        self.assertFalse(self.get()[1])
+
+    @mock.patch('os.cpu_count', return_value=8)
+    def test_prerender_worker_count(self, cpu_count):
+        self.assertEqual(get_worker_count(5), 1)
+        self.assertEqual(get_worker_count(35), 3)
+        self.assertEqual(get_worker_count(5000), 8)
+        self.assertEqual(get_worker_count(3, requested=4), 3)
+        self.assertEqual(get_worker_count(0), 1)
+
+
+class InvoiceFinancialsTests(TestCase):
+    FIELDS = ('subtotal', 'tax_amount', 'total_amount', 'amount_paid', 'balance')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = User.objects.create(username='client')
+        category = Category.objects.create(name='General')
+        cls.product = Product.objects.create(
+            name='Hammer', sku='HM-1', category=category, quantity=50,
+            cost_price=Decimal('1.00'), selling_price=Decimal('3.33'),
+        )
+
+    def make_invoice(self, quantity=0, tax_rate='0', discount='0', payments=(), price=None):
+        order = Order.objects.create(client=self.client_user)
+        if quantity:
+            OrderItem.objects.create(order=order, product=self.product, quantity=quantity, price=price)
+        invoice = Invoice.objects.create(order=order, tax_rate=Decimal(tax_rate), discount=Decimal(discount))
+        for amount in payments:
+            Payment.objects.create(invoice=invoice, amount=Decimal(amount), method=Payment.PaymentMethod.CASH)
+        return invoice
+
+    def financials(self, invoice):
+        return tuple(getattr(invoice, name) for name in self.FIELDS)
+
+    def test_annotated_and_computed_values_match(self):
+        cases = {
+            # 9.99 * 7.5% = 0.74925 وتقريب الضريبة قبل الإجمالي
+            'rounding': (self.make_invoice(3, '7.50', '0.50', ['4.00', '1.25']),
+                         ('9.99', '0.75', '10.24', '5.25', '4.99')),
+            # نصف سنت بالضبط: 6.70 * 15% = 1.005 تقرب للأعلى
+            'half cent': (self.make_invoice(2, '15.00', price=Decimal('3.35')), ('6.70', '1.01', '7.71', '0.00', '7.71')),
+            'half cent with discount': (self.make_invoice(1, '0.50', '0.01', price=Decimal('1.00')),
+                                        ('1.00', '0.01', '1.00', '0.00', '1.00')),
+            'no payments': (self.make_invoice(2, '10.00', '1.00'), ('6.66', '0.67', '6.33', '0.00', '6.33')),
+            'no items': (self.make_invoice(0, '15.00', payments=['2.00']), ('0.00', '0.00', '0.00', '2.00', '-2.00')),
+        }
+        annotated = Invoice.objects.with_financials().in_bulk([invoice.pk for invoice, _ in cases.values()])
+        for name, (invoice, expected) in cases.items():
+            with self.subTest(name):
+                computed = self.financials(Invoice.objects.get(pk=invoice.pk))
+                self.assertEqual(computed, tuple(Decimal(value) for value in expected))
+                self.assertEqual(self.financials(annotated[invoice.pk]), computed)
+
+    def test_list_and_export_query_count(self):
+        user = User.objects.create(username='staff', is_staff=True)
+        self.client.force_login(user)
+        url = reverse('invoices-list')
+        for count in (2, 12):
+            while Invoice.objects.count() < count:
+                self.make_invoice(2, '10.00', payments=['1.00'])
+            # الجلسة والمستخدم، العدد للصفحات، ثم الفواتير مع مبالغها
+            with self.assertNumQueries(4):
+                response = self.client.get(url)
+            self.assertEqual(len(response.context['page_obj']), count)
+
+        request = RequestFactory().get('/invoices/export/')
+        request.user = user
+        with self.assertNumQueries(1):
+            content = b''.join(invoices_export(request).streaming_content)
+        rows = list(csv.DictReader(io.StringIO(content.decode('utf-8-sig'))))
+        self.assertEqual(len(rows), 12)
+        invoice = Invoice.objects.get(invoice_number=rows[0]['Invoice Number'])
+        self.assertEqual(
+            [Decimal(rows[0][column]) for column in ('Subtotal', 'Tax Amount', 'Total Amount', 'Amount Paid', 'Balance')],
+            list(self.financials(invoice)),
+        )
+
+
+class GenerateInvoicesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = User.objects.create(username='client')
+
+    def make_orders(self, count, status=Order.OrderStatus.COMPLETED):
+        return [Order.objects.create(client=self.client_user, status=status) for _ in range(count)]
+
+    def test_invoices_only_uninvoiced_completed_orders(self):
+        set_setting('default_tax_rate', '7.5')
+        self.addCleanup(settings_store.invalidate)
+        completed = self.make_orders(3)
+        self.make_orders(2, status=Order.OrderStatus.PENDING)
+        invoiced = self.make_orders(1)[0]
+        existing = Invoice.objects.create(order=invoiced, tax_rate=Decimal('20.00'))
+
+        self.assertEqual(generate_invoices(batch_size=2), 3)
+
+        invoices = Invoice.objects.filter(order__in=completed)
+        self.assertEqual(invoices.count(), 3)
+        self.assertEqual({invoice.tax_rate for invoice in invoices}, {Decimal('7.50')})
+        self.assertTrue(all(invoice.due_date and invoice.invoice_number for invoice in invoices))
+        numbers = list(Invoice.objects.values_list('invoice_number', flat=True))
+        self.assertEqual(len(numbers), len(set(numbers)))
+        self.assertEqual(Invoice.objects.get(order=invoiced), existing)
+
+        # التشغيل مرة أخرى لا ينشئ شيئًا
+        self.assertEqual(generate_invoices(), 0)
+
+    def test_query_count_does_not_grow_with_orders(self):
+        self.make_orders(5)
+        # تأكيد المعاملة، فتستخدم الدفعة التالية باقي كتلة الأرقام
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_invoices(tax_rate=Decimal('0'))
+        self.make_orders(50)
+        # لكل دفعة: اختيار الطلبات، حجز كتلة الأرقام إن لزم، bulk_create (مع نقاط الحفظ)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(generate_invoices(tax_rate=Decimal('0')), 50)
+        self.assertLessEqual(len(queries), 10)
@@ -3,6 +3,8 @@ from . import views
 
 urlpatterns = [
     path('', views.invoices_list, name='invoices-list'),
+    path('export/', views.invoices_export, name='invoices-export'),
+    path('generate/', views.invoices_generate, name='invoices-generate'),
     path('<int:pk>/', views.invoice_detail, name='invoice-detail'),
     path('create/<int:order_id>/', views.invoice_create, name='invoice-create'),
     path('<int:pk>/payment/add/', views.add_payment, name='add-payment'),
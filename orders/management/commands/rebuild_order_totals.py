@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Round
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Rebuild (or check) the stored total_amount / total_items columns on orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report orders whose stored totals are wrong')
+        parser.add_argument('--order', type=int, action='append', dest='orders', help='Limit to the given order id (repeatable)')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        if options['orders']:
+            orders = orders.filter(pk__in=options['orders'])
+
+        # مقارنة المجاميع المخزنة بالمجاميع المحسوبة في استعلام واحد. المبلغ يقرب لخانتين لأن
+        # SQLite يحسب المجموع بأعداد عشرية تقريبية (300.15000000000003)
+        expected = Order.totals_expressions()
+        mismatched = orders.annotate(
+            expected_amount=Round(expected['total_amount'], 2),
+            expected_items=expected['total_items'],
+        ).exclude(
+            Q(total_amount=F('expected_amount')) & Q(total_items=F('expected_items'))
+        ).values_list('order_number', 'total_amount', 'expected_amount', 'total_items', 'expected_items')
+
+        if options['check']:
+            bad = list(mismatched)
+            for number, amount, expected_amount, items, expected_items in bad:
+                self.stdout.write(
+                    f'Order #{number}: amount {amount} != {expected_amount}, items {items} != {expected_items}'
+                )
+            if bad:
+                raise CommandError(f'{len(bad)} order(s) have stale totals')
+            self.stdout.write(self.style.SUCCESS('All order totals are consistent'))
+            return
+
+        with transaction.atomic():
+            updated = orders.update(**expected)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt totals for {updated} order(s)'))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:56
+
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    amount = items.annotate(
+        total=Sum(ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField()))
+    ).values('total')
+    count = items.annotate(total=Sum('quantity')).values('total')
+    Order.objects.update(
+        total_amount=Coalesce(Subquery(amount), Value(0), output_field=DecimalField(max_digits=12, decimal_places=2)),
+        total_items=Coalesce(Subquery(count), Value(0), output_field=models.PositiveIntegerField()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='total_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Total Amount'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_items',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total Items'),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
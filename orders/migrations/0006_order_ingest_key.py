@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_numbersequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderIngestKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True, verbose_name='Idempotency Key')),
+                ('fingerprint', models.CharField(max_length=64, verbose_name='Fingerprint')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('order', models.OneToOneField(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ingest_key', to='orders.order', verbose_name='Order')),
+            ],
+            options={
+                'verbose_name': 'Order Ingest Key',
+                'verbose_name_plural': 'Order Ingest Keys',
+            },
+        ),
+    ]
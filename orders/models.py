@@ -1,9 +1,24 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Sum, F
+from django.db.models import Sum, F, OuterRef, Subquery, Value, ExpressionWrapper, DecimalField
+from django.db.models.functions import Coalesce
 from inventory.models import Product
+from .signals import order_items_changed
 from django.utils import timezone
 
+class NumberSequence(models.Model):
+    """عداد مشترك تحجز منه العمليات أرقام الطلبات والفواتير على شكل كتل"""
+    name = models.CharField(max_length=50, unique=True, verbose_name=_('Name'))
+    next_value = models.BigIntegerField(default=1, verbose_name=_('Next Value'))
+    
+    def __str__(self):
+        return f"{self.name} ({self.next_value})"
+    
+    class Meta:
+        verbose_name = _('Number Sequence')
+        verbose_name_plural = _('Number Sequences')
+
+
 class Order(models.Model):
     """نموذج للطلبات"""
     class OrderStatus(models.TextChoices):
@@ -18,37 +33,69 @@ class Order(models.Model):
     status = models.CharField(max_length=15, choices=OrderStatus.choices, default=OrderStatus.PENDING, verbose_name=_('Status'))
     notes = models.TextField(blank=True, null=True, verbose_name=_('Notes'))
     created_by = models.ForeignKey('users.User', on_delete=models.SET_NULL, null=True, related_name='created_orders', verbose_name=_('Created By'))
+    # مجاميع مخزنة يتم تحديثها عند كتابة عناصر الطلب
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False, verbose_name=_('Total Amount'))
+    total_items = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('Total Items'))
+    TOTALS_FIELDS = ['total_amount', 'total_items']
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Created At'))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Updated At'))
     
     def __str__(self):
         return f"Order #{self.order_number} - {self.client.username}"
     
-    @property
-    def total_amount(self):
-        """حساب المبلغ الإجمالي للطلب"""
-        return self.items.aggregate(
-            total=Sum(F('quantity') * F('price'))
-        )['total'] or 0
+    @staticmethod
+    def totals_expressions():
+        """تعابير SQL لحساب مجاميع الطلب من عناصره (تستخدم مع update و annotate)"""
+        items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+        amount = items.annotate(
+            total=Sum(ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField()))
+        ).values('total')
+        count = items.annotate(total=Sum('quantity')).values('total')
+        return {
+            'total_amount': Coalesce(Subquery(amount), Value(0), output_field=DecimalField(max_digits=12, decimal_places=2)),
+            'total_items': Coalesce(Subquery(count), Value(0), output_field=models.PositiveIntegerField()),
+        }
     
-    @property
-    def total_items(self):
-        """حساب العدد الإجمالي للعناصر في الطلب"""
-        return self.items.aggregate(total=Sum('quantity'))['total'] or 0
+    def update_totals(self):
+        """إعادة حساب المجاميع المخزنة بجملة UPDATE واحدة ثم قراءتها في النسخة الحالية"""
+        Order.objects.filter(pk=self.pk).update(**Order.totals_expressions())
+        self.refresh_from_db(fields=self.TOTALS_FIELDS)
+    
+    def items_changed(self, changes):
+        """
+        يستدعى بعد أي كتابة على عناصر الطلب لتحديث المجاميع وإعلام التطبيقات الأخرى.
+        changes: فروق العناصر [(product_id, quantity, amount, lines)]، سالبة للحذف.
+        """
+        self.update_totals()
+        product_ids = list(dict.fromkeys(product_id for product_id, *_ in changes))
+        order_items_changed.send(sender=Order, order=self, product_ids=product_ids, changes=changes)
     
     def save(self, *args, **kwargs):
-        """إنشاء رقم طلب فريد إذا لم يكن موجودًا"""
+        """
+        إنشاء رقم طلب فريد إذا لم يكن موجودًا. حفظ طلب موجود لا يكتب المجاميع إلا إذا
+        طلبت صراحة في update_fields، حتى لا تكتب نسخة قديمة مجاميع تغيرت بعد قراءتها.
+        """
         if not self.order_number:
-            prefix = 'ORD'
-            timestamp = timezone.now().strftime('%Y%m%d%H%M')
-            self.order_number = f"{prefix}{timestamp}"
+            from .sequences import next_number
+            self.order_number = next_number('order', 'ORD')
         
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.TOTALS_FIELDS
+            ]
         super().save(*args, **kwargs)
     
     class Meta:
         verbose_name = _('Order')
         verbose_name_plural = _('Orders')
         ordering = ['-created_at']
+        indexes = [
+            # فهارس مركبة تخدم التصفح بالمؤشر (created_at, id) مع كل مرشح
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='order_status_created_idx'),
+            models.Index(fields=['client', '-created_at', '-id'], name='order_client_created_idx'),
+        ]
 
 
 class OrderItem(models.Model):
@@ -70,7 +117,7 @@ class OrderItem(models.Model):
     def save(self, *args, **kwargs):
         """تعيين السعر من المنتج إذا لم يتم تحديده"""
         if not self.price:
-            self.price = self.product.price
+            self.price = self.product.selling_price
         
         # إذا كان الطلب مكتمل، قم بتقليل المخزون
         if self.order.status == Order.OrderStatus.COMPLETED and not self.id:
@@ -79,15 +126,55 @@ class OrderItem(models.Model):
             StockMovement.objects.create(
                 product=self.product,
                 quantity=self.quantity,
-                movement_type=StockMovement.MovementType.REDUCTION,
+                movement_type=StockMovement.MOVEMENT_OUT,
                 reference=f"Order #{self.order.order_number}",
                 created_by=self.order.created_by
             )
         
-        super().save(*args, **kwargs)
+        # حفظ العنصر وتحديث مجاميع الطلب في نفس المعاملة
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding:
+                previous = OrderItem.objects.filter(pk=self.pk).values_list('product_id', 'quantity', 'price').first()
+            super().save(*args, **kwargs)
+            changes = [(self.product_id, self.quantity, self.subtotal, 1)]
+            if previous:
+                product_id, quantity, price = previous
+                changes.append((product_id, -quantity, -quantity * price, -1))
+            self.order.items_changed(changes)
+    
+    def delete(self, *args, **kwargs):
+        """تحديث مجاميع الطلب بعد حذف العنصر"""
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self.order.items_changed([(self.product_id, -self.quantity, -self.subtotal, -1)])
+        return result
     
     class Meta:
         verbose_name = _('Order Item')
         verbose_name_plural = _('Order Items')
         unique_together = ('order', 'product')
+
+
+class OrderIngestKey(models.Model):
+    """
+    مفتاح عدم التكرار (idempotency key) الذي يرسله النظام الخارجي مع كل طلب في الإدخال المجمع.
+
+    إعادة إرسال نفس المفتاح ترجع الطلب الموجود بدلًا من إنشاء طلب جديد، والبصمة تكشف
+    إعادة استخدام المفتاح لطلب بمحتوى مختلف.
+    """
+    key = models.CharField(max_length=100, unique=True, verbose_name=_('Idempotency Key'))
+    # sha256 لمحتوى الطلب كما أرسل (بدون المفتاح)
+    fingerprint = models.CharField(max_length=64, verbose_name=_('Fingerprint'))
+    order = models.OneToOneField(
+        Order, on_delete=models.SET_NULL, null=True, related_name='ingest_key', verbose_name=_('Order')
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Created At'))
+
+    def __str__(self):
+        return self.key
+
+    class Meta:
+        verbose_name = _('Order Ingest Key')
+        verbose_name_plural = _('Order Ingest Keys')
 # Create your models here.
@@ -0,0 +1,131 @@
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+from django.db.utils import ConnectionDoesNotExist
+
+from .models import NumberSequence
+
+# عدد الأرقام التي تحجزها كل عملية في كل مرة تصل فيها إلى قاعدة البيانات
+DEFAULT_BLOCK_SIZE = 100
+
+
+def get_reserve_alias(using=DEFAULT_DB_ALIAS):
+    """
+    اسم اتصال خاص بالخيط الحالي لحجز الكتل، بنفس إعدادات using لكن بمعاملاته الخاصة.
+    لا يضاف إلى DATABASES، فلا يظهر في connections.all() ولا في قيود قواعد بيانات الاختبارات.
+    """
+    alias = f'{using}__sequences'
+    try:
+        connection = connections[alias]
+    except ConnectionDoesNotExist:
+        connection = connections[alias] = connections.create_connection(using)
+    # يتبع CONN_MAX_AGE مثل اتصالات الطلبات
+    connection.close_if_unusable_or_obsolete()
+    return alias
+
+
+class _Block:
+    def __init__(self, start, end, committed=True):
+        self.next = start
+        self.end = end
+        self.committed = committed
+
+    def confirm(self):
+        self.committed = True
+
+
+class SequenceAllocator:
+    """
+    مولد أرقام تسلسلية يحجز كتلًا من جدول NumberSequence.
+
+    كل كتلة تحجز بجملة UPDATE واحدة على صف العداد، لذلك لا تتعارض العمليات المختلفة
+    (workers) فيما بينها، ولا يحتاج كل رقم إلى رحلة إلى قاعدة البيانات. الأرقام فريدة
+    ومتزايدة داخل كل عملية لكنها قد تحتوي على فجوات بين العمليات.
+
+    الحجز يتم على اتصال منفصل (get_reserve_alias) ويؤكد فورًا، فلا يبقى صف العداد مقفلًا
+    حتى نهاية معاملة الطلب، وتستخدم الكتلة في كل نقاط الحفظ والمعاملات التالية. التراجع عن
+    معاملة الطلب يترك فجوة في الأرقام فقط.
+
+    SQLite يسمح بكاتب واحد، واتصال ثان ينتظر معاملة الطلب نفسها، لذلك تحجز الكتلة فيه على
+    اتصال الطلب. الكتلة المحجوزة في معاملة لم تؤكد بعد تستخدم ما دام التراجع لم يلغ حجزها.
+
+    الكتل محفوظة لكل خيط (thread).
+    """
+
+    def __init__(self, name, block_size=None, using=DEFAULT_DB_ALIAS):
+        self.name = name
+        self.block_size = block_size
+        self.using = using
+        self._local = threading.local()
+
+    def _get_block_size(self):
+        return self.block_size or getattr(settings, 'NUMBER_SEQUENCE_BLOCK_SIZE', DEFAULT_BLOCK_SIZE)
+
+    def _is_usable(self, block):
+        if block is None or block.next >= block.end:
+            return False
+        if block.committed:
+            return True
+        # Django يحذف دوال on_commit المسجلة داخل نقطة حفظ أو معاملة تم التراجع عنها
+        connection = transaction.get_connection(self.using)
+        return any(func == block.confirm for _, func, _ in connection.run_on_commit)
+
+    def _reserve(self, size):
+        if connections[self.using].vendor == 'sqlite':
+            using = self.using
+            committed = not transaction.get_connection(using).in_atomic_block
+        else:
+            using, committed = get_reserve_alias(self.using), True
+
+        with transaction.atomic(using=using):
+            NumberSequence.objects.using(using).get_or_create(name=self.name)
+            sequence = NumberSequence.objects.using(using).filter(name=self.name)
+            sequence.update(next_value=F('next_value') + size)
+            end = sequence.values_list('next_value', flat=True).get()
+
+        block = _Block(end - size, end, committed)
+        if not committed:
+            transaction.on_commit(block.confirm, using=using)
+        return block
+
+    def allocate(self, count):
+        """حجز count رقمًا دفعة واحدة (يستخدم في الإنشاء المجمع)"""
+        block = getattr(self._local, 'block', None)
+        numbers = []
+        while len(numbers) < count:
+            if not self._is_usable(block):
+                block = self._reserve(max(self._get_block_size(), count - len(numbers)))
+                self._local.block = block
+            take = min(block.end - block.next, count - len(numbers))
+            numbers.extend(range(block.next, block.next + take))
+            block.next += take
+        return numbers
+
+    def next(self):
+        return self.allocate(1)[0]
+
+
+_allocators = {}
+_allocators_lock = threading.Lock()
+
+
+def get_allocator(name):
+    with _allocators_lock:
+        if name not in _allocators:
+            _allocators[name] = SequenceAllocator(name)
+        return _allocators[name]
+
+
+def format_number(prefix, value):
+    return f"{prefix}{value:010d}"
+
+
+def next_number(name, prefix):
+    """إرجاع رقم فريد جديد مثل ORD0000000042"""
+    return format_number(prefix, get_allocator(name).next())
+
+
+def allocate_numbers(name, prefix, count):
+    return [format_number(prefix, value) for value in get_allocator(name).allocate(count)]
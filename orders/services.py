@@ -0,0 +1,309 @@
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Q, When
+from django.utils.translation import gettext_lazy as _
+
+from inventory.alerts import sync_low_stock
+from inventory.models import Product, StockMovement
+from users.models import User
+from .models import Order, OrderIngestKey, OrderItem
+from .sequences import allocate_numbers
+from .signals import orders_ingested
+
+# الحد الأقصى لعدد الطلبات في طلب إدخال مجمع واحد
+INGEST_BATCH_LIMIT = 500
+# شرط OR لكل منتج في جملة خصم المخزون، و SQLite يرفض التعابير الأعمق من 1000
+DECREMENT_BATCH_SIZE = 200
+
+KEY_MAX_LENGTH = OrderIngestKey._meta.get_field('key').max_length
+KEY_CONFLICT = _('Idempotency key was already used for a different order')
+
+
+def _parse_lines(items):
+    """تحويل بيانات العناصر الواردة إلى (product_id, quantity, price) مع التحقق من صحتها"""
+    lines = {}
+    for item in items:
+        try:
+            product_id = int(item['product_id'])
+            quantity = int(item['quantity'])
+            price = Decimal(str(item['price'])) if item.get('price') not in (None, '') else None
+        except (KeyError, TypeError, ValueError, InvalidOperation):
+            raise ValueError(_('Each item needs a valid product_id, quantity and price'))
+
+        if quantity <= 0:
+            raise ValueError(_('Item quantity must be greater than zero'))
+        if price is not None and price < 0:
+            raise ValueError(_('Item price cannot be negative'))
+        if product_id in lines:
+            raise ValueError(_('Each product can only appear once per order'))
+
+        lines[product_id] = (quantity, price)
+    return lines
+
+
+def decrement_stock(quantities):
+    """
+    خصم الكميات من المخزون بجملة UPDATE واحدة.
+
+    quantities: قاموس {product_id: quantity}. يفشل الخصم بالكامل إذا لم يكن المخزون كافيًا
+    لأي منتج، ويجب استدعاؤه داخل معاملة. بعده يحدث is_low_stock لنفس المنتجات.
+    الدفعات الكبيرة (الإدخال المجمع) تقسم إلى جمل من DECREMENT_BATCH_SIZE منتج.
+    """
+    if not quantities:
+        return
+
+    lines = list(quantities.items())
+    for start in range(0, len(lines), DECREMENT_BATCH_SIZE):
+        chunk = lines[start:start + DECREMENT_BATCH_SIZE]
+        enough_stock = Q()
+        for product_id, quantity in chunk:
+            enough_stock |= Q(pk=product_id, quantity__gte=quantity)
+
+        updated = Product.objects.filter(enough_stock).update(
+            quantity=Case(
+                *[When(pk=product_id, then=F('quantity') - quantity) for product_id, quantity in chunk],
+                default=F('quantity'),
+                output_field=IntegerField(),
+            )
+        )
+        if updated != len(chunk):
+            raise ValueError(_('Insufficient stock available'))
+    sync_low_stock(Product.objects.filter(pk__in=list(quantities)))
+
+
+def create_order(client, items, created_by=None, notes='', status=Order.OrderStatus.PENDING):
+    """
+    إنشاء طلب مع عناصره في معاملة واحدة.
+
+    يتم جلب جميع المنتجات باستعلام واحد، وإدراج العناصر وحركات المخزون دفعة واحدة،
+    ويحسب مجموع الطلب مرة واحدة بعد الإدراج. إذا كان الطلب مكتملًا يخصم المخزون.
+    """
+    lines = _parse_lines(items)
+    if not lines:
+        raise ValueError(_('Client and items are required'))
+
+    products = Product.objects.in_bulk(list(lines))
+    missing = set(lines) - set(products)
+    if missing:
+        raise ValueError(_('Unknown product id(s): %s') % ', '.join(str(pk) for pk in sorted(missing)))
+
+    with transaction.atomic():
+        order = Order.objects.create(
+            client=client,
+            notes=notes,
+            status=status,
+            created_by=created_by
+        )
+
+        order_items = OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=products[product_id],
+                quantity=quantity,
+                price=price if price is not None else products[product_id].selling_price
+            )
+            for product_id, (quantity, price) in lines.items()
+        ])
+
+        if status == Order.OrderStatus.COMPLETED:
+            decrement_stock({product_id: quantity for product_id, (quantity, price) in lines.items()})
+            StockMovement.objects.bulk_create([
+                StockMovement(
+                    product_id=product_id,
+                    quantity=quantity,
+                    movement_type=StockMovement.MOVEMENT_OUT,
+                    reference=f"Order #{order.order_number}",
+                    created_by=created_by
+                )
+                for product_id, (quantity, price) in lines.items()
+            ])
+
+        order.items_changed([(item.product_id, item.quantity, item.subtotal, 1) for item in order_items])
+
+    order.refresh_from_db(fields=['total_amount', 'total_items'])
+    return order
+
+
+def _result(key, status, **fields):
+    return {'idempotency_key': key, 'status': status, **fields}
+
+
+def _fingerprint(data):
+    """بصمة محتوى الطلب بدون المفتاح (ترتيب الحقول لا يؤثر)"""
+    payload = {name: value for name, value in data.items() if name != 'idempotency_key'}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _parse_ingest_order(data):
+    """التحقق من طلب واحد في الإدخال المجمع، يرجع (client_id, status, notes, lines)"""
+    try:
+        client_id = int(data['client'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(_('A valid client id is required'))
+
+    status = data.get('status') or Order.OrderStatus.PENDING
+    if status not in Order.OrderStatus.values:
+        raise ValueError(_('Invalid status'))
+
+    items = data.get('items')
+    lines = _parse_lines(items) if isinstance(items, list) else None
+    if not lines:
+        raise ValueError(_('At least one item is required'))
+    return client_id, status, data.get('notes') or '', lines
+
+
+def ingest_orders(orders, created_by=None):
+    """
+    إدخال دفعة من الطلبات (من نظام خارجي) مع منع التكرار بمفتاح idempotency_key لكل طلب.
+
+    يرجع نتيجة لكل طلب بنفس الترتيب: created أو duplicate (المفتاح موجود بنفس المحتوى،
+    مع الطلب الموجود) أو conflict (المفتاح مستخدم لطلب مختلف) أو error (مع السبب).
+    الطلبات الخاطئة لا تمنع إنشاء باقي الدفعة، ولا يحفظ مفتاحها فيمكن إعادة إرسالها بعد
+    التصحيح. يرفع ValueError إذا لم تكن الدفعة قائمة صالحة.
+    """
+    if not isinstance(orders, list) or not orders:
+        raise ValueError(_('orders must be a non-empty list'))
+    if len(orders) > INGEST_BATCH_LIMIT:
+        raise ValueError(_('At most %(limit)d orders per batch') % {'limit': INGEST_BATCH_LIMIT})
+
+    try:
+        return _ingest_batch(orders, created_by)
+    except IntegrityError:
+        # طلب متزامن أدرج نفس المفتاح قبلنا، وفي المحاولة الثانية يظهر كطلب مكرر
+        return _ingest_batch(orders, created_by)
+
+
+def _ingest_batch(orders, created_by):
+    """
+    الدفعة كلها في معاملة واحدة بعدد ثابت من الاستعلامات: المفاتيح الموجودة، العملاء،
+    المنتجات (مقفلة)، حجز الأرقام، ثم bulk_create للطلبات والعناصر والحركات والمفاتيح.
+    المجاميع تحسب هنا قبل الإدراج فلا حاجة لتحديث الطلبات بعده.
+    """
+    results = [None] * len(orders)
+    parsed = {}
+    first_index = {}
+    for index, data in enumerate(orders):
+        key = data.get('idempotency_key') if isinstance(data, dict) else None
+        if not isinstance(key, str) or not key.strip() or len(key) > KEY_MAX_LENGTH:
+            results[index] = _result(key, 'error', error=str(_('A valid idempotency_key is required')))
+            continue
+        if key in first_index:
+            # نفس المفتاح مرتين في الدفعة: يأخذ نتيجة الأول بعد الإنشاء
+            continue
+        first_index[key] = index
+        try:
+            parsed[index] = (key, _fingerprint(data), *_parse_ingest_order(data))
+        except ValueError as e:
+            results[index] = _result(key, 'error', error=str(e))
+
+    with transaction.atomic():
+        existing = {
+            key: (fingerprint, order_id, order_number)
+            for key, fingerprint, order_id, order_number in OrderIngestKey.objects.filter(
+                key__in=list(first_index)
+            ).values_list('key', 'fingerprint', 'order_id', 'order__order_number')
+        }
+        for index, (key, fingerprint, *_rest) in list(parsed.items()):
+            if key in existing:
+                old_fingerprint, order_id, order_number = existing[key]
+                if old_fingerprint == fingerprint:
+                    results[index] = _result(key, 'duplicate', order_id=order_id, order_number=order_number)
+                else:
+                    results[index] = _result(key, 'conflict', error=str(KEY_CONFLICT))
+                del parsed[index]
+
+        client_ids = set(User.objects.filter(
+            pk__in={client_id for _key, _fp, client_id, *_rest in parsed.values()}
+        ).values_list('pk', flat=True))
+        product_ids = {product_id for *_rest, lines in parsed.values() for product_id in lines}
+        # القفل يمنع طلبًا متزامنًا من خصم نفس المخزون بين التحقق والخصم
+        products = Product.objects.select_for_update().only('selling_price', 'quantity').in_bulk(list(product_ids))
+        available = {pk: product.quantity for pk, product in products.items()}
+
+        accepted = []
+        for index, (key, fingerprint, client_id, status, notes, lines) in parsed.items():
+            missing = set(lines) - set(products)
+            error = None
+            if client_id not in client_ids:
+                error = _('Unknown client id: %s') % client_id
+            elif missing:
+                error = _('Unknown product id(s): %s') % ', '.join(str(pk) for pk in sorted(missing))
+            elif status == Order.OrderStatus.COMPLETED:
+                if any(available[pk] < quantity for pk, (quantity, price) in lines.items()):
+                    error = _('Insufficient stock available')
+                else:
+                    for pk, (quantity, price) in lines.items():
+                        available[pk] -= quantity
+            if error:
+                results[index] = _result(key, 'error', error=str(error))
+            else:
+                accepted.append((index, key, fingerprint, client_id, status, notes, lines))
+
+        if accepted:
+            created = _create_ingested(accepted, products, created_by)
+            for (index, key, *_rest), order in zip(accepted, created):
+                results[index] = _result(key, 'created', order_id=order.pk, order_number=order.order_number)
+
+    for index, data in enumerate(orders):
+        if results[index] is not None:
+            continue
+        first = first_index[data['idempotency_key']]
+        if _fingerprint(data) != _fingerprint(orders[first]):
+            results[index] = _result(data['idempotency_key'], 'conflict', error=str(KEY_CONFLICT))
+        elif results[first]['status'] == 'created':
+            results[index] = dict(results[first], status='duplicate')
+        else:
+            results[index] = results[first]
+    return results
+
+
+def _create_ingested(accepted, products, created_by):
+    """الإدراج المجمع للطلبات المقبولة (داخل معاملة _ingest_batch)، يرجع الطلبات بنفس الترتيب"""
+    def line_price(product_id, price):
+        return price if price is not None else products[product_id].selling_price
+
+    numbers = allocate_numbers('order', 'ORD', len(accepted))
+    orders = Order.objects.bulk_create([
+        Order(
+            order_number=number,
+            client_id=client_id,
+            status=status,
+            notes=notes,
+            created_by=created_by,
+            total_amount=sum(quantity * line_price(pk, price) for pk, (quantity, price) in lines.items()),
+            total_items=sum(quantity for quantity, price in lines.values()),
+        )
+        for number, (index, key, fingerprint, client_id, status, notes, lines) in zip(numbers, accepted)
+    ])
+
+    items, movements, sold = [], [], {}
+    for order, (index, key, fingerprint, client_id, status, notes, lines) in zip(orders, accepted):
+        for product_id, (quantity, price) in lines.items():
+            items.append(OrderItem(order=order, product_id=product_id, quantity=quantity,
+                                   price=line_price(product_id, price)))
+            if status == Order.OrderStatus.COMPLETED:
+                sold[product_id] = sold.get(product_id, 0) + quantity
+                movements.append(StockMovement(
+                    product_id=product_id,
+                    quantity=quantity,
+                    movement_type=StockMovement.MOVEMENT_OUT,
+                    reference=f"Order #{order.order_number}",
+                    created_by=created_by,
+                ))
+    OrderItem.objects.bulk_create(items)
+    if sold:
+        decrement_stock(sold)
+        StockMovement.objects.bulk_create(movements)
+
+    OrderIngestKey.objects.bulk_create([
+        OrderIngestKey(key=key, fingerprint=fingerprint, order=order)
+        for order, (index, key, fingerprint, *_rest) in zip(orders, accepted)
+    ])
+    orders_ingested.send(
+        sender=Order, orders=orders,
+        product_ids={order.pk: list(lines) for order, (*_rest, lines) in zip(orders, accepted)},
+    )
+    return orders
@@ -0,0 +1,10 @@
+from django.dispatch import Signal
+
+# يرسل بعد أي كتابة على عناصر طلب (إضافة، تعديل، حذف، إدراج مجمع)
+# المعاملات: order، product_ids (معرفات المنتجات المتأثرة)، changes (فروق العناصر
+# [(product_id, quantity, amount, lines)]، موجبة للإضافة وسالبة للحذف)
+order_items_changed = Signal()
+
+# يرسل بعد الإدخال المجمع للطلبات (bulk_create لا يرسل post_save ولا order_items_changed)
+# المعاملات: orders (الطلبات المنشأة)، product_ids (قاموس {معرف الطلب: معرفات منتجاته})
+orders_ingested = Signal()
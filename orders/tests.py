@@ -1,3 +1,406 @@
-from django.test import TestCase
+import csv
+import io
+import zipfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from inventory.models import Category, Product, StockMovement
+from inventory_management.pagination import KeysetPaginator
+from stats.models import DailySalesRollup
+from users.models import User
+from .models import NumberSequence, Order, OrderIngestKey, OrderItem
+from .sequences import SequenceAllocator
+from .services import DECREMENT_BATCH_SIZE, create_order, ingest_orders
+from .views import ORDERS_PER_PAGE, orders_export
+
+
+class SequenceAllocatorTests(TestCase):
+    def test_numbers_are_unique_across_allocators(self):
+        # كل allocator يمثل عملية (worker) مستقلة
+        workers = [SequenceAllocator('test', block_size=5) for _ in range(3)]
+        numbers = [worker.next() for _ in range(20) for worker in workers]
+        self.assertEqual(len(numbers), len(set(numbers)))
+
+    def test_block_is_reserved_with_one_update(self):
+        allocator = SequenceAllocator('test', block_size=10)
+        allocator.next()
+        with self.assertNumQueries(0):
+            for _ in range(9):
+                allocator.next()
+        self.assertEqual(NumberSequence.objects.get(name='test').next_value, 11)
+
+    def test_block_from_rolled_back_transaction_is_discarded(self):
+        allocator = SequenceAllocator('test', block_size=10)
+        try:
+            with transaction.atomic():
+                first = allocator.next()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+
+        # الحجز تم التراجع عنه، لذلك يجب حجز كتلة جديدة من قاعدة البيانات
+        other = SequenceAllocator('test', block_size=10)
+        self.assertEqual(other.next(), first)
+        self.assertNotEqual(allocator.next(), first + 1)
+
+
+class SequenceAllocatorTransactionTests(TransactionTestCase):
+    def test_block_from_rolled_back_outer_transaction_is_discarded(self):
+        allocator = SequenceAllocator('test', block_size=10)
+        try:
+            with transaction.atomic():
+                first = allocator.next()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+
+        # معاملة جديدة لا تستخدم كتلة معاملة تم التراجع عنها
+        with transaction.atomic():
+            self.assertEqual(allocator.next(), first)
+        # بعد تأكيد المعاملة تستخدم الكتلة بدون استعلامات
+        with self.assertNumQueries(0):
+            self.assertEqual(allocator.next(), first + 1)
+
+    @mock.patch.dict('orders.sequences._allocators', clear=True)
+    def test_orders_in_one_transaction_share_a_block(self):
+        # الكتلة تبقى صالحة بعد نقاط الحفظ داخل المعاملة
+        client = User.objects.create(username='client')
+        with CaptureQueriesContext(connection) as queries, transaction.atomic():
+            orders = [Order.objects.create(client=client) for _ in range(5)]
+
+        numbers = [int(order.order_number[3:]) for order in orders]
+        self.assertEqual(numbers, list(range(numbers[0], numbers[0] + 5)))
+        updates = [q for q in queries if q['sql'].startswith('UPDATE "orders_numbersequence"')]
+        self.assertEqual(len(updates), 1)
+
+
+class OrderNumberTests(TestCase):
+    def test_orders_created_in_same_minute_get_distinct_numbers(self):
+        client = User.objects.create(username='client')
+        orders = [Order.objects.create(client=client) for _ in range(5)]
+        self.assertEqual(len({order.order_number for order in orders}), 5)
+
+
+class OrderTotalsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = User.objects.create(username='client')
+        category = Category.objects.create(name='General')
+        cls.hammer = Product.objects.create(
+            name='Hammer', sku='HM-1', category=category, quantity=50,
+            cost_price=Decimal('2.00'), selling_price=Decimal('5.00'),
+        )
+        cls.nails = Product.objects.create(
+            name='Nails', sku='NL-1', category=category, quantity=50,
+            cost_price=Decimal('0.10'), selling_price=Decimal('0.25'),
+        )
+
+    def assertTotals(self, order, amount, items):
+        self.assertEqual((order.total_amount, order.total_items), (Decimal(amount), items))
+        order = Order.objects.get(pk=order.pk)
+        self.assertEqual((order.total_amount, order.total_items), (Decimal(amount), items))
+
+    def test_item_writes_keep_totals_in_sync(self):
+        order = Order.objects.create(client=self.client_user)
+        hammers = OrderItem.objects.create(order=order, product=self.hammer, quantity=3)
+        self.assertTotals(order, '15.00', 3)
+        OrderItem.objects.create(order=order, product=self.nails, quantity=4)
+        self.assertTotals(order, '16.00', 7)
+
+        hammers.quantity = 1
+        hammers.save()
+        self.assertTotals(order, '6.00', 5)
+        hammers.delete()
+        self.assertTotals(order, '1.00', 4)
+
+    def test_saving_stale_instance_keeps_totals(self):
+        order = Order.objects.create(client=self.client_user)
+        stale = Order.objects.get(pk=order.pk)
+        OrderItem.objects.create(order=order, product=self.hammer, quantity=3)
+
+        # النسخة القديمة ما زالت تحمل مجاميع صفرية
+        stale.status = Order.OrderStatus.IN_PROGRESS
+        stale.save()
+
+        order = Order.objects.get(pk=order.pk)
+        self.assertEqual(order.status, Order.OrderStatus.IN_PROGRESS)
+        self.assertEqual((order.total_amount, order.total_items), (Decimal('15.00'), 3))
+
+    def test_rebuild_command_checks_and_repairs(self):
+        order = Order.objects.create(client=self.client_user)
+        OrderItem.objects.create(order=order, product=self.hammer, quantity=2)
+        call_command('rebuild_order_totals', '--check', stdout=io.StringIO())
+
+        Order.objects.filter(pk=order.pk).update(total_amount=0, total_items=0)
+        out = io.StringIO()
+        with self.assertRaisesMessage(CommandError, '1 order(s) have stale totals'):
+            call_command('rebuild_order_totals', '--check', stdout=out)
+        self.assertIn(f'Order #{order.order_number}', out.getvalue())
+
+        call_command('rebuild_order_totals', stdout=io.StringIO())
+        order.refresh_from_db()
+        self.assertEqual((order.total_amount, order.total_items), (Decimal('10.00'), 2))
+        call_command('rebuild_order_totals', '--check', stdout=io.StringIO())
+
+
+class CreateOrderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = User.objects.create(username='client')
+        cls.category = Category.objects.create(name='General')
+        cls.products = Product.objects.bulk_create([
+            Product(
+                name=f'Part {i}', sku=f'P-{i}', category=cls.category, quantity=10,
+                cost_price=Decimal('1.00'), selling_price=Decimal('2.00'),
+            )
+            for i in range(DECREMENT_BATCH_SIZE + 5)
+        ])
+
+    def lines(self, products, quantity=1):
+        return [{'product_id': product.pk, 'quantity': quantity} for product in products]
+
+    def stock(self, products):
+        return list(Product.objects.filter(pk__in=[p.pk for p in products]).order_by('pk').values_list('quantity', flat=True))
+
+    def test_short_line_rolls_back_everything(self):
+        products = self.products[:3]
+        items = self.lines(products, quantity=4)
+        items[2]['quantity'] = 11
+        with self.assertRaisesMessage(ValueError, 'Insufficient stock'):
+            create_order(self.client_user, items, status=Order.OrderStatus.COMPLETED)
+
+        self.assertEqual(self.stock(products), [10, 10, 10])
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_order_larger_than_decrement_batch(self):
+        order = create_order(self.client_user, self.lines(self.products, quantity=3), status=Order.OrderStatus.COMPLETED)
+        self.assertEqual(order.total_items, 3 * len(self.products))
+        self.assertEqual(self.stock(self.products), [7] * len(self.products))
+        self.assertEqual(StockMovement.objects.filter(reference=f'Order #{order.order_number}').count(), len(self.products))
+
+    def test_duplicate_product_lines(self):
+        with self.assertRaisesMessage(ValueError, 'Each product can only appear once per order'):
+            create_order(self.client_user, self.lines([self.products[0], self.products[0]]))
+        self.assertFalse(Order.objects.exists())
+
+    def test_query_count_does_not_grow_with_lines(self):
+        def count(products):
+            with CaptureQueriesContext(connection) as captured:
+                create_order(self.client_user, self.lines(products), status=Order.OrderStatus.COMPLETED)
+            return len(captured)
+
+        count(self.products[:1])  # حجز كتلة أرقام الطلبات
+        self.assertEqual(count(self.products[1:3]), count(self.products[3:40]))
+
+    def test_view_returns_400_only_for_invalid_data(self):
+        self.client.force_login(self.client_user)
+        url = reverse('order-create')
+
+        def post(data):
+            return self.client.post(url, data, content_type='application/json')
+
+        self.assertEqual(post({'client': 999999, 'items': self.lines(self.products[:1])}).json()['message'], 'Client not found')
+        response = post({'client': self.client_user.pk, 'items': self.lines(self.products[:1], quantity=50),
+                         'status': Order.OrderStatus.COMPLETED})
+        self.assertEqual((response.status_code, response.json()['message']), (400, 'Insufficient stock available'))
+        self.assertEqual(post(['not', 'an', 'object']).status_code, 400)
+
+        # الأخطاء البرمجية لا تتحول إلى 400
+        with mock.patch('orders.views.create_order', side_effect=RuntimeError('bug')):
+            with self.assertRaises(RuntimeError):
+                post({'client': self.client_user.pk, 'items': self.lines(self.products[:1])})
+
+
+class OrderListPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = User.objects.create(username='client')
+        cls.orders = [Order.objects.create(client=cls.client_user) for _ in range(7)]
+        # ثلاثة طلبات بنفس الوقت: الترتيب بينها بالمعرف تنازليًا
+        same_time = timezone.now()
+        Order.objects.filter(pk__in=[order.pk for order in cls.orders[2:5]]).update(created_at=same_time)
+
+    def expected_ids(self):
+        return list(Order.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def test_forward_and_backward_cursors_with_ties(self):
+        paginator = KeysetPaginator(Order.objects.all(), 2)
+        pages, cursor = [], None
+        while True:
+            page = paginator.get_page(after=cursor)
+            pages.append(page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+
+        ids = [order.pk for page in pages for order in page]
+        self.assertEqual(ids, self.expected_ids())
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertFalse(pages[0].has_previous)
+
+        # الرجوع من الصفحة الأخيرة يعيد نفس الصفحات السابقة
+        for index in range(len(pages) - 1, 0, -1):
+            previous = paginator.get_page(before=pages[index].previous_cursor)
+            self.assertEqual([order.pk for order in previous], [order.pk for order in pages[index - 1]])
+            self.assertEqual(previous.has_previous, index > 1)
+            self.assertTrue(previous.has_next)
+
+    def test_invalid_cursor_returns_first_page(self):
+        paginator = KeysetPaginator(Order.objects.all(), 3)
+        first = [order.pk for order in paginator.get_page()]
+        for cursor in ('not-a-cursor', 'WyIxIl0=', 'WyJ4IiwgMV0=', '!!'):
+            page = paginator.get_page(after=cursor)
+            self.assertEqual([order.pk for order in page], first)
+            self.assertFalse(page.has_previous)
+            self.assertEqual([order.pk for order in paginator.get_page(before=cursor)], first)
+
+    def test_query_count_does_not_depend_on_depth(self):
+        for _ in range(ORDERS_PER_PAGE * 2):
+            Order.objects.create(client=self.client_user)
+        paginator = KeysetPaginator(Order.objects.all(), ORDERS_PER_PAGE)
+        last = paginator.get_page(after=paginator.get_page(after=paginator.get_page().next_cursor).next_cursor)
+        self.assertTrue(last.has_previous)
+
+        with self.assertNumQueries(1):
+            paginator.get_page()
+        with self.assertNumQueries(1):
+            paginator.get_page(after=last.previous_cursor)
+
+        self.client.force_login(User.objects.create(username='staff'))
+        url = reverse('orders-list')
+        with CaptureQueriesContext(connection) as first_page:
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['page_obj']), ORDERS_PER_PAGE)
+        with CaptureQueriesContext(connection) as deep_page:
+            response = self.client.get(url, {'after': response.context['page_obj'].next_cursor})
+        self.assertTrue(response.context['page_obj'].has_previous)
+        self.assertEqual(len(deep_page), len(first_page))
+        self.assertFalse(any('COUNT(' in query['sql'] or 'OFFSET' in query['sql'] for query in deep_page.captured_queries))
+
+
+class OrderExportTests(TestCase):
+    def export(self, **params):
+        request = RequestFactory().get('/orders/export/', params)
+        request.user = User.objects.create(username=f'staff-{User.objects.count()}')
+        response = orders_export(request)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_applies_list_filters(self):
+        client = User.objects.create(username='client')
+        pending = Order.objects.create(client=client)
+        Order.objects.create(client=client, status=Order.OrderStatus.CANCELLED)
+
+        response, content = self.export(status=Order.OrderStatus.PENDING)
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8-sig'))))
+        self.assertEqual(rows[0][0], 'Order Number')
+        self.assertEqual([row[0] for row in rows[1:]], [pending.order_number])
+        self.assertIn('attachment', response['Content-Disposition'])
+
+    def test_xlsx_is_valid_workbook(self):
+        client = User.objects.create(username='client <&>')
+        orders = [Order.objects.create(client=client) for _ in range(3)]
+
+        response, content = self.export(format='xlsx')
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertIsNone(archive.testzip())
+            sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 4)
+        self.assertIn(orders[0].order_number, sheet)
+        self.assertIn('client &lt;&amp;&gt;', sheet)
+
+    def test_formula_cells_are_escaped(self):
+        client = User.objects.create(username='=HYPERLINK("http://x")')
+        Order.objects.create(client=client)
+
+        _, content = self.export()
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8-sig'))))
+        self.assertIn('\'=HYPERLINK("http://x")', rows[1])
+
+        _, content = self.export(format='xlsx')
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertIn('<t xml:space="preserve">\'=HYPERLINK("http://x")</t>', sheet)
+
+
+class OrderIngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = User.objects.create(username='shop-customer')
+        category = Category.objects.create(name='General')
+        cls.hammer = Product.objects.create(
+            name='Hammer', sku='HM-1', category=category, quantity=10,
+            cost_price=Decimal('2.00'), selling_price=Decimal('5.00'),
+        )
+
+    def order(self, key, quantity=1, status=Order.OrderStatus.PENDING, **fields):
+        return {
+            'idempotency_key': key, 'client': self.client_user.pk, 'status': status,
+            'items': [{'product_id': self.hammer.pk, 'quantity': quantity}], **fields,
+        }
+
+    def test_batch_creates_orders_and_reports_each_result(self):
+        results = ingest_orders([
+            self.order('a', quantity=3, status=Order.OrderStatus.COMPLETED),
+            self.order('b', quantity=2),
+            self.order('c', items=[{'product_id': 0, 'quantity': 1}]),
+            {'client': self.client_user.pk},
+        ])
+
+        self.assertEqual([result['status'] for result in results], ['created', 'created', 'error', 'error'])
+        self.assertIn('Unknown product', results[2]['error'])
+        completed = Order.objects.get(pk=results[0]['order_id'])
+        self.assertEqual((completed.total_amount, completed.total_items), (Decimal('15.00'), 3))
+        self.assertEqual(completed.ingest_key.key, 'a')
+
+        # المخزون والحركات والملخص اليومي للطلب المكتمل فقط
+        self.hammer.refresh_from_db()
+        self.assertEqual(self.hammer.quantity, 7)
+        self.assertEqual(StockMovement.objects.get(product=self.hammer).reference, f'Order #{completed.order_number}')
+        self.assertEqual(DailySalesRollup.objects.get(product=self.hammer).quantity, 3)
+        # الطلب الخاطئ لا يحفظ مفتاحه فيمكن إعادة إرساله بعد التصحيح
+        self.assertFalse(OrderIngestKey.objects.filter(key='c').exists())
+
+    def test_resend_returns_existing_orders(self):
+        first = ingest_orders([self.order('a'), self.order('b')])
+        again = ingest_orders([self.order('b'), self.order('a'), self.order('a', quantity=5), self.order('b')])
+
+        self.assertEqual([result['status'] for result in again], ['duplicate', 'duplicate', 'conflict', 'duplicate'])
+        self.assertEqual(again[1]['order_id'], first[0]['order_id'])
+        self.assertEqual(again[0]['order_number'], first[1]['order_number'])
+        self.assertEqual(Order.objects.count(), 2)
+
+        in_batch = ingest_orders([self.order('c'), self.order('c'), self.order('c', notes='other')])
+        self.assertEqual([result['status'] for result in in_batch], ['created', 'duplicate', 'conflict'])
+        self.assertEqual(in_batch[1]['order_id'], in_batch[0]['order_id'])
+
+    def test_stock_is_allocated_in_batch_order(self):
+        results = ingest_orders([
+            self.order(key, quantity=4, status=Order.OrderStatus.COMPLETED) for key in ('a', 'b', 'c')
+        ])
+        self.assertEqual([result['status'] for result in results], ['created', 'created', 'error'])
+        self.hammer.refresh_from_db()
+        self.assertEqual((self.hammer.quantity, self.hammer.is_low_stock), (2, True))
+
+    def test_queries_do_not_grow_with_batch_size(self):
+        def count(keys):
+            with CaptureQueriesContext(connection) as captured:
+                ingest_orders([self.order(key) for key in keys])
+            return len(captured)
+
+        count(['warm-up'])  # حجز كتلة أرقام الطلبات
+        self.assertEqual(count([f'small-{i}' for i in range(5)]), count([f'large-{i}' for i in range(50)]))
+
+    def test_invalid_batch(self):
+        with self.assertRaises(ValueError):
+            ingest_orders({'orders': []})
+        with self.assertRaises(ValueError):
+            ingest_orders([self.order(str(i)) for i in range(501)])
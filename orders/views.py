@@ -1,26 +1,97 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from django.db.models import Q, Sum, F, ExpressionWrapper, DecimalField
 from django.core.paginator import Paginator
 from .models import Order, OrderItem
+from .services import create_order
 from inventory.models import Product
 from users.models import User
 from django import forms
 from django.http import JsonResponse
+from django.utils import timezone
+from datetime import datetime, time, timedelta
+from inventory_management.exports import export_response, get_format
+from inventory_management.pagination import KeysetPaginator
 import json
 
+ORDERS_PER_PAGE = 25
+
+ORDER_EXPORT_COLUMNS = [
+    ('Order Number', 'order_number'),
+    ('Client', 'client__username'),
+    ('Status', 'status'),
+    ('Items', 'total_items'),
+    ('Total Amount', 'total_amount'),
+    ('Invoice Number', 'invoice__invoice_number'),
+    ('Created At', 'created_at'),
+]
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+def filter_orders(params):
+    """تطبيق مرشحات قائمة الطلبات (الحالة، العميل، نطاق التاريخ)"""
+    orders = Order.objects.all()
+    
+    status_filter = params.get('status', '')
+    if status_filter in dict(Order.OrderStatus.choices):
+        orders = orders.filter(status=status_filter)
+    
+    client_filter = params.get('client', '')
+    if client_filter.isdigit():
+        orders = orders.filter(client_id=int(client_filter))
+    
+    # نطاق التاريخ كنطاق على created_at مباشرة حتى يستفيد من الفهرس
+    date_from = _parse_date(params.get('date_from'))
+    if date_from:
+        orders = orders.filter(created_at__gte=_start_of_day(date_from))
+    
+    date_to = _parse_date(params.get('date_to'))
+    if date_to:
+        orders = orders.filter(created_at__lt=_start_of_day(date_to + timedelta(days=1)))
+    
+    return orders
+
 @login_required
 def orders_list(request):
-    orders = Order.objects.all().order_by('-created_at')
+    orders = filter_orders(request.GET).select_related('client', 'invoice')
+    
+    paginator = KeysetPaginator(orders, ORDERS_PER_PAGE, ordering=('-created_at', '-id'))
+    page_obj = paginator.get_page(after=request.GET.get('after'), before=request.GET.get('before'))
+    
+    # الاحتفاظ بالمرشحات في روابط التصفح
+    filters = request.GET.copy()
+    filters.pop('after', None)
+    filters.pop('before', None)
     
     context = {
-        'page_obj': orders,
+        'page_obj': page_obj,
+        'statuses': Order.OrderStatus.choices,
+        'clients': User.objects.filter(is_active=True).only('id', 'username').order_by('username'),
+        'status_filter': request.GET.get('status', ''),
+        'client_filter': request.GET.get('client', ''),
+        'date_from': request.GET.get('date_from', ''),
+        'date_to': request.GET.get('date_to', ''),
+        'filter_query': filters.urlencode(),
         'title': 'Orders List'
     }
     
     return render(request, 'orders/orders_list.html', context)
 
+@login_required
+def orders_export(request):
+    """تصدير الطلبات بنفس مرشحات القائمة (csv أو xlsx)"""
+    orders = filter_orders(request.GET).order_by('-created_at', '-id')
+    return export_response(orders, ORDER_EXPORT_COLUMNS, 'orders', get_format(request.GET))
+
 @login_required
 def order_detail(request, pk):
     order = get_object_or_404(Order, pk=pk)
@@ -42,40 +113,40 @@ def order_create(request):
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
+            if not isinstance(data, dict):
+                raise ValueError('Request body must be a JSON object')
             client_id = data.get('client')
             notes = data.get('notes', '')
             items = data.get('items', [])
             
-            if not client_id or not items:
+            if not client_id or not items or not isinstance(items, list):
                 return JsonResponse({'status': 'error', 'message': 'Client and items are required'}, status=400)
             
+            status = data.get('status', Order.OrderStatus.PENDING)
+            if status not in dict(Order.OrderStatus.choices):
+                return JsonResponse({'status': 'error', 'message': 'Invalid status'}, status=400)
+            
             client = User.objects.get(id=client_id)
-            order = Order.objects.create(
+            
+            # إنشاء الطلب وعناصره دفعة واحدة داخل معاملة
+            order = create_order(
                 client=client,
+                items=items,
+                created_by=request.user,
                 notes=notes,
-                created_by=request.user
+                status=status
             )
             
-            # إضافة عناصر الطلب
-            for item in items:
-                product = Product.objects.get(id=item['product_id'])
-                quantity = int(item['quantity'])
-                price = float(item['price']) if 'price' in item else product.selling_price
-                
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=quantity,
-                    price=price
-                )
-            
             return JsonResponse({
                 'status': 'success',
                 'message': f'Order #{order.order_number} created successfully',
                 'order_id': order.id
             })
         
-        except Exception as e:
+        except User.DoesNotExist:
+            return JsonResponse({'status': 'error', 'message': 'Client not found'}, status=400)
+        except (ValueError, ValidationError) as e:
+            # أخطاء البيانات المرسلة فقط، وأي خطأ آخر يظهر كخطأ خادم 500
             return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
     
     context = {
@@ -0,0 +1,104 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import Setting
+
+# القيم الافتراضية للإعدادات التي لم تحفظ بعد
+DEFAULTS = {
+    'company_name': 'My Company',
+    'company_email': 'info@mycompany.com',
+    'company_phone': '+1234567890',
+    'company_website': 'https://www.mycompany.com',
+    'company_address': '123 Main St, City, Country',
+    'default_tax_rate': '15.0',
+    'default_currency': 'USD',
+}
+
+COMPANY_KEYS = ('company_name', 'company_email', 'company_phone', 'company_website', 'company_address')
+
+VERSION_KEY = 'settings:version'
+
+
+def get_cache():
+    return caches[getattr(settings, 'SETTINGS_CACHE_ALIAS', 'default')]
+
+
+class SettingsStore:
+    """
+    جميع صفوف Setting في ذاكرة العملية، تحمل باستعلام واحد.
+
+    رقم الإصدار محفوظ في الكاش المشترك، وكل كتابة تغيره فتعيد العمليات الأخرى
+    (workers) تحميل الإعدادات عند القراءة التالية. القراءة لا تصل إلى قاعدة البيانات
+    إلا عند تغير الإصدار.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._values = None
+
+    def _get_version(self, cache):
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, time.time_ns(), None)
+            version = cache.get(VERSION_KEY)
+        return version
+
+    def _load(self):
+        version = self._get_version(get_cache())
+        with self._lock:
+            if self._values is None or self._version != version:
+                self._values = dict(Setting.objects.values_list('key', 'value'))
+                self._version = version
+            return self._values
+
+    def all(self):
+        return {**DEFAULTS, **self._load()}
+
+    def get(self, key, default=None):
+        values = self._load()
+        if key in values:
+            return values[key]
+        return DEFAULTS.get(key, '') if default is None else default
+
+    def _bump_version(self):
+        get_cache().set(VERSION_KEY, time.time_ns(), None)
+
+    def invalidate(self):
+        """إبطال النسخة المحلية في جميع العمليات (فورًا ثم بعد تأكيد المعاملة)"""
+        with self._lock:
+            self._values = None
+        self._bump_version()
+        transaction.on_commit(self._bump_version)
+
+    def set_many(self, values):
+        """حفظ عدة إعدادات بجملة INSERT ... ON CONFLICT UPDATE واحدة"""
+        Setting.objects.bulk_create(
+            [Setting(key=key, value='' if value is None else str(value)) for key, value in values.items()],
+            update_conflicts=True, unique_fields=['key'], update_fields=['value'],
+        )
+        self.invalidate()
+
+
+store = SettingsStore()
+
+
+def get_setting(key, default=None):
+    return store.get(key, default)
+
+
+def get_settings(*keys):
+    values = store.all()
+    return {key: values.get(key, '') for key in keys} if keys else values
+
+
+def set_settings(values):
+    store.set_many(values)
+
+
+def set_setting(key, value):
+    store.set_many({key: value})
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Setting
+from .services import store
+
+
+# الكتابة على Setting من خارج SettingsStore (لوحة الإدارة أو save() مباشرة) تغير الإصدار أيضًا،
+# حتى لا تبقى العمليات الأخرى على القيم القديمة. set_many يستخدم bulk_create فلا يمر من هنا.
+@receiver(post_save, sender=Setting)
+@receiver(post_delete, sender=Setting)
+def invalidate_on_setting_write(sender, **kwargs):
+    store.invalidate()
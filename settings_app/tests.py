@@ -0,0 +1,47 @@
+from django.test import TestCase
+
+from .models import Setting
+from .services import SettingsStore, get_setting, get_settings, set_setting, set_settings, store
+
+
+class SettingsStoreTests(TestCase):
+    def setUp(self):
+        # القيم المحملة داخل اختبار سابق تم التراجع عن معاملته
+        store.invalidate()
+        self.addCleanup(store.invalidate)
+
+    def test_reads_do_not_query_after_first_load(self):
+        set_settings({'default_tax_rate': '12.5', 'company_name': 'ACME'})
+        get_setting('default_tax_rate')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_setting('default_tax_rate'), '12.5')
+            self.assertEqual(get_settings('company_name', 'company_phone'), {
+                'company_name': 'ACME', 'company_phone': '+1234567890',
+            })
+
+    def test_bulk_write_is_one_query(self):
+        set_setting('company_name', 'Old')
+        with self.assertNumQueries(1):
+            set_settings({'company_name': 'New', 'company_email': 'a@b.c', 'default_currency': None})
+        self.assertEqual(get_settings('company_name', 'company_email', 'default_currency'), {
+            'company_name': 'New', 'company_email': 'a@b.c', 'default_currency': '',
+        })
+
+    def test_write_in_one_worker_reaches_others(self):
+        other_worker = SettingsStore()
+        set_setting('default_currency', 'EUR')
+        self.assertEqual(other_worker.get('default_currency'), 'EUR')
+
+        set_setting('default_currency', 'SAR')
+        self.assertEqual(other_worker.get('default_currency'), 'SAR')
+
+    def test_direct_model_writes_reach_workers(self):
+        other_worker = SettingsStore()
+        self.assertEqual(other_worker.get('default_currency'), 'USD')
+
+        # مثل الحفظ من لوحة الإدارة، بدون المرور على SettingsStore
+        setting = Setting.objects.create(key='default_currency', value='EUR')
+        self.assertEqual(other_worker.get('default_currency'), 'EUR')
+
+        setting.delete()
+        self.assertEqual(other_worker.get('default_currency'), 'USD')
@@ -0,0 +1,116 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# أقسام صفحة الإحصائيات. كل قسم له رقم إصدار في الكاش، وإبطال القسم يغير رقم الإصدار
+# فتصبح جميع مدخلاته القديمة (لكل الفترات والسنوات) غير مستخدمة.
+SALES = 'sales'
+TOP_SELLERS = 'top_sellers'
+MONTHLY_SALES = 'monthly_sales'
+STATUS_DISTRIBUTION = 'status_distribution'
+PRODUCTS = 'products'
+LOW_STOCK = 'low_stock'
+CATEGORY_DISTRIBUTION = 'category_distribution'
+PAYMENTS = 'payments'
+
+
+def get_cache():
+    return caches[getattr(settings, 'STATS_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    # المدة الاحتياطية في حال فات الإبطال حدث ما (مثل تعديل مباشر بـ update)
+    return getattr(settings, 'STATS_CACHE_TIMEOUT', 300)
+
+
+def _version_key(section, scope=None):
+    return f"stats:version:{section}" if scope is None else f"stats:version:{section}:{scope}"
+
+
+def _get_version(cache, section, scope=None):
+    key = _version_key(section, scope)
+    version = cache.get(key)
+    if version is None:
+        # إصدار جديد غير متكرر حتى لا تعود مدخلات قديمة للحياة إذا حُذف مفتاح الإصدار
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+async def _aget_version(cache, section, scope=None):
+    key = _version_key(section, scope)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def _bump_version(section, scope=None):
+    get_cache().set(_version_key(section, scope), time.time_ns(), None)
+    logger.debug('stats cache invalidated: %s%s', section, '' if scope is None else f' ({scope})')
+
+
+def invalidate(section, scope=None):
+    """
+    إبطال جميع مدخلات القسم (أو نطاق منه مثل سنة معينة).
+
+    يتم الإبطال فورًا ثم مرة أخرى بعد تأكيد المعاملة، حتى لا يبقى في الكاش ما حسبه
+    طلب آخر من البيانات القديمة قبل التأكيد.
+    """
+    _bump_version(section, scope)
+    transaction.on_commit(lambda: _bump_version(section, scope))
+
+
+class StatsCache:
+    """قراءة أقسام الإحصائيات من الكاش مع تتبع عدد الإصابات والإخفاقات للطلب الحالي"""
+
+    def __init__(self):
+        self.cache = get_cache()
+        self.hits = []
+        self.misses = []
+
+    def _key(self, section, version, params):
+        return ':'.join(['stats', section, str(version)] + [str(param) for param in params])
+
+    def _found(self, section, key, value):
+        if value is not None:
+            self.hits.append(section)
+            logger.debug('stats cache hit: %s', key)
+            return True
+        self.misses.append(section)
+        logger.debug('stats cache miss: %s', key)
+        return False
+
+    def get(self, section, compute, *params, scope=None):
+        key = self._key(section, _get_version(self.cache, section, scope), params)
+        value = self.cache.get(key)
+        if self._found(section, key, value):
+            return value
+
+        value = compute()
+        self.cache.set(key, value, get_timeout())
+        return value
+
+    async def aget(self, section, compute, *params, scope=None):
+        """نفس get للعروض غير المتزامنة، و compute ترجع coroutine"""
+        key = self._key(section, await _aget_version(self.cache, section, scope), params)
+        value = await self.cache.aget(key)
+        if self._found(section, key, value):
+            return value
+
+        value = await compute()
+        await self.cache.aset(key, value, get_timeout())
+        return value
+
+    def header(self):
+        """قيمة ترويسة X-Stats-Cache مثل: hits=6; misses=2 (sales,top_sellers)"""
+        value = f"hits={len(self.hits)}; misses={len(self.misses)}"
+        if self.misses:
+            value += f" ({','.join(self.misses)})"
+        return value
@@ -0,0 +1,27 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from stats.rollup import rebuild_rollup
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Invalid date "{value}", expected YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = 'Backfill or repair the daily sales rollup for a date range (the whole history by default)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', type=parse_date, help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='end', type=parse_date, help='Last day to rebuild, inclusive (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        start, end = options['start'], options['end']
+        if start and end and start > end:
+            raise CommandError('--from must not be after --to')
+
+        created = rebuild_rollup(start, end)
+        period = f"{start or 'beginning'} .. {end or 'today'}"
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {created} rollup row(s) for {period}'))
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollup(apps, schema_editor):
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    DailySalesRollup = apps.get_model('stats', 'DailySalesRollup')
+    rows = OrderItem.objects.filter(order__status='COMPLETED').annotate(
+        day=TruncDate('order__created_at')
+    ).values('day', 'product_id').annotate(
+        total_quantity=Sum('quantity'),
+        total_revenue=Sum(ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField())),
+        orders=Count('order_id', distinct=True),
+    ).order_by()
+    DailySalesRollup.objects.bulk_create([
+        DailySalesRollup(
+            date=row['day'],
+            product_id=row['product_id'],
+            quantity=row['total_quantity'],
+            revenue=row['total_revenue'],
+            order_count=row['orders'],
+        )
+        for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('inventory', '0003_remove_product_price_product_selling_price_and_more'),
+        ('orders', '0005_numbersequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='Quantity')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Revenue')),
+                ('order_count', models.PositiveIntegerField(default=0, verbose_name='Order Count')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='inventory.product', verbose_name='Product')),
+            ],
+            options={
+                'verbose_name': 'Daily Sales Rollup',
+                'verbose_name_plural': 'Daily Sales Rollups',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['product', 'date'], name='rollup_product_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'product'), name='unique_daily_sales_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,25 @@
 from django.db import models
+from django.utils.translation import gettext_lazy as _
+from inventory.models import Product
 
-# Create your models here.
+class DailySalesRollup(models.Model):
+    """مبيعات الطلبات المكتملة مجمعة حسب اليوم والمنتج"""
+    date = models.DateField(verbose_name=_('Date'))
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales', verbose_name=_('Product'))
+    quantity = models.PositiveIntegerField(default=0, verbose_name=_('Quantity'))
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name=_('Revenue'))
+    order_count = models.PositiveIntegerField(default=0, verbose_name=_('Order Count'))
+    
+    def __str__(self):
+        return f"{self.date} - {self.product_id}: {self.quantity}"
+    
+    class Meta:
+        verbose_name = _('Daily Sales Rollup')
+        verbose_name_plural = _('Daily Sales Rollups')
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='unique_daily_sales_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'date'], name='rollup_product_date_idx'),
+        ]
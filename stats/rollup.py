@@ -0,0 +1,155 @@
+from datetime import datetime, time, timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+from orders.models import Order, OrderItem
+from .models import DailySalesRollup
+
+BATCH_SIZE = 1000
+# شرط OR لكل صف (اليوم، المنتج) في جملة التحديث، و SQLite يرفض التعابير الأعمق من 1000
+CHANGES_BATCH_SIZE = 200
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def rebuild_rollup(start_date=None, end_date=None, product_ids=None):
+    """
+    إعادة بناء صفوف DailySalesRollup للفترة المحددة (شاملة) من عناصر الطلبات المكتملة.
+
+    بدون تواريخ يعاد بناء الجدول بالكامل. عند تحديد product_ids يقتصر البناء على هذه المنتجات.
+    إرجاع عدد الصفوف المدرجة.
+    """
+    rollups = DailySalesRollup.objects.all()
+    items = OrderItem.objects.filter(order__status=Order.OrderStatus.COMPLETED)
+    
+    if start_date:
+        rollups = rollups.filter(date__gte=start_date)
+        items = items.filter(order__created_at__gte=_start_of_day(start_date))
+    if end_date:
+        rollups = rollups.filter(date__lte=end_date)
+        items = items.filter(order__created_at__lt=_start_of_day(end_date + timedelta(days=1)))
+    if product_ids is not None:
+        rollups = rollups.filter(product_id__in=product_ids)
+        items = items.filter(product_id__in=product_ids)
+    
+    rows = items.annotate(
+        day=TruncDate('order__created_at')
+    ).values('day', 'product_id').annotate(
+        total_quantity=Sum('quantity'),
+        total_revenue=Sum(ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField())),
+        orders=Count('order_id', distinct=True),
+    ).order_by()
+    
+    with transaction.atomic():
+        rollups.delete()
+        created = 0
+        batch = []
+        for row in rows.iterator(chunk_size=BATCH_SIZE):
+            batch.append(DailySalesRollup(
+                date=row['day'],
+                product_id=row['product_id'],
+                quantity=row['total_quantity'],
+                revenue=row['total_revenue'],
+                order_count=row['orders'],
+            ))
+            if len(batch) >= BATCH_SIZE:
+                DailySalesRollup.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            DailySalesRollup.objects.bulk_create(batch)
+            created += len(batch)
+    return created
+
+
+def order_rollup_changes(order_ids, sign=1):
+    """
+    مساهمة الطلبات في الملخص كفروق {(day, product_id): (quantity, revenue, order_count)}
+    باستعلام مجمع واحد. sign=-1 لطرحها (إلغاء طلب مكتمل أو حذفه).
+    """
+    rows = OrderItem.objects.filter(order_id__in=order_ids).annotate(
+        day=TruncDate('order__created_at')
+    ).values('day', 'product_id').annotate(
+        total_quantity=Sum('quantity'),
+        total_revenue=Sum(ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField())),
+        orders=Count('order_id', distinct=True),
+    ).order_by()
+    return {
+        (row['day'], row['product_id']): (
+            sign * row['total_quantity'], sign * row['total_revenue'], sign * row['orders']
+        )
+        for row in rows
+    }
+
+
+def item_rollup_changes(order, changes):
+    """فروق عناصر طلب واحد [(product_id, quantity, amount, lines)] في يوم الطلب"""
+    day = timezone.localdate(order.created_at)
+    result = {}
+    for product_id, quantity, amount, lines in changes:
+        old_quantity, old_revenue, old_count = result.get((day, product_id), (0, 0, 0))
+        result[(day, product_id)] = (old_quantity + quantity, old_revenue + amount, old_count + lines)
+    return result
+
+
+def apply_rollup_changes(changes):
+    """
+    إضافة الفروق {(day, product_id): (quantity, revenue, order_count)} إلى الملخص.
+
+    الصفوف الموجودة تحدث بجملة UPDATE تجمع الفرق على القيمة الحالية (F)، فالكتابات المتزامنة
+    على نفس اليوم لا تلغي بعضها، والصفوف الجديدة تدرج دفعة واحدة، والصفوف التي لم يبق لها
+    طلبات تحذف. rebuild_rollup (حذف صفوف اليوم وإعادة إدراجها) للإصلاح فقط.
+    """
+    changes = {key: delta for key, delta in changes.items() if any(delta)}
+    if not changes:
+        return
+    try:
+        with transaction.atomic():
+            _apply_changes(changes)
+    except IntegrityError:
+        # عملية متزامنة أدرجت نفس الصف (اليوم، المنتج) بعد قراءتنا، والآن يحدث بدلًا من إدراجه
+        with transaction.atomic():
+            _apply_changes(changes)
+
+
+def _added(field, index, keys, changes):
+    """قيمة الحقل بعد إضافة الفرق لكل صف، والكميات لا تنزل تحت الصفر إذا انحرف الملخص"""
+    whens = []
+    for day, product_id in keys:
+        value = F(field) + changes[(day, product_id)][index]
+        if field != 'revenue' and changes[(day, product_id)][index] < 0:
+            value = Greatest(value, Value(0))
+        whens.append(When(date=day, product_id=product_id, then=value))
+    output_field = DecimalField(max_digits=14, decimal_places=2) if field == 'revenue' else IntegerField()
+    return Case(*whens, default=F(field), output_field=output_field)
+
+
+def _apply_changes(changes):
+    keys = list(changes)
+    for start in range(0, len(keys), CHANGES_BATCH_SIZE):
+        chunk = keys[start:start + CHANGES_BATCH_SIZE]
+        match = Q()
+        for day, product_id in chunk:
+            match |= Q(date=day, product_id=product_id)
+        rows = DailySalesRollup.objects.filter(match)
+
+        existing = set(rows.values_list('date', 'product_id'))
+        if existing:
+            rows.update(**{
+                field: _added(field, index, existing, changes)
+                for index, field in enumerate(('quantity', 'revenue', 'order_count'))
+            })
+        # صف جديد فقط إذا أضيف الطلب، والفرق السالب لصف غير موجود انحراف يصلحه rebuild_rollup
+        new_rows = []
+        for day, product_id in chunk:
+            quantity, revenue, count = changes[(day, product_id)]
+            if (day, product_id) not in existing and count > 0:
+                new_rows.append(DailySalesRollup(
+                    date=day, product_id=product_id, quantity=quantity, revenue=revenue, order_count=count,
+                ))
+        DailySalesRollup.objects.bulk_create(new_rows)
+        if any(changes[key][2] < 0 for key in chunk):
+            rows.filter(order_count=0).delete()
@@ -0,0 +1,146 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from inventory.models import Category, Product, StockMovement
+from inventory.signals import products_imported, reorder_levels_updated
+from invoices.models import Invoice, Payment
+from invoices.signals import invoices_generated
+from orders.models import Order, OrderItem
+from orders.signals import order_items_changed, orders_ingested
+from .rollup import apply_rollup_changes, item_rollup_changes, order_rollup_changes
+from . import cache as stats_cache
+
+COMPLETED = Order.OrderStatus.COMPLETED
+
+
+@receiver(order_items_changed, sender=Order)
+def rollup_on_items_changed(sender, order, changes, **kwargs):
+    # الطلبات غير المكتملة لا تدخل في المبيعات
+    if order.status == COMPLETED:
+        apply_rollup_changes(item_rollup_changes(order, changes))
+
+
+@receiver(orders_ingested, sender=Order)
+def rollup_on_orders_ingested(sender, orders, **kwargs):
+    # استعلام مجمع واحد لمساهمة الدفعة كلها بدلًا من كل طلب
+    completed = [order.pk for order in orders if order.status == COMPLETED]
+    if completed:
+        apply_rollup_changes(order_rollup_changes(completed))
+
+
+@receiver(pre_save, sender=Order)
+def remember_previous_status(sender, instance, **kwargs):
+    if instance.pk:
+        instance._previous_status = Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Order)
+def rollup_on_status_change(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_status', None)
+    if created or previous == instance.status:
+        return
+    if instance.status == COMPLETED:
+        apply_rollup_changes(order_rollup_changes([instance.pk]))
+    elif previous == COMPLETED:
+        apply_rollup_changes(order_rollup_changes([instance.pk], sign=-1))
+
+
+@receiver(pre_delete, sender=Order)
+def remember_deleted_order_sales(sender, instance, **kwargs):
+    # العناصر تحذف قبل الطلب (cascade)، فتقرأ مساهمته الآن
+    if instance.status == COMPLETED:
+        instance._rollup_changes = order_rollup_changes([instance.pk], sign=-1)
+
+
+@receiver(post_delete, sender=Order)
+def rollup_on_order_delete(sender, instance, **kwargs):
+    changes = getattr(instance, '_rollup_changes', None)
+    if changes:
+        apply_rollup_changes(changes)
+
+
+# إبطال كاش صفحة الإحصائيات: كل نموذج يبطل الأقسام التي تعتمد عليه فقط
+
+def _invalidate_order_sections(order, status_changed=True):
+    stats_cache.invalidate(stats_cache.SALES)
+    stats_cache.invalidate(stats_cache.TOP_SELLERS)
+    if order.created_at:
+        stats_cache.invalidate(stats_cache.MONTHLY_SALES, scope=timezone.localdate(order.created_at).year)
+    if status_changed:
+        stats_cache.invalidate(stats_cache.STATUS_DISTRIBUTION)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_on_order_write(sender, instance, created=False, **kwargs):
+    _invalidate_order_sections(instance)
+
+
+@receiver(order_items_changed, sender=Order)
+def invalidate_on_items_changed(sender, order, **kwargs):
+    _invalidate_order_sections(order, status_changed=False)
+    # عناصر الطلب المكتمل تخصم من المخزون مباشرة بجملة update
+    if order.status == COMPLETED:
+        stats_cache.invalidate(stats_cache.PRODUCTS)
+        stats_cache.invalidate(stats_cache.LOW_STOCK)
+
+
+@receiver(orders_ingested, sender=Order)
+def invalidate_on_orders_ingested(sender, orders, **kwargs):
+    for year in {timezone.localdate(order.created_at).year for order in orders}:
+        stats_cache.invalidate(stats_cache.MONTHLY_SALES, scope=year)
+    for section in (stats_cache.SALES, stats_cache.TOP_SELLERS, stats_cache.STATUS_DISTRIBUTION):
+        stats_cache.invalidate(section)
+    if any(order.status == COMPLETED for order in orders):
+        stats_cache.invalidate(stats_cache.PRODUCTS)
+        stats_cache.invalidate(stats_cache.LOW_STOCK)
+
+
+@receiver(post_delete, sender=OrderItem)
+def invalidate_on_item_delete(sender, instance, **kwargs):
+    # الحذف المتتالي (cascade) لا يمر عبر OrderItem.delete
+    stats_cache.invalidate(stats_cache.SALES)
+    stats_cache.invalidate(stats_cache.TOP_SELLERS)
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def invalidate_on_payment_write(sender, **kwargs):
+    stats_cache.invalidate(stats_cache.PAYMENTS)
+
+
+@receiver(invoices_generated, sender=Invoice)
+def invalidate_on_invoices_generated(sender, **kwargs):
+    invalidate_on_payment_write(sender)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_on_product_write(sender, **kwargs):
+    stats_cache.invalidate(stats_cache.PRODUCTS)
+    stats_cache.invalidate(stats_cache.LOW_STOCK)
+    stats_cache.invalidate(stats_cache.CATEGORY_DISTRIBUTION)
+    # أسماء المنتجات تظهر في قائمة الأكثر مبيعًا
+    stats_cache.invalidate(stats_cache.TOP_SELLERS)
+
+
+@receiver(products_imported, sender=Product)
+@receiver(reorder_levels_updated, sender=Product)
+def invalidate_on_products_imported(sender, **kwargs):
+    invalidate_on_product_write(sender)
+
+
+@receiver(post_save, sender=StockMovement)
+@receiver(post_delete, sender=StockMovement)
+def invalidate_on_stock_movement(sender, **kwargs):
+    stats_cache.invalidate(stats_cache.PRODUCTS)
+    stats_cache.invalidate(stats_cache.LOW_STOCK)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_on_category_write(sender, **kwargs):
+    stats_cache.invalidate(stats_cache.PRODUCTS)
+    stats_cache.invalidate(stats_cache.CATEGORY_DISTRIBUTION)
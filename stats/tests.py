@@ -1,3 +1,243 @@
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
 from django.test import TestCase
+from django.utils import timezone
+
+from inventory.models import Category, Product
+from orders.models import Order, OrderItem
+from orders.services import create_order, ingest_orders
+from users.models import User
+from . import cache as stats_cache
+from .cache import StatsCache
+from .models import DailySalesRollup
+from .rollup import rebuild_rollup
+from .utils import get_dashboard_stats, get_monthly_sales_data, get_top_selling_products
+from .views import get_sales_stats
+
+
+class StatsTestMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = User.objects.create(username='client')
+        cls.category = Category.objects.create(name='General')
+
+    def make_product(self, sku, quantity=20, reorder_level=10):
+        return Product.objects.create(
+            name=sku, sku=sku, category=self.category, quantity=quantity,
+            reorder_level=reorder_level, cost_price=Decimal('2.00'), selling_price=Decimal('5.00')
+        )
+
+    def make_order(self, product, quantity, price, status=Order.OrderStatus.COMPLETED, created_at=None):
+        order = Order.objects.create(client=self.client_user, status=status)
+        OrderItem.objects.create(order=order, product=product, quantity=quantity, price=price)
+        if created_at:
+            # تغيير التاريخ بـ update لا يمر عبر الإشارات، لذلك نعيد بناء الجدول المجمع
+            Order.objects.filter(pk=order.pk).update(created_at=created_at)
+            rebuild_rollup()
+        return order
+
+
+class DashboardStatsTests(StatsTestMixin, TestCase):
+    def setUp(self):
+        stats_cache.get_cache().clear()
+
+    def test_figures(self):
+        product = self.make_product('A', quantity=5)
+        self.make_product('B', quantity=50)
+        self.make_order(product, 2, Decimal('5.00'))
+        self.make_order(product, 1, Decimal('5.00'), status=Order.OrderStatus.PENDING)
+
+        stats = get_dashboard_stats()
+        self.assertEqual(stats['total_products'], 2)
+        self.assertEqual(stats['low_stock_count'], 1)
+        # الطلب المكتمل خصم قطعتين من المنتج A
+        self.assertEqual(stats['stock_value'], Decimal('106.00'))
+        self.assertEqual(stats['today_orders'], 2)
+        self.assertEqual(stats['orders_this_month'], 2)
+        self.assertEqual(stats['today_sales'], Decimal('10.00'))
+        self.assertEqual(stats['monthly_sales'], Decimal('10.00'))
+
+    def test_query_count_is_constant(self):
+        for i in range(5):
+            self.make_order(self.make_product(f'P{i}'), 1, Decimal('5.00'))
+        with self.assertNumQueries(2):
+            get_dashboard_stats()
+
+        for i in range(5, 25):
+            self.make_order(self.make_product(f'P{i}'), 1, Decimal('5.00'))
+        with self.assertNumQueries(2):
+            get_dashboard_stats()
+
+
+    def test_served_from_stats_cache(self):
+        product = self.make_product('A')
+        self.make_order(product, 1, Decimal('5.00'))
+        get_dashboard_stats()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_dashboard_stats()['today_orders'], 1)
+
+        # طلب غير مكتمل يبطل قسم المبيعات فقط، وأرقام المنتجات تبقى من الكاش
+        self.make_order(product, 1, Decimal('5.00'), status=Order.OrderStatus.PENDING)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_dashboard_stats()['today_orders'], 2)
+
+
+class MonthlySalesTests(StatsTestMixin, TestCase):
+    def test_single_grouped_query(self):
+        product = self.make_product('A')
+        year = timezone.now().year
+        self.make_order(product, 1, Decimal('10.00'), created_at=datetime(year, 1, 15, tzinfo=dt_timezone.utc))
+        self.make_order(product, 2, Decimal('10.00'), created_at=datetime(year, 1, 20, tzinfo=dt_timezone.utc))
+        self.make_order(product, 1, Decimal('7.50'), created_at=datetime(year, 3, 1, tzinfo=dt_timezone.utc))
+        self.make_order(product, 1, Decimal('99.00'), created_at=datetime(year - 1, 3, 1, tzinfo=dt_timezone.utc))
+        self.make_order(product, 1, Decimal('99.00'), status=Order.OrderStatus.CANCELLED,
+                        created_at=datetime(year, 3, 2, tzinfo=dt_timezone.utc))
+
+        with self.assertNumQueries(1):
+            data = get_monthly_sales_data(year)
+
+        self.assertEqual(len(data['labels']), 12)
+        self.assertEqual(data['data'][0], 30.0)
+        self.assertEqual(data['data'][1], 0)
+        self.assertEqual(data['data'][2], 7.5)
+
+
+class DailySalesRollupTests(StatsTestMixin, TestCase):
+    def rollup(self, product):
+        today = timezone.localdate()
+        return DailySalesRollup.objects.filter(date=today, product=product).first()
+
+    def test_item_writes_update_rollup(self):
+        product = self.make_product('A', quantity=100)
+        order = self.make_order(product, 2, Decimal('5.00'))
+        self.make_order(product, 3, Decimal('5.00'))
+
+        row = self.rollup(product)
+        self.assertEqual((row.quantity, row.revenue, row.order_count), (5, Decimal('25.00'), 2))
+
+        item = order.items.get()
+        item.quantity = 4
+        item.save()
+        row = self.rollup(product)
+        self.assertEqual((row.quantity, row.revenue), (7, Decimal('35.00')))
+
+        item.delete()
+        row = self.rollup(product)
+        self.assertEqual((row.quantity, row.order_count), (3, 1))
+
+    def test_status_change_updates_rollup(self):
+        product = self.make_product('A')
+        order = self.make_order(product, 2, Decimal('5.00'), status=Order.OrderStatus.PENDING)
+        self.assertIsNone(self.rollup(product))
+
+        order.status = Order.OrderStatus.COMPLETED
+        order.save()
+        self.assertEqual(self.rollup(product).quantity, 2)
+
+        order.status = Order.OrderStatus.CANCELLED
+        order.save()
+        self.assertIsNone(self.rollup(product))
+
+    def test_stats_read_from_rollup(self):
+        product = self.make_product('A', quantity=100)
+        self.make_order(product, 2, Decimal('5.00'))
+        self.make_order(self.make_product('B'), 1, Decimal('8.00'))
+
+        stats = get_sales_stats(timezone.localdate())
+        self.assertEqual(stats['total_sales'], Decimal('18.00'))
+        self.assertEqual(stats['period_sales'], Decimal('18.00'))
+        self.assertEqual(stats['completed_orders'], 2)
+
+        top = get_top_selling_products(limit=1)
+        self.assertEqual(top[0]['product__sku'], 'A')
+        self.assertEqual(top[0]['total_sales'], Decimal('10.00'))
+
+    def test_changes_update_rows_in_place(self):
+        a = self.make_product('A', quantity=100)
+        b = self.make_product('B', quantity=100)
+        first = self.make_order(a, 2, Decimal('5.00'))
+        row = self.rollup(a)
+
+        self.make_order(a, 1, Decimal('7.25'))
+        create_order(self.client_user, [{'product_id': a.pk, 'quantity': 1}, {'product_id': b.pk, 'quantity': 3}],
+                     status=Order.OrderStatus.COMPLETED)
+        ingest_orders([{'idempotency_key': 'shop-1', 'client': self.client_user.pk,
+                        'status': Order.OrderStatus.COMPLETED, 'items': [{'product_id': a.pk, 'quantity': 4}]}])
+        # تغيير منتج العنصر ينقل مبيعاته من صف إلى آخر
+        item = first.items.get()
+        item.product = b
+        item.save()
+
+        # الصف يحدث في مكانه ولا يحذف ويعاد إدراجه، والنتيجة مثل إعادة البناء
+        self.assertEqual(self.rollup(a).pk, row.pk)
+        fields = ('date', 'product_id', 'quantity', 'revenue', 'order_count')
+        incremental = set(DailySalesRollup.objects.values_list(*fields))
+        rebuild_rollup()
+        self.assertEqual(set(DailySalesRollup.objects.values_list(*fields)), incremental)
+
+    def test_order_delete_and_drift(self):
+        product = self.make_product('A', quantity=100)
+        order = self.make_order(product, 2, Decimal('5.00'))
+        other = self.make_order(product, 1, Decimal('5.00'))
+        order.delete()
+        self.assertEqual((self.rollup(product).quantity, self.rollup(product).order_count), (1, 1))
+
+        # ملخص منحرف لا يمنع حفظ الطلبات، والصف الفارغ يحذف
+        DailySalesRollup.objects.update(quantity=0)
+        other.items.get().delete()
+        self.assertIsNone(self.rollup(product))
+
+    def test_rebuild_repairs_drift(self):
+        product = self.make_product('A', quantity=100)
+        self.make_order(product, 2, Decimal('5.00'))
+        DailySalesRollup.objects.all().update(quantity=99)
+
+        rebuild_rollup(timezone.localdate(), timezone.localdate())
+        self.assertEqual(self.rollup(product).quantity, 2)
+
+
+class StatsCacheTests(StatsTestMixin, TestCase):
+    def setUp(self):
+        stats_cache.get_cache().clear()
+
+    def read(self, section, *params, scope=None):
+        calls = []
+        cache = StatsCache()
+        cache.get(section, lambda: calls.append(section) or {'value': len(calls)}, *params, scope=scope)
+        return bool(calls)
+
+    def test_hit_after_first_read(self):
+        self.assertTrue(self.read(stats_cache.SALES, 30))
+        self.assertFalse(self.read(stats_cache.SALES, 30))
+        # كل فترة لها مدخل مستقل
+        self.assertTrue(self.read(stats_cache.SALES, 7))
+
+    def test_header_reports_hits_and_misses(self):
+        cache = StatsCache()
+        cache.get(stats_cache.SALES, dict, 30)
+        cache.get(stats_cache.SALES, dict, 30)
+        self.assertEqual(cache.header(), 'hits=1; misses=1 (sales)')
+
+    def test_order_write_invalidates_only_order_sections(self):
+        product = self.make_product('A')
+        for section in (stats_cache.SALES, stats_cache.PAYMENTS, stats_cache.CATEGORY_DISTRIBUTION):
+            self.read(section, 30)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_order(product, 1, Decimal('5.00'), status=Order.OrderStatus.PENDING)
+
+        self.assertTrue(self.read(stats_cache.SALES, 30))
+        self.assertFalse(self.read(stats_cache.PAYMENTS, 30))
+        self.assertFalse(self.read(stats_cache.CATEGORY_DISTRIBUTION, 30))
+
+    def test_monthly_sales_invalidated_per_year(self):
+        product = self.make_product('A', quantity=100)
+        year = timezone.localdate().year
+        self.read(stats_cache.MONTHLY_SALES, year, scope=year)
+        self.read(stats_cache.MONTHLY_SALES, year - 1, scope=year - 1)
+
+        self.make_order(product, 1, Decimal('5.00'))
 
-# Create your tests here.
+        self.assertTrue(self.read(stats_cache.MONTHLY_SALES, year, scope=year))
+        self.assertFalse(self.read(stats_cache.MONTHLY_SALES, year - 1, scope=year - 1))
@@ -1,59 +1,76 @@
 from django.db.models import Sum, F, ExpressionWrapper, DecimalField, Count, Q
 from django.utils import timezone
-from datetime import datetime, timedelta
+from django.db.models.functions import TruncMonth
+from datetime import date, datetime, time, timedelta
 from inventory.models import Product, Category, StockMovement
 from orders.models import Order, OrderItem
 from invoices.models import Invoice, Payment
+from .cache import StatsCache, PRODUCTS, SALES
+from .models import DailySalesRollup
 
-def get_dashboard_stats():
-    """استخراج البيانات الأساسية للوحة التحكم الرئيسية"""
-    today = timezone.now().date()
-    start_of_month = today.replace(day=1)
-    
-    # إحصائيات المنتجات
-    products = Product.objects.all()
-    total_products = products.count()
-    low_stock_count = products.filter(quantity__lte=F('reorder_level')).count()
-    
-    # حساب قيمة المخزون
-    stock_value = products.aggregate(
-        value=Sum(ExpressionWrapper(F('quantity') * F('cost_price'), output_field=DecimalField()))
-    )['value'] or 0
-    
-    # طلبات اليوم
-    today_orders = Order.objects.filter(created_at__date=today).count()
-    
-    # طلبات الشهر
-    orders_this_month = Order.objects.filter(created_at__date__gte=start_of_month).count()
-    
-    # مبيعات اليوم
-    today_sales = OrderItem.objects.filter(
-        order__created_at__date=today,
-        order__status='COMPLETED'
-    ).aggregate(
-        sales=Sum(ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField()))
-    )['sales'] or 0
-    
-    # مبيعات الشهر
-    monthly_sales = OrderItem.objects.filter(
-        order__created_at__date__gte=start_of_month,
-        order__status='COMPLETED'
-    ).aggregate(
-        sales=Sum(ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField()))
-    )['sales'] or 0
-    
+def start_of_day(day):
+    """بداية اليوم كتاريخ ووقت مع المنطقة الزمنية (للمقارنة المباشرة مع created_at)"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+def _dashboard_aggregates():
+    """استعلاما لوحة التحكم: (استعلام، مجاميع) للمنتجات ثم للطلبات"""
+    today = timezone.localdate()
+    today_start = start_of_day(today)
+    month_start = start_of_day(today.replace(day=1))
+    completed = Q(status=Order.OrderStatus.COMPLETED)
+    
+    # إحصائيات المنتجات وقيمة المخزون في استعلام واحد
+    products = (Product.objects.all(), {
+        'total_products': Count('id'),
+        'low_stock_count': Count('id', filter=Q(is_low_stock=True)),
+        'stock_value': Sum(ExpressionWrapper(F('quantity') * F('cost_price'), output_field=DecimalField())),
+    })
+    
+    # طلبات ومبيعات اليوم والشهر في استعلام واحد باستخدام المجاميع المخزنة في الطلب
+    orders = (Order.objects.filter(created_at__gte=month_start), {
+        'today_orders': Count('id', filter=Q(created_at__gte=today_start)),
+        'orders_this_month': Count('id'),
+        'today_sales': Sum('total_amount', filter=completed & Q(created_at__gte=today_start)),
+        'monthly_sales': Sum('total_amount', filter=completed),
+    })
+    return products, orders
+
+def get_dashboard_stats(stats_cache=None):
+    """
+    استخراج البيانات الأساسية للوحة التحكم الرئيسية من كاش الإحصائيات (قسما المنتجات
+    والمبيعات، فتبطل مع صفحة الإحصائيات)، واستعلامان فقط عند عدم وجودها في الكاش.
+    """
+    stats_cache = stats_cache or StatsCache()
+    (products, product_aggregates), (orders, order_aggregates) = _dashboard_aggregates()
+    today = timezone.localdate()
+    return _dashboard_result(
+        stats_cache.get(PRODUCTS, lambda: products.aggregate(**product_aggregates), 'dashboard'),
+        stats_cache.get(SALES, lambda: orders.aggregate(**order_aggregates), 'dashboard', today),
+    )
+
+async def aget_dashboard_stats(stats_cache=None):
+    """نفس get_dashboard_stats للعروض غير المتزامنة"""
+    stats_cache = stats_cache or StatsCache()
+    (products, product_aggregates), (orders, order_aggregates) = _dashboard_aggregates()
+    today = timezone.localdate()
+    return _dashboard_result(
+        await stats_cache.aget(PRODUCTS, lambda: products.aaggregate(**product_aggregates), 'dashboard'),
+        await stats_cache.aget(SALES, lambda: orders.aaggregate(**order_aggregates), 'dashboard', today),
+    )
+
+def _dashboard_result(product_stats, order_stats):
     return {
-        'total_products': total_products,
-        'low_stock_count': low_stock_count,
-        'stock_value': stock_value,
-        'today_orders': today_orders,
-        'orders_this_month': orders_this_month,
-        'today_sales': today_sales,
-        'monthly_sales': monthly_sales
+        'total_products': product_stats['total_products'],
+        'low_stock_count': product_stats['low_stock_count'],
+        'stock_value': product_stats['stock_value'] or 0,
+        'today_orders': order_stats['today_orders'],
+        'orders_this_month': order_stats['orders_this_month'],
+        'today_sales': order_stats['today_sales'] or 0,
+        'monthly_sales': order_stats['monthly_sales'] or 0
     }
 
 def get_monthly_sales_data(year=None):
-    """استخراج بيانات المبيعات الشهرية للسنة المحددة"""
+    """استخراج بيانات المبيعات الشهرية للسنة المحددة (استعلام GROUP BY واحد)"""
     if not year:
         year = timezone.now().year
     
@@ -63,20 +80,18 @@ def get_monthly_sales_data(year=None):
     # قائمة لتخزين بيانات المبيعات
     sales_data = [0] * 12
     
-    # استعلام عن مبيعات كل شهر
-    for month in range(1, 13):
-        try:
-            month_sales = OrderItem.objects.filter(
-                order__created_at__year=year,
-                order__created_at__month=month,
-                order__status='COMPLETED'
-            ).aggregate(
-                sales=Sum(ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField()))
-            )['sales'] or 0
-        except:
-            month_sales = 0
-        
-        sales_data[month - 1] = float(month_sales)
+    # قراءة من جدول المبيعات اليومية المجمعة بدلاً من مسح عناصر الطلبات
+    monthly_sales = DailySalesRollup.objects.filter(
+        date__gte=date(year, 1, 1),
+        date__lt=date(year + 1, 1, 1)
+    ).annotate(
+        month=TruncMonth('date')
+    ).values('month').annotate(
+        sales=Sum('revenue')
+    ).order_by('month')
+    
+    for row in monthly_sales:
+        sales_data[row['month'].month - 1] = float(row['sales'] or 0)
     
     return {
         'labels': months,
@@ -87,33 +102,34 @@ def get_top_selling_products(limit=5, period=30):
     """استخراج قائمة المنتجات الأكثر مبيعًا"""
     start_date = timezone.now().date() - timedelta(days=period)
     
-    top_products = OrderItem.objects.filter(
-        order__created_at__date__gte=start_date,
-        order__status='COMPLETED'
+    top_products = DailySalesRollup.objects.filter(
+        date__gte=start_date
     ).values(
         'product__id', 'product__name', 'product__sku'
     ).annotate(
         total_quantity=Sum('quantity'),
-        total_sales=Sum(ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField()))
+        total_sales=Sum('revenue')
     ).order_by('-total_quantity')[:limit]
     
     return list(top_products)
 
 def get_low_stock_stats():
-    """استخراج إحصائيات المنتجات ذات المخزون المنخفض"""
+    """استخراج إحصائيات المنتجات ذات المخزون المنخفض (استعلامان على الفهرس الجزئي)"""
     low_stock_products = Product.objects.filter(
-        quantity__lte=F('reorder_level'),
+        is_low_stock=True,
         is_active=True
     ).order_by('quantity')
     
-    critical_stock = low_stock_products.filter(quantity=0).count()
-    warning_stock = low_stock_products.exclude(quantity=0).count()
+    counts = low_stock_products.aggregate(
+        total=Count('id'),
+        critical=Count('id', filter=Q(quantity=0)),
+    )
     
     return {
-        'low_stock_products': low_stock_products[:10],  # أول 10 منتجات فقط
-        'total_low_stock': low_stock_products.count(),
-        'critical_stock': critical_stock,
-        'warning_stock': warning_stock
+        'low_stock_products': list(low_stock_products[:10]),  # أول 10 منتجات فقط
+        'total_low_stock': counts['total'],
+        'critical_stock': counts['critical'],
+        'warning_stock': counts['total'] - counts['critical']
     }
 
 def get_payment_stats():
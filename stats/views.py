@@ -6,7 +6,12 @@ from datetime import datetime, timedelta
 from inventory.models import Product, Category, StockMovement
 from orders.models import Order, OrderItem
 from invoices.models import Invoice, Payment
-from .utils import get_top_selling_products, get_low_stock_stats, get_payment_stats, get_monthly_sales_data
+from .models import DailySalesRollup
+from .cache import (
+    StatsCache, SALES, PRODUCTS, PAYMENTS, TOP_SELLERS, MONTHLY_SALES, LOW_STOCK,
+    STATUS_DISTRIBUTION, CATEGORY_DISTRIBUTION,
+)
+from .utils import get_top_selling_products, get_low_stock_stats, get_payment_stats, get_monthly_sales_data, start_of_day
 
 @login_required
 def statistics_view(request):
@@ -30,28 +35,43 @@ def statistics_view(request):
         'today': today
     }
     
+    year = today.year
+    stats_cache = StatsCache()
+    
     # إحصائيات المبيعات
-    sales_stats = get_sales_stats(start_date)
-    context.update(sales_stats)
+    context.update(stats_cache.get(SALES, lambda: get_sales_stats(start_date), period, today))
     
     # إحصائيات المنتجات
-    product_stats = get_product_stats()
-    context.update(product_stats)
+    context.update(stats_cache.get(PRODUCTS, get_product_stats))
     
     # إحصائيات المدفوعات
-    payment_stats = get_payment_stats()
-    context.update(payment_stats)
+    context.update(stats_cache.get(PAYMENTS, get_payment_stats, today))
     
     # المنتجات الأكثر مبيعًا
-    context['top_selling_products'] = get_top_selling_products(limit=10, period=period)
+    context['top_selling_products'] = stats_cache.get(
+        TOP_SELLERS, lambda: get_top_selling_products(limit=10, period=period), period, today
+    )
     
     # بيانات المبيعات الشهرية للرسم البياني
-    context['monthly_sales_data'] = get_monthly_sales_data()
+    context['monthly_sales_data'] = stats_cache.get(
+        MONTHLY_SALES, lambda: get_monthly_sales_data(year), year, scope=year
+    )
     
     # إحصائيات المخزون المنخفض
-    context.update(get_low_stock_stats())
+    context.update(stats_cache.get(LOW_STOCK, get_low_stock_stats))
     
     # توزيع الطلبات حسب الحالة
+    context.update(stats_cache.get(STATUS_DISTRIBUTION, get_order_status_distribution))
+    
+    # توزيع المنتجات حسب الفئات
+    context.update(stats_cache.get(CATEGORY_DISTRIBUTION, get_category_distribution))
+    
+    response = render(request, 'stats/statistics.html', context)
+    response['X-Stats-Cache'] = stats_cache.header()
+    return response
+
+def get_order_status_distribution():
+    """توزيع الطلبات حسب الحالة بصيغة الرسم البياني"""
     order_status_distribution = Order.objects.values('status').annotate(
         count=Count('id')
     ).order_by('status')
@@ -74,11 +94,14 @@ def statistics_view(request):
         status_data.append(item['count'])
         status_colors_list.append(status_colors.get(item['status'], '#858796'))
     
-    context['order_status_labels'] = status_labels
-    context['order_status_data'] = status_data
-    context['order_status_colors'] = status_colors_list
-    
-    # توزيع المنتجات حسب الفئات
+    return {
+        'order_status_labels': status_labels,
+        'order_status_data': status_data,
+        'order_status_colors': status_colors_list
+    }
+
+def get_category_distribution():
+    """توزيع المنتجات حسب الفئات بصيغة الرسم البياني"""
     category_distribution = Category.objects.annotate(
         products_count=Count('products')
     ).values('name', 'products_count').order_by('-products_count')
@@ -91,50 +114,42 @@ def statistics_view(request):
         category_labels.append(item['name'])
         category_data.append(item['products_count'])
     
-    context['category_labels'] = category_labels
-    context['category_data'] = category_data
-    
-    return render(request, 'stats/statistics.html', context)
+    return {
+        'category_labels': category_labels,
+        'category_data': category_data
+    }
 
 def get_sales_stats(start_date):
     """إحصائيات المبيعات"""
-    # إجمالي الطلبات
-    total_orders = Order.objects.count()
-    
-    # طلبات الفترة
-    period_orders = Order.objects.filter(created_at__date__gte=start_date).count()
-    
-    # الطلبات المكتملة
-    completed_orders = Order.objects.filter(status=Order.OrderStatus.COMPLETED).count()
+    # أعداد الطلبات في استعلام واحد
+    order_counts = Order.objects.aggregate(
+        total_orders=Count('id'),
+        period_orders=Count('id', filter=Q(created_at__gte=start_of_day(start_date))),
+        completed_orders=Count('id', filter=Q(status=Order.OrderStatus.COMPLETED)),
+    )
+    total_orders = order_counts['total_orders']
+    completed_orders = order_counts['completed_orders']
     
     # نسبة إكمال الطلبات
     completion_rate = (completed_orders / total_orders * 100) if total_orders > 0 else 0
     
-    # إجمالي المبيعات
-    total_sales = OrderItem.objects.filter(
-        order__status=Order.OrderStatus.COMPLETED
-    ).aggregate(
-        sales=Sum(ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField()))
-    )['sales'] or 0
-    
-    # مبيعات الفترة
-    period_sales = OrderItem.objects.filter(
-        order__status=Order.OrderStatus.COMPLETED,
-        order__created_at__date__gte=start_date
-    ).aggregate(
-        sales=Sum(ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField()))
-    )['sales'] or 0
+    # إجمالي المبيعات ومبيعات الفترة من جدول المبيعات اليومية المجمعة
+    sales = DailySalesRollup.objects.aggregate(
+        total_sales=Sum('revenue'),
+        period_sales=Sum('revenue', filter=Q(date__gte=start_date)),
+    )
+    total_sales = sales['total_sales'] or 0
     
     # متوسط قيمة الطلب
     avg_order_value = total_sales / completed_orders if completed_orders > 0 else 0
     
     return {
         'total_orders': total_orders,
-        'period_orders': period_orders,
+        'period_orders': order_counts['period_orders'],
         'completed_orders': completed_orders,
         'completion_rate': completion_rate,
         'total_sales': total_sales,
-        'period_sales': period_sales,
+        'period_sales': sales['period_sales'] or 0,
         'avg_order_value': avg_order_value
     }
 